@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Memory cost of copying the primal model in `dope` -- deepcopy against
+    `_clone_primal` on a fitted DecisionTreeClassifier and on an IRT
+    signature holding its training data, both over uci_adult_salary.csv.
+"""
+import copy
+
+import numpy as np
+from sklearn.tree import DecisionTreeClassifier
+
+from mlsquare.models.embibe import rasch
+from mlsquare.utils.functions import _clone_primal
+
+from .common import load_salary, peak_bytes
+
+
+class CloneSuite:
+    timeout = 300
+
+    def setup(self):
+        X, y = load_salary()
+        self.tree = DecisionTreeClassifier().fit(X, y)
+        self.irt = rasch(data=np.tile(X, (8, 1)))
+
+    def track_deepcopy_fitted_tree(self):
+        return peak_bytes(lambda: copy.deepcopy(self.tree))
+    track_deepcopy_fitted_tree.unit = 'bytes'
+
+    def track_clone_fitted_tree_for_refit(self):
+        return peak_bytes(lambda: _clone_primal(self.tree, refit=True))
+    track_clone_fitted_tree_for_refit.unit = 'bytes'
+
+    def track_deepcopy_irt_signature(self):
+        return peak_bytes(lambda: copy.deepcopy(self.irt))
+    track_deepcopy_irt_signature.unit = 'bytes'
+
+    def track_clone_irt_signature_read_only(self):
+        return peak_bytes(lambda: _clone_primal(self.irt, refit=False))
+    track_clone_irt_signature_read_only.unit = 'bytes'
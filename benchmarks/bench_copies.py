@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Audit of the bytes copied converting user inputs, per fit and per
+    predict, for each kind of input. Arrays, memmaps and single-dtype
+    DataFrames should not be copied at all.
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+from mlsquare import dope
+from mlsquare.utils.profiling import profile
+
+from . import common
+
+
+class CopySuite:
+    params = ['ndarray', 'memmap', 'DataFrame']
+    param_names = ['input']
+    timeout = 600
+    number = 1
+    repeat = 1
+
+    def setup(self, input):
+        X, y = common.load_salary()
+        self.directory = tempfile.mkdtemp()
+        if input == 'memmap':
+            X_map = np.memmap(os.path.join(self.directory, 'X.bin'), dtype=X.dtype, mode='w+', shape=X.shape)
+            X_map[:] = X
+            X = X_map
+        elif input == 'DataFrame':
+            X = pd.DataFrame(X)
+        self.X, self.y = X, y
+        self.model = dope(LogisticRegression())
+        self.model.fit(X, y, epochs=1)
+
+    def teardown(self, input):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _bytes_copied(self, fn):
+        with profile() as profiler:
+            fn()
+        return profiler.counts.get('bytes_copied', 0)
+
+    def track_fit_bytes_copied(self, input):
+        return self._bytes_copied(lambda: self.model._prepare_fit(self.X, self.y, epochs=1))
+    track_fit_bytes_copied.unit = 'bytes'
+
+    def track_predict_bytes_copied(self, input):
+        return self._bytes_copied(lambda: self.model.predict(self.X))
+    track_predict_bytes_copied.unit = 'bytes'
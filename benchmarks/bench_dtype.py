@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Training data kept for the proxy and fit time under the float32 and
+    float64 dtype policies (`mlsquare.utils.arrays.set_floatx`). float32
+    should halve the former and cut the latter, as Keras need not cast
+    every batch.
+"""
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from mlsquare import dope
+from mlsquare.utils import arrays
+
+from . import common
+
+
+class DtypePolicySuite:
+    params = ['float32', 'float64']
+    param_names = ['floatx']
+    timeout = 1800
+    number = 1
+    repeat = 1
+
+    def setup(self, floatx):
+        X, y = common.load_salary()
+        self.X, self.y = np.tile(X, (4, 1)), np.tile(y, 4)
+        self.floatx = arrays.floatx()
+        arrays.set_floatx(floatx)
+
+    def teardown(self, floatx):
+        arrays.set_floatx(self.floatx)
+
+    def track_training_data_bytes(self, floatx):
+        model = dope(LogisticRegression())
+        X, y, primal_data, _ = model._prepare_fit(self.X, self.y)
+        return X.nbytes + y.nbytes + primal_data['y_pred'].nbytes
+    track_training_data_bytes.unit = 'bytes'
+
+    def time_fit(self, floatx):
+        dope(LogisticRegression()).fit(self.X, self.y, epochs=5, batch_size=256)
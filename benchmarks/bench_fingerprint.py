@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Throughput of `mlsquare.utils.fingerprint` on the bundled datasets and
+    on a memory-mapped array, in full and sampled mode.
+"""
+import os
+import shutil
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from mlsquare.utils.fingerprint import fingerprint
+
+from .common import dataset_path
+
+_DATASETS = ['iris.csv', 'boston.csv', 'diabetes.csv', 'abalone.csv', 'mushroom.data.csv',
+             'uci_adult_salary.csv', 'uci_airfoil_self_noise.csv', 'uci_auto_mpg.csv',
+             'sim_irt_100_by_100.csv']
+
+
+def _throughput(fn, nbytes, repeat=3):
+    seconds = min(timeit.repeat(fn, number=1, repeat=repeat))
+    return nbytes / seconds / 1e6
+
+
+class DatasetSuite:
+    params = _DATASETS
+    param_names = ['dataset']
+
+    def setup(self, dataset):
+        self.frame = pd.read_csv(dataset_path(dataset), header=None)
+        self.nbytes = int(self.frame.memory_usage(deep=True).sum())
+
+    def time_fingerprint_dataframe(self, dataset):
+        fingerprint(self.frame)
+
+    def track_dataframe_throughput(self, dataset):
+        return _throughput(lambda: fingerprint(self.frame), self.nbytes)
+    track_dataframe_throughput.unit = 'MB/s'
+
+
+class MemmapSuite:
+    timeout = 300
+    params = [False, True]
+    param_names = ['sampled']
+
+    def setup(self, sampled):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'X.dat')
+        self.X = np.memmap(path, dtype=np.float32, mode='w+', shape=(1 << 20, 128))
+        self.X[:] = 1.0
+        self.X.flush()
+
+    def teardown(self, sampled):
+        del self.X
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def time_fingerprint_memmap(self, sampled):
+        fingerprint(self.X, sampled=sampled)
+
+    def track_memmap_throughput(self, sampled):
+        return _throughput(lambda: fingerprint(self.X, sampled=sampled), self.X.nbytes)
+    track_memmap_throughput.unit = 'MB/s'
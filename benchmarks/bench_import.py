@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Startup cost of the package -- import time, resident memory and the
+    heavy backends pulled in by a plain `import mlsquare`.
+"""
+import json
+import subprocess
+import sys
+
+_HEAVY_MODULES = ['ray', 'tensorflow', 'keras', 'onnxmltools', 'matplotlib', 'theano']
+
+_PROBE = '''
+import json, resource, sys
+import mlsquare
+print(json.dumps({
+    "maxrss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "heavy": sorted(m for m in %r if m in sys.modules),
+}))
+''' % (_HEAVY_MODULES,)
+
+
+def _probe():
+    out = subprocess.check_output([sys.executable, '-c', _PROBE])
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+class ImportSuite:
+    timeout = 120
+
+    def timeraw_import_mlsquare(self):
+        return "import mlsquare"
+
+    def timeraw_import_dope_and_registry(self):
+        return "from mlsquare import dope, registry"
+
+    def track_import_maxrss(self):
+        return _probe()['maxrss']
+    track_import_maxrss.unit = 'kB'
+
+    def track_import_heavy_modules(self):
+        return len(_probe()['heavy'])
+    track_import_heavy_modules.unit = 'modules'
+
+
+if __name__ == '__main__':
+    print(json.dumps(_probe()))
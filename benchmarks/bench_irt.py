@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Peak memory and wall time of fitting the rasch proxy on users and
+    items given as one-hot rows and as integer IDs. Both train the same
+    lookup model; one-hot input should only cost its own size.
+"""
+from mlsquare import dope
+from mlsquare.models.embibe import rasch
+
+from . import common
+
+
+class IrtInputSuite:
+    params = ['one-hot', 'ids']
+    param_names = ['input']
+    timeout = 1800
+    number = 1
+    repeat = 1
+
+    def setup(self, input):
+        self.x_user, self.x_questions, self.y, _ = common.load_irt(one_hot=input == 'one-hot')
+
+    def _fit(self):
+        return dope(rasch()).fit(self.x_user, self.x_questions, self.y, epochs=5)
+
+    def track_peak_fit_bytes(self, input):
+        return common.peak_bytes(self._fit)
+    track_peak_fit_bytes.unit = 'bytes'
+
+    def time_fit(self, input):
+        self._fit()
@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Overhead of the timing spans on the hot paths, with and without an
+    active profiler.
+"""
+from mlsquare.utils.profiling import profile, span
+
+
+class SpanSuite:
+    params = [False, True]
+    param_names = ['profiling']
+
+    def setup(self, profiling):
+        self.context = profile() if profiling else None
+        if self.context is not None:
+            self.context.__enter__()
+
+    def teardown(self, profiling):
+        if self.context is not None:
+            self.context.__exit__(None, None, None)
+
+    def time_10k_spans(self, profiling):
+        for _ in range(10000):
+            with span('stage'):
+                pass
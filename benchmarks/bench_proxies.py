@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    End-to-end benchmarks of every registered proxy on the bundled
+    datasets -- `dope(...).fit/predict/score/save` wall time, peak memory,
+    number of Tune trials and fidelity of the proxy to its primal.
+
+    Cases are generated from `registry.data`; a registered proxy without
+    a case below is reported as skipped rather than silently ignored.
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.linear_model import LogisticRegression, LinearRegression, Ridge, Lasso, ElasticNet
+from sklearn.svm import LinearSVC, SVC
+from sklearn.tree import DecisionTreeClassifier
+
+from mlsquare import dope, registry
+from mlsquare.models.embibe import rasch, twoPl, tpm
+from mlsquare.utils.correlations import concordance_correlation_coefficient
+
+from . import common
+
+_EPOCHS = 50
+
+## (module_name, model_name) -> (primal factory, task, dataset loaders)
+_CASES = {
+    ('sklearn', 'LogisticRegression'): (LogisticRegression, 'classification',
+                                        {'iris': lambda: common.load_iris(binary=True),
+                                         'salary': common.load_salary}),
+    ('sklearn', 'LinearSVC'): (LinearSVC, 'classification',
+                               {'iris': common.load_iris, 'mushroom': common.load_mushroom}),
+    ('sklearn', 'SVC'): (SVC, 'classification', {'iris': common.load_iris}),
+    ('sklearn', 'DecisionTreeClassifier'): (DecisionTreeClassifier, 'tree', {'iris': common.load_iris}),
+    ('sklearn', 'LinearRegression'): (LinearRegression, 'regression',
+                                      {'diabetes': common.load_diabetes, 'boston': common.load_boston,
+                                       'airfoil': common.load_airfoil, 'auto_mpg': common.load_auto_mpg}),
+    ('sklearn', 'Ridge'): (Ridge, 'regression',
+                           {'diabetes': common.load_diabetes, 'abalone': common.load_abalone}),
+    ('sklearn', 'Lasso'): (Lasso, 'regression',
+                           {'diabetes': common.load_diabetes, 'abalone': common.load_abalone}),
+    ('sklearn', 'ElasticNet'): (ElasticNet, 'regression', {'diabetes': common.load_diabetes}),
+    ('sklearn', 'TruncatedSVD'): (lambda: TruncatedSVD(n_components=5), 'decomposition',
+                                  {'boston': common.load_boston}),
+    ('mlsquare', 'rasch'): (rasch, 'irt', {'sim_irt': common.load_irt}),
+    ('mlsquare', 'twoPl'): (twoPl, 'irt', {'sim_irt': common.load_irt}),
+    ('mlsquare', 'tpm'): (tpm, 'irt', {'sim_irt': common.load_irt}),
+}
+
+
+def _case_names():
+    names = []
+    for (module_name, model_name), versions in sorted(registry.data.items()):
+        datasets = _CASES.get((module_name, model_name), (None, None, {None: None}))[2]
+        for version in sorted(versions):
+            for dataset in sorted(datasets, key=str):
+                names.append('/'.join([module_name, model_name, version, str(dataset)]))
+    return names
+
+
+def _one_hot(y):
+    return np.eye(int(y.max()) + 1)[y.astype(int)]
+
+
+class Session(object):
+    """A dope'd model with its data, fitted on demand."""
+
+    def __init__(self, case):
+        module_name, model_name, version, dataset = case.split('/')
+        if (module_name, model_name) not in _CASES:
+            raise NotImplementedError('No benchmark case for %s.%s' % (module_name, model_name))
+        primal_factory, self.task, loaders = _CASES[(module_name, model_name)]
+        self.version = version
+        self.primal = primal_factory()
+        data = loaders[dataset]()
+        if self.task == 'irt':
+            (self.x_user, self.x_user_test, self.x_questions, self.x_questions_test,
+             self.y, self.y_test, _, self.p_true) = common.train_test_split(*data)
+        elif self.task == 'decomposition':
+            self.X = data[0]
+        else:
+            X, y = data
+            if self.task == 'tree':
+                y = _one_hot(y)
+            self.X, self.X_test, self.y, self.y_test = common.train_test_split(X, y)
+
+    def dope(self):
+        return dope(self.primal, version=self.version)
+
+    def fit(self):
+        self.model = self.dope()
+        if self.task == 'irt':
+            self.model.fit(self.x_user, self.x_questions, self.y, epochs=_EPOCHS)
+        elif self.task == 'decomposition':
+            self.model.fit(self.X)
+        else:
+            self.model.fit(self.X, self.y, epochs=_EPOCHS)
+        return self.model
+
+    def predict(self):
+        if self.task == 'irt':
+            return self.model.predict(self.x_user_test, self.x_questions_test)
+        if self.task == 'decomposition':
+            return self.model.transform(self.X)
+        return self.model.predict(self.X_test)
+
+    def score(self):
+        if self.task in ('irt', 'decomposition'):
+            return self.fidelity()
+        return self.model.score(self.X_test, self.y_test)
+
+    def fidelity(self):
+        """Agreement of the proxy with its primal on held out data."""
+        if self.task == 'irt':
+            estimate = np.asarray(self.predict()).reshape(-1)
+            return float(np.corrcoef(estimate, self.p_true)[0][1])
+        if self.task == 'decomposition':
+            reconstruction = self.model.inverse_transform(self.model.transform(self.X))
+            reference = self.primal.fit(self.X).inverse_transform(self.primal.transform(self.X))
+            return float(1 - np.linalg.norm(reconstruction - reference) / np.linalg.norm(reference))
+        primal = self.model.primal_model
+        proxy_pred = np.asarray(self.predict())
+        primal_pred = np.asarray(primal.predict(self.X_test))
+        if self.task == 'tree':
+            primal_pred = np.argmax(primal_pred, axis=1)
+        if self.task == 'regression':
+            return float(concordance_correlation_coefficient(primal_pred.reshape(-1), proxy_pred.reshape(-1)))
+        return float(np.mean(primal_pred.reshape(-1) == proxy_pred.reshape(-1)))
+
+
+class ProxySuite:
+    params = _case_names()
+    param_names = ['case']
+    timeout = 3600
+    number = 1
+    repeat = 1
+
+    def setup(self, case):
+        self.session = Session(case)
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self, case):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def time_dope(self, case):
+        self.session.dope()
+
+    def time_fit(self, case):
+        self.session.fit()
+
+    def peakmem_fit(self, case):
+        self.session.fit()
+
+    def track_trial_count(self, case):
+        return len(getattr(self.session.fit(), 'trials', []) or [])
+    track_trial_count.unit = 'trials'
+
+    def track_fidelity(self, case):
+        self.session.fit()
+        return self.session.fidelity()
+    track_fidelity.unit = 'agreement'
+
+    def track_score(self, case):
+        self.session.fit()
+        score = self.session.score()
+        return float(score[-1] if isinstance(score, (list, tuple)) else score)
+    track_score.unit = 'score'
+
+
+class FittedProxySuite:
+    """Timings that need a fitted proxy; the fit itself is not timed."""
+    params = _case_names()
+    param_names = ['case']
+    timeout = 3600
+    number = 1
+    repeat = 3
+
+    def setup(self, case):
+        self.session = Session(case)
+        self.session.fit()
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self, case):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def time_predict(self, case):
+        self.session.predict()
+
+    def time_score(self, case):
+        self.session.score()
+
+    def time_save(self, case):
+        if not hasattr(self.session.model, 'save'):
+            raise NotImplementedError('%s has no save method' % type(self.session.model).__name__)
+        self.session.model.save(os.path.join(self.directory, 'proxy'))
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Fit time and fidelity of the linear regression proxies trained with
+    SGD in Tune trials versus solved in closed form.
+"""
+import numpy as np
+from sklearn.linear_model import LinearRegression, Ridge
+
+from mlsquare import dope
+from mlsquare.utils.correlations import concordance_correlation_coefficient
+
+from . import common
+
+_PRIMALS = {'LinearRegression': LinearRegression, 'Ridge': Ridge}
+
+
+class SolverSuite:
+    params = (sorted(_PRIMALS), ['sgd', 'lstsq'])
+    param_names = ['model', 'solver']
+    timeout = 1800
+    number = 1
+    repeat = 1
+
+    def setup(self, model, solver):
+        X, y = common.load_abalone()
+        self.X, self.X_test, self.y, _ = common.train_test_split(X, y)
+
+    def _fit(self, model, solver):
+        self.model = dope(_PRIMALS[model]())
+        self.model.fit(self.X, self.y, epochs=50, solver=solver)
+        return self.model
+
+    def time_fit(self, model, solver):
+        self._fit(model, solver)
+
+    def track_fidelity(self, model, solver):
+        proxy = self._fit(model, solver)
+        proxy_pred = np.asarray(proxy.predict(self.X_test)).reshape(-1)
+        primal_pred = np.asarray(proxy.primal_model.predict(self.X_test)).reshape(-1)
+        return float(concordance_correlation_coefficient(primal_pred, proxy_pred))
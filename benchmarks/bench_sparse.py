@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Training data held and fit time for one-hot encoded mushroom data
+    given as a dense array and as a CSR matrix. Sparse data should be held
+    in proportion to its non-zeros.
+"""
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import OneHotEncoder
+
+from mlsquare import dope
+from mlsquare.utils.arrays import nbytes
+
+from . import common
+
+
+class SparseInputSuite:
+    params = ['dense', 'csr']
+    param_names = ['input']
+    timeout = 1800
+    number = 1
+    repeat = 1
+
+    def setup(self, input):
+        X, y = common.load_mushroom()
+        X = OneHotEncoder(handle_unknown='ignore').fit_transform(X)
+        self.X = X.toarray() if input == 'dense' else X.tocsr()
+        self.y = y
+
+    def track_training_data_bytes(self, input):
+        X, _, _, _ = dope(LogisticRegression())._prepare_fit(self.X, self.y)
+        return nbytes(X)
+    track_training_data_bytes.unit = 'bytes'
+
+    def time_fit(self, input):
+        dope(LogisticRegression()).fit(self.X, self.y, epochs=5, batch_size=256)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Memory cost of Tune trials on shared training data -- the trainable
+    payload Ray stores and ships to every trial worker, and the peak
+    resident memory of each worker as the number of trials grows. Both
+    should stay flat: the data lives once in the object store. Also the
+    trial throughput as trials are packed onto fewer CPUs each.
+"""
+import time
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from mlsquare import dope
+from mlsquare.optmizers.tune import _make_experiment, _run_experiments
+from mlsquare.utils import profiling
+
+from . import common
+
+
+def _experiment(scale):
+    X, y = common.load_salary()
+    X, y = np.tile(X, (scale, 1)), np.tile(y, scale)
+    model = dope(LogisticRegression())
+    X, y, primal_data, kwargs = model._prepare_fit(X, y, epochs=1, batch_size=1024)
+    experiment, _ = _make_experiment(X, y, model.proxy_model, primal_data, **kwargs)
+    return experiment
+
+
+class TrainablePayloadSuite:
+    params = [1, 4, 16]
+    param_names = ['data_scale']
+    timeout = 600
+
+    def track_trainable_payload_bytes(self, data_scale):
+        from ray import cloudpickle
+        from ray.tune.registry import _global_registry, TRAINABLE_CLASS
+        experiment = _experiment(data_scale)
+        trainable = _global_registry.get(TRAINABLE_CLASS, experiment.spec['run'])
+        return len(cloudpickle.dumps(trainable))
+    track_trainable_payload_bytes.unit = 'bytes'
+
+
+class TrialMemorySuite:
+    params = [1, 4, 8]
+    param_names = ['n_trials']
+    timeout = 3600
+    number = 1
+    repeat = 1
+
+    def track_peak_rss_per_trial(self, n_trials):
+        from ray import tune
+        ## Trials only measure their memory when profiled.
+        with profiling.profile():
+            experiment = _experiment(4)
+            experiment.spec['config'] = dict(experiment.spec['config'],
+                                             trial_index=tune.grid_search(list(range(n_trials))))
+            for _, trials in _run_experiments([experiment], verbose=0):
+                pass
+        peaks = [trial.last_result.get('peak_rss_bytes') for trial in trials]
+        return float(np.mean([peak for peak in peaks if peak is not None]))
+    track_peak_rss_per_trial.unit = 'bytes'
+
+
+class ThroughputSuite:
+    """Trials per minute of a random search, by CPUs given to each trial."""
+    params = [4, 1, 0.5, 0.25]
+    param_names = ['cpus_per_trial']
+    timeout = 3600
+    number = 1
+    repeat = 1
+
+    def setup(self, cpus_per_trial):
+        X, y = common.load_iris(binary=True)
+        self.model = dope(LogisticRegression())
+        self.X, self.y = X, y
+
+    def track_trials_per_minute(self, cpus_per_trial):
+        start = time.time()
+        self.model.fit(self.X, self.y, epochs=20, space=True, max_trials=32, cpus_per_trial=cpus_per_trial)
+        return len(self.model.trials) * 60.0 / (time.time() - start)
+    track_trials_per_minute.unit = 'trials/minute'
+
+
+class HalvingSuite:
+    """Wall time of a random search on the salary data, with and without successive halving."""
+    params = [False, True]
+    param_names = ['halving']
+    timeout = 3600
+    number = 1
+    repeat = 1
+
+    def setup(self, halving):
+        self.X, self.y = common.load_salary()
+
+    def time_search(self, halving):
+        model = dope(LogisticRegression())
+        model.fit(self.X, self.y, epochs=20, space=True, max_trials=27, halving=halving)
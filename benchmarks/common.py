@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Helpers shared by the benchmark suites -- dataset loading and
+    memory measurement.
+"""
+import os
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+DATASETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'datasets')
+
+
+def dataset_path(name):
+    return os.path.join(DATASETS_DIR, name)
+
+
+def _encode(data):
+    for col in data.columns:
+        if not pd.api.types.is_numeric_dtype(data[col]):
+            _, data[col] = np.unique(data[col].astype(str), return_inverse=True)
+    return data
+
+
+def _standardize(X):
+    return (X - X.mean(axis=0)) / X.std(axis=0)
+
+
+def load_iris(binary=False):
+    data = _encode(pd.read_csv(dataset_path('iris.csv'), header=None))
+    if binary:
+        data = data[data[4] != 2]
+    return data.iloc[:, :-1].values, data.iloc[:, -1].values
+
+
+def load_diabetes():
+    data = pd.read_csv(dataset_path('diabetes.csv'), header=None).values
+    data = _standardize(data)
+    return data[:, :-1], data[:, -1]
+
+
+def load_boston():
+    data = pd.read_csv(dataset_path('boston.csv')).values
+    return _standardize(data[:, :-1]), data[:, -1]
+
+
+def load_airfoil():
+    data = _standardize(pd.read_csv(dataset_path('uci_airfoil_self_noise.csv'), header=None).values)
+    return data[:, :-1], data[:, -1]
+
+
+def load_abalone():
+    data = _encode(pd.read_csv(dataset_path('abalone.csv'), header=None)).values.astype(np.float64)
+    return _standardize(data[:, :-1]), data[:, -1]
+
+
+def load_auto_mpg():
+    data = pd.read_csv(dataset_path('uci_auto_mpg.csv'), index_col=0, na_values='?')
+    data = data.drop(columns=['car name']).dropna().values.astype(np.float64)
+    return _standardize(data[:, 1:]), data[:, 0]
+
+
+def load_mushroom():
+    data = _encode(pd.read_csv(dataset_path('mushroom.data.csv'), header=None))
+    return data.iloc[:, 1:].values.astype(np.float64), data.iloc[:, 0].values
+
+
+def load_irt(one_hot=False):
+    """Returns user IDs, item IDs (or one-hot rows of both), responses and true response probabilities."""
+    data = pd.read_csv(dataset_path('sim_irt_100_by_100.csv'))
+    if one_hot:
+        x_user = pd.get_dummies(data['user_id']).values.astype(np.float32)
+        x_questions = pd.get_dummies(data['question_code']).values.astype(np.float32)
+    else:
+        x_user = pd.Categorical(data['user_id']).codes.astype(np.int32)
+        x_questions = pd.Categorical(data['question_code']).codes.astype(np.int32)
+    return x_user, x_questions, data[['correctness']].values, data['response'].values
+
+
+def load_salary():
+    data = _encode(pd.read_csv(dataset_path('uci_adult_salary.csv'), header=None, skipinitialspace=True))
+    return data.iloc[:, :-1].values.astype(np.float64), data.iloc[:, -1].values
+
+
+def train_test_split(*arrays, **kwargs):
+    """Deterministic split of the leading axis; test_size defaults to 0.3."""
+    kwargs.setdefault('test_size', 0.3)
+    n_samples = arrays[0].shape[0]
+    order = np.random.RandomState(0).permutation(n_samples)
+    n_test = int(n_samples * kwargs['test_size'])
+    train, test = order[n_test:], order[:n_test]
+    split = []
+    for array in arrays:
+        split.extend([array[train], array[test]])
+    return split
+
+
+def peak_bytes(fn):
+    """Peak bytes allocated by python while running `fn`."""
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
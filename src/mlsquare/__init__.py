@@ -15,6 +15,6 @@ __author__ = "MLSquare"
 __copyright__ = "MLSquare"
 __license__ = "mit"
 
-from .core import dope
+from .core import dope, dope_many
 from .base import registry
 from .architectures import sklearn, irt
@@ -2,22 +2,79 @@
 # -*- coding: utf-8 -*-
 import logging
 import os
-import ray
-from ray import tune
 from ..optmizers import get_best_model
-from ..utils.functions import _parse_params
+from ..optmizers.tune import _init_ray, _best_result
+from ..optmizers.search import get_search_space
+from ..utils.functions import _parse_params, _clone_primal
+from ..optmizers.experiments import get_experiment_store
+from ..utils.cache import get_cache
+from ..utils.fingerprint import fingerprint
+from ..utils.profiling import profiled, span
+from ..utils.arrays import as_array, as_floatx, nbytes, is_sparse
+from ..utils.streaming import is_stream, spool, release, SpooledDataset
 import pickle
-import onnxmltools
 import numpy as np
 
 
-import matplotlib.pyplot as plt
 import time
-import keras.backend as K
 import warnings
 warnings.filterwarnings("ignore")
 
 
+def _fit_key(adapter, data, kwargs):
+    """
+    Identifies a fit, keying both the proxy cache and the experiment
+    store: the primal model, the data, the proxy with its params and the
+    adapter's `key_options` among the fit options.
+    """
+    return fingerprint(adapter.primal_model, *data, adapter.proxy_model.name, adapter.proxy_model.version,
+                       adapter.params, {name: kwargs[name] for name in adapter.key_options})
+
+
+def _experiment_options(params, kwargs):
+    options = {name: kwargs[name] for name in ('epochs', 'batch_size', 'search_space', 'search', 'max_trials')}
+    options['params'] = params
+    return options
+
+
+def _check_solver(proxy_model, solver):
+    solvers = getattr(proxy_model, 'solvers', ('sgd',))
+    if solver not in solvers:
+        raise ValueError("solver should be one of %s for %s, got %r" % (solvers, proxy_model.name, solver))
+    return solver
+
+
+def _irt_ids(X, name, n=None):
+    """
+    Returns the user or item IDs given in X -- a vector of integer IDs,
+    or one-hot rows as built by pd.get_dummies, dense or sparse -- as an
+    int32 vector, with the number of distinct users or items: the number
+    of one-hot columns, else `n`, else the largest ID plus one.
+    """
+    if is_sparse(X):
+        X = X.tocsr()
+        if np.any(np.diff(X.indptr) != 1):
+            raise ValueError('Each row of one-hot %s should have exactly one non-zero entry.' % name)
+        ids, width = X.indices, X.shape[1]
+    else:
+        X = np.asarray(X)
+        if X.ndim == 2 and X.shape[1] > 1:
+            if np.any(np.count_nonzero(X, axis=1) != 1):
+                raise ValueError('Each row of one-hot %s should have exactly one non-zero entry.' % name)
+            ids, width = np.argmax(X, axis=1), X.shape[1]
+        else:
+            ids, width = X.reshape(-1), None
+            if ids.dtype.kind not in 'iub' and np.any(ids != np.round(ids)):
+                raise ValueError('%s should be given as integer IDs or one-hot rows.' % name.capitalize())
+    ids = ids.astype(np.int32, copy=False)
+    if width is None:
+        width = n if n is not None else int(ids.max()) + 1 if ids.size else 0
+    expected = width if n is None else n
+    if width != expected or ids.size and (ids.min() < 0 or ids.max() >= expected):
+        raise ValueError('Expected %s as IDs in [0, %d) or one-hot rows of %d columns.' % (name, expected, expected))
+    return ids, width
+
+
 class IrtKerasRegressor():
     """
         Adapter to connect Irt Rasch One Parameter, Two parameter model and Birnbaum's Three Parameter model with keras models.
@@ -40,7 +97,8 @@ class IrtKerasRegressor():
     Methods
     -------
         fit(X_users, X_questions, y)
-        Method to train a transpiled model.
+        Method to train a transpiled model. Users and questions are given
+        as integer IDs, or as one-hot rows.
 
     plot()
         Method to plot model's train-validation loss.
@@ -66,6 +124,13 @@ class IrtKerasRegressor():
 
     """
 
+    refits_primal = False
+    metric = 'mean_error'
+    metric_mode = 'min'
+    ## Fit options a cached or recorded fit must agree on; see `_fit_key`.
+    key_options = ('latent_traits', 'batch_size', 'epochs', 'validation_split', 'search_space', 'search',
+                   'max_trials', 'scheduler', 'report_every')
+
     def __init__(self, proxy_model, primal_model, **kwargs):
         kwargs.setdefault('params', None)
         self.primal_model = primal_model
@@ -73,15 +138,34 @@ class IrtKerasRegressor():
         self.proxy_model.primal = self.primal_model
         self.params = kwargs['params']
 
+    @profiled
     def fit(self, x_user, x_questions, y_vals, **kwargs):
         kwargs.setdefault('latent_traits', None)
         kwargs.setdefault('batch_size', 16)
         kwargs.setdefault('epochs', 64)
         kwargs.setdefault('validation_split', 0.2)
         kwargs.setdefault('params', self.params)
+        kwargs.setdefault('cache', False)
+        kwargs.setdefault('resume', False)
+        kwargs.setdefault('space', False)
+        kwargs.setdefault('search', 'random')
+        kwargs.setdefault('max_trials', None)
+        kwargs.setdefault('time_budget_s', None)
+        kwargs.setdefault('scheduler', None)
+        kwargs.setdefault('report_every', 1)
+        kwargs.setdefault('cpus_per_trial', 1)
+        kwargs.setdefault('checkpoint_dir', None)
 
         self.proxy_model.l_traits = kwargs['latent_traits']
-
+        store = get_experiment_store(kwargs['resume'])
+        data_key = None
+        if store is not None:
+            with span('fingerprint.data'):
+                data_key = fingerprint([x_user, x_questions], y_vals)
+
+        x_user, self.proxy_model.n_users = _irt_ids(x_user, 'users')
+        x_questions, self.proxy_model.n_items = _irt_ids(x_questions, 'questions')
+        y_vals = as_floatx(y_vals)
         self.proxy_model.x_train_user = x_user
         self.proxy_model.x_train_questions = x_questions
         self.proxy_model.y_ = y_vals
@@ -95,64 +179,57 @@ class IrtKerasRegressor():
             self.params = _parse_params(self.params, return_as='flat')
             self.proxy_model.update_params(self.params)
             # triggers for fourPL model
-            if self.proxy_model.name is 'tpm' and 'slip_params' in self.params and 'train' in self.params['slip_params'].keys():
+            if self.proxy_model.name == 'tpm' and 'slip_params' in self.params and 'train' in self.params['slip_params'].keys():
                 if self.params['slip_params']['train']:
                     self.proxy_model.name = 'fourPL'
+        kwargs['search_space'] = get_search_space(self.proxy_model, kwargs['space'], params=self.params)
 
-        ray_verbose = False
-        _ray_log_level = logging.INFO if ray_verbose else logging.ERROR
-        ray.init(log_to_driver=False, logging_level=_ray_log_level, ignore_reinit_error=True, redis_max_memory=20*1000*1000*1000, object_store_memory=1000000000,
-                 num_cpus=4)
-
-        def train_model(config, reporter):
-            self.proxy_model.set_params(params=config, set_by='optimizer')
-            print('\nIntitializing fit for {} model. . .\nBatch_size: {}; epochs: {};'.format(
-                self.proxy_model.name, kwargs['batch_size'], kwargs['epochs']))
-            model = self.proxy_model.create_model()
-
-            self.history = model.fit(x=[x_user, x_questions], y=y_vals, batch_size=kwargs['batch_size'],
-                                     epochs=kwargs['epochs'], verbose=0, validation_split=kwargs['validation_split'])
-
-            _, mae, accuracy = model.evaluate(
-                x=[x_user, x_questions], y=y_vals)  # [1]
-            last_checkpoint = "weights_tune_{}.h5".format(
-                list(zip(np.random.choice(10, len(config), replace=False), config)))
-            model.save_weights(last_checkpoint)
-            reporter(mean_error=mae, mean_accuracy=accuracy,
-                     checkpoint=last_checkpoint)
+        cache = get_cache(kwargs['cache'])
+        best_model = None
+        self.trials = []
         t1 = time.time()
-        configuration = tune.Experiment("experiment_name",
-                                        run=train_model,
-                                        resources_per_trial={"cpu": 4},
-                                        stop={"mean_error": 0.15,
-                                              "mean_accuracy": 95},
-                                        config=self.proxy_model.get_params())
-
-        trials = tune.run_experiments(configuration, verbose=0)
-        self.trials = trials
-        metric = "mean_error"  # "mean_accuracy"
-        # Restore a model from the best trial.
-
-        def get_sorted_trials(trial_list, metric):
-            return sorted(trial_list, key=lambda trial: trial.last_result.get(metric, 0), reverse=True)
-
-        sorted_trials = get_sorted_trials(trials, metric)
-
-        for best_trial in sorted_trials:
-            try:
-                print("Creating model...")
-                self.proxy_model.set_params(
-                    params=best_trial.config, set_by='optimizer')
-                best_model = self.proxy_model.create_model()
-                weights = os.path.join(
-                    best_trial.logdir, best_trial.last_result["checkpoint"])
-                print("Loading from", weights)
-                # TODO Validate this loaded model.
-                best_model.load_weights(weights)
-                break
-            except Exception as e:
-                print(e)
-                print("Loading failed. Trying next model")
+        if cache is not None or store is not None:
+            cache_key = _fit_key(self, (x_user, x_questions, y_vals), kwargs)
+        if cache is not None:
+            with span('cache.load'):
+                best_model = cache.load(cache_key, self.proxy_model)
+        experiment_name = None
+        if best_model is None and store is not None:
+            experiment_name = store.create(self.proxy_model.name, cache_key, data_key,
+                                           options=_experiment_options(self.params, kwargs))
+        if best_model is None:
+            ray_verbose = False
+            _ray_log_level = logging.INFO if ray_verbose else logging.ERROR
+            _init_ray(data_bytes=sum(nbytes(a) for a in (x_user, x_questions, y_vals)),
+                      log_to_driver=False, logging_level=_ray_log_level)
+            best_model, self.trials = get_best_model([x_user, x_questions], y_vals, proxy_model=self.proxy_model,
+                                                     primal_data={'y_pred': y_vals},
+                                                     attributes=('x_train_user', 'x_train_questions', 'y_'),
+                                                     epochs=kwargs['epochs'], batch_size=kwargs['batch_size'],
+                                                     validation_split=kwargs['validation_split'],
+                                                     return_trials=True, search_space=kwargs['search_space'],
+                                                     search=kwargs['search'], max_trials=kwargs['max_trials'],
+                                                     time_budget_s=kwargs['time_budget_s'],
+                                                     scheduler=kwargs['scheduler'],
+                                                     report_every=kwargs['report_every'],
+                                                     cpus_per_trial=kwargs['cpus_per_trial'],
+                                                     checkpoint_dir=kwargs['checkpoint_dir'],
+                                                     metric=self.metric, metric_mode=self.metric_mode,
+                                                     store=store, experiment_name=experiment_name)
+            ## Trials run in other processes; keep the loss curves for plot(),
+            ## from the best trial of either run of a resumed fit.
+            if store is not None:
+                results = [record['result'] for record in store.trials(experiment_name)]
+            else:
+                results = [trial.last_result for trial in self.trials]
+            best_result = _best_result(results, self.metric, mode=self.metric_mode)
+            if best_result is not None:
+                from keras.callbacks import History
+                self.history = History()
+                self.history.history = best_result.get('history', {})
+            if cache is not None and best_model is not None:
+                with span('cache.save'):
+                    cache.save(cache_key, self.proxy_model, best_model)
         exe_time = time.time()-t1
         self.model = best_model
 
@@ -171,6 +248,7 @@ class IrtKerasRegressor():
         self.guessing = self.coefficients()['guessing_param']
         self.slip = self.coefficients()['slip_param']
 
+        import keras.backend as K
         num_trainables = np.sum([K.count_params(layer)
                                  for layer in self.model.trainable_weights])
         sample_size = y_vals.shape[0]
@@ -190,6 +268,7 @@ class IrtKerasRegressor():
         return self
 
     def plot(self):
+        import matplotlib.pyplot as plt
         plt.plot(self.history.history['loss'])
         plt.plot(self.history.history['val_loss'])
         plt.title('Model loss for "{} model" '.format(self.proxy_model.name))
@@ -223,12 +302,8 @@ class IrtKerasRegressor():
         return coef
 
     def predict(self, x_user, x_questions):
-        if len(x_user.shape) != len(self.proxy_model.x_train_user.shape) or len(x_questions.shape) != len(self.proxy_model.x_train_user.shape):
-            raise ValueError("While checking User/Question input shape, Expected users to have shape(None,{}) and questions to have shape(None,{})".format(
-                self.proxy_model.x_train_user.shape[1], self.proxy_model.x_train_questions.shape[1]))
-        if x_user.shape[1] != self.proxy_model.x_train_user.shape[1] or x_questions.shape[1] != self.proxy_model.x_train_questions.shape[1]:
-            raise ValueError("User/Question seem to be an anomaly to current training dataset; Expected Users to have shape(None,{}) and Questions to have shape(None,{})".format(
-                self.proxy_model.x_train_user.shape[1], self.proxy_model.x_train_questions.shape[1]))
+        x_user, _ = _irt_ids(x_user, 'users', n=self.proxy_model.n_users)
+        x_questions, _ = _irt_ids(x_questions, 'questions', n=self.proxy_model.n_items)
         pred = self.model.predict([x_user, x_questions])
         return pred
 
@@ -269,6 +344,8 @@ class SklearnTfTransformer():
 
     """
 
+    refits_primal = False
+
     def __init__(self, proxy_model, primal_model, **kwargs):
         self.primal_model = primal_model
         self.proxy_model = proxy_model
@@ -349,12 +426,82 @@ class SklearnKerasClassifier():
 
     """
 
+    refits_primal = True
+    ## Result trials are ranked on, and whether larger or smaller is better.
+    metric = 'mean_accuracy'
+    metric_mode = 'max'
+    ## Fit options a cached or recorded fit must agree on; see `_fit_key`.
+    key_options = ('cuts_per_feature', 'epochs', 'batch_size', 'search_space', 'search', 'max_trials', 'scheduler',
+                   'report_every', 'warm_start', 'solver', 'fidelity', 'fidelity_metric', 'halving',
+                   'halving_factor')
+
     def __init__(self, proxy_model, primal_model, **kwargs):
         self.primal_model = primal_model
+        self.fitted_primal = kwargs.get('fitted_primal')
         self.params = None  # Temporary!
         self.proxy_model = proxy_model
 
+    @profiled
     def fit(self, X, y, **kwargs):
+        kwargs.setdefault('cache', False)
+        kwargs.setdefault('resume', False)
+        store = get_experiment_store(kwargs['resume'])
+        data_key = None
+        if store is not None and not is_stream(X):
+            with span('fingerprint.data'):
+                data_key = fingerprint(X, y)
+        X, y, primal_data, kwargs = self._prepare_fit(X, y, **kwargs)
+        if isinstance(X, SpooledDataset):
+            ## The rows read from the source, not its path or loader.
+            data_key = X.data_key
+
+        try:
+            cache = get_cache(kwargs['cache'])
+            self.final_model = None
+            self.trials = []
+            if cache is not None or store is not None:
+                data = (X.X, X.y_pred) if isinstance(X, SpooledDataset) else (X, y)
+                cache_key = _fit_key(self, data, kwargs)
+            if cache is not None:
+                with span('cache.load'):
+                    self.final_model = cache.load(cache_key, self.proxy_model)
+            experiment_name = None
+            if self.final_model is None and store is not None:
+                experiment_name = store.create(self.proxy_model.name, cache_key, data_key,
+                                               options=_experiment_options(self.params, kwargs))
+            if self.final_model is None:
+                ## Search for best model using Tune ##
+                self.final_model, self.trials = get_best_model(X, y, proxy_model=self.proxy_model,
+                                                               primal_data=primal_data, epochs=kwargs[
+                                                                   'epochs'], batch_size=kwargs['batch_size'],
+                                                               verbose=kwargs['verbose'], return_trials=True,
+                                                               search_space=kwargs['search_space'],
+                                                               search=kwargs['search'], max_trials=kwargs['max_trials'],
+                                                               time_budget_s=kwargs['time_budget_s'],
+                                                               scheduler=kwargs['scheduler'],
+                                                               report_every=kwargs['report_every'],
+                                                               cpus_per_trial=kwargs['cpus_per_trial'],
+                                                               checkpoint_dir=kwargs['checkpoint_dir'],
+                                                               fidelity=kwargs['fidelity'],
+                                                               fidelity_metric=kwargs['fidelity_metric'],
+                                                               halving=kwargs['halving'],
+                                                               halving_factor=kwargs['halving_factor'],
+                                                               metric=self.metric, metric_mode=self.metric_mode,
+                                                               store=store,
+                                                               experiment_name=experiment_name)
+                if cache is not None and self.final_model is not None:
+                    with span('cache.save'):
+                        cache.save(cache_key, self.proxy_model, self.final_model)
+        finally:
+            release(self.proxy_model)
+        return self.final_model  # Return self? IMPORTANT
+
+    def _prepare_fit(self, X, y, **kwargs):
+        """
+        Fits the primal model and prepares the proxy model for training.
+        Returns the transformed X, y, the primal model's results and the
+        fit options with their defaults filled in.
+        """
         kwargs.setdefault('cuts_per_feature', None)  # Better way to handle?
 
         # For all models?
@@ -362,58 +509,99 @@ class SklearnKerasClassifier():
         kwargs.setdefault('verbose', 0)
         kwargs.setdefault('params', self.params)
         kwargs.setdefault('space', False)
+        kwargs.setdefault('search', 'random')
+        kwargs.setdefault('max_trials', None)
+        kwargs.setdefault('time_budget_s', None)
+        kwargs.setdefault('scheduler', None)
+        kwargs.setdefault('report_every', 1)
+        kwargs.setdefault('cpus_per_trial', 1)
+        kwargs.setdefault('checkpoint_dir', None)
+        kwargs.setdefault('warm_start', False)
+        kwargs.setdefault('solver', 'sgd')
+        kwargs.setdefault('fidelity', None)
+        kwargs.setdefault('fidelity_metric', 'accuracy')
+        kwargs.setdefault('halving', False)
+        kwargs.setdefault('halving_factor', 3)
+        kwargs.setdefault('chunk_size', 10000)
+        kwargs.setdefault('spool_dir', None)
         kwargs.setdefault('epochs', 250)
         kwargs.setdefault('batch_size', 30)
         self.params = kwargs['params']
-        X = np.array(X)
-        y = np.array(y)
-
         primal_model = self.primal_model
-        primal_model.fit(X, y)
-        y_pred = primal_model.predict(X)
+        ## Only streamed fits use the user's fitted primal; do not hold on to it past the first fit.
+        fitted_primal, self.fitted_primal = self.fitted_primal, None
+        if is_stream(X):
+            ## Out of core -- X becomes the spooled inputs and targets.
+            if kwargs['halving']:
+                raise ValueError('halving is not supported for streamed data.')
+            if fitted_primal is not None:
+                ## Predict with the primal the user fitted rather than refit it on the first rows.
+                primal_model = self.primal_model = _clone_primal(fitted_primal, refit=False)
+            with span('stream.spool'):
+                X = spool(X, y, primal_model, self.proxy_model.transform_data,
+                          chunk_size=kwargs['chunk_size'], directory=kwargs['spool_dir'])
+            X_sample, y, y_pred = X.sample
+        else:
+            X = as_array(X)
+            y = as_array(y)
 
-        X, y, y_pred = self.proxy_model.transform_data(X, y, y_pred)
+            with span('primal.fit'):
+                primal_model.fit(X, y)
+            with span('primal.predict'):
+                y_pred = primal_model.predict(X)
+
+            X = as_floatx(X)
+            with span('proxy.transform_data'):
+                X, y, y_pred = self.proxy_model.transform_data(X, y, y_pred)
+            y, y_pred = as_floatx(y), as_floatx(y_pred)
+            X_sample = X
 
         # This should happen only after transformation.
-        self.proxy_model.X = X  # abstract -> model_skeleton
+        self.proxy_model.X = X_sample  # abstract -> model_skeleton
         self.proxy_model.y = y
+        self.proxy_model.spooled = X if isinstance(X, SpooledDataset) else None
         self.proxy_model.primal = self.primal_model
+        self.proxy_model.warm_start = kwargs['warm_start']
+        self.proxy_model.solver = _check_solver(self.proxy_model, kwargs['solver'])
 
         if self.params != None:  # Validate implementation with different types of tune input
             if not isinstance(self.params, dict):
                 raise TypeError("Params should be of type 'dict'")
             self.params = _parse_params(self.params, return_as='flat')
             self.proxy_model.update_params(self.params)
+        kwargs['search_space'] = get_search_space(
+            self.proxy_model, kwargs['space'], params=self.params,
+            exclude=() if kwargs['cuts_per_feature'] is None else ('cuts_per_feature',))
+        if kwargs['solver'] != 'sgd' and kwargs['search_space']:
+            raise ValueError("solver='%s' runs no trials; its params cannot be searched." % kwargs['solver'])
 
         primal_data = {  # Consider renaming -- primal_model_data or primal_results
             'y_pred': y_pred,
             'model_name': primal_model.__class__.__name__
         }
-
-        ## Search for best model using Tune ##
-        self.final_model = get_best_model(X, y, proxy_model=self.proxy_model,
-                                          primal_data=primal_data, epochs=kwargs[
-                                              'epochs'], batch_size=kwargs['batch_size'],
-                                          verbose=kwargs['verbose'])
-        return self.final_model  # Return self? IMPORTANT
+        return X, y, primal_data, kwargs
 
     def save(self, filename=None):
         if filename == None:
             raise ValueError(
                 'Name Error: to save the model you need to specify the filename')
 
-        pickle.dump(self.final_model, open(filename + '.pkl', 'wb'))
+        import onnxmltools
+        with span('save.pickle'):
+            pickle.dump(self.final_model, open(filename + '.pkl', 'wb'))
 
-        self.final_model.save(filename + '.h5')
+        with span('save.h5'):
+            self.final_model.save(filename + '.h5')
 
-        onnx_model = onnxmltools.convert_keras(self.final_model)
-        onnxmltools.utils.save_model(onnx_model, filename + '.onnx')
+        with span('save.onnx'):
+            onnx_model = onnxmltools.convert_keras(self.final_model)
+            onnxmltools.utils.save_model(onnx_model, filename + '.onnx')
 
     def score(self, X, y, **kwargs):
         if self.proxy_model.enc is not None:
             # Should we accept pandas?
-            y = np.array(y)
-            X = np.array(X)
+            y = as_array(y)
+            X = as_floatx(X)
             if len(y.shape) == 1 or y.shape[1] == 1:
                 y = self.proxy_model.enc.transform(y.reshape(-1, 1))
                 y = y.toarray()  # Cross check with logistic regression flow
@@ -424,7 +612,7 @@ class SklearnKerasClassifier():
         return score
 
     def predict(self, X):
-        X = np.array(X)
+        X = as_floatx(X)
         if hasattr(self.final_model, 'predict_classes'):
             pred = self.final_model.predict_classes(X)
         else:
@@ -482,41 +670,154 @@ class SklearnKerasRegressor():
 
     """
 
+    refits_primal = True
+    ## Accuracy means nothing on continuous targets; trials are ranked on their loss.
+    metric = 'mean_loss'
+    metric_mode = 'min'
+    ## Fit options a cached or recorded fit must agree on; see `_fit_key`.
+    key_options = ('epochs', 'batch_size', 'search_space', 'search', 'max_trials', 'scheduler', 'report_every',
+                   'warm_start', 'solver', 'fidelity', 'fidelity_metric', 'halving', 'halving_factor')
+
     def __init__(self, proxy_model, primal_model, **kwargs):
         self.primal_model = primal_model
+        self.fitted_primal = kwargs.get('fitted_primal')
         self.proxy_model = proxy_model
         self.params = None
 
+    @profiled
     def fit(self, X, y=None, **kwargs):
-        self.proxy_model.X = X
-        self.proxy_model.y = y
-        self.proxy_model.primal = self.primal_model
+        kwargs.setdefault('cache', False)
+        kwargs.setdefault('resume', False)
+        store = get_experiment_store(kwargs['resume'])
+        data_key = None
+        if store is not None and not is_stream(X):
+            with span('fingerprint.data'):
+                data_key = fingerprint(X, y)
+        X, y, primal_data, kwargs = self._prepare_fit(X, y, **kwargs)
+        if isinstance(X, SpooledDataset):
+            ## The rows read from the source, not its path or loader.
+            data_key = X.data_key
+
+        try:
+            cache = get_cache(kwargs['cache'])
+            self.final_model = None
+            self.trials = []
+            if cache is not None or store is not None:
+                data = (X.X, X.y_pred) if isinstance(X, SpooledDataset) else (X, y)
+                cache_key = _fit_key(self, data, kwargs)
+            if cache is not None:
+                with span('cache.load'):
+                    self.final_model = cache.load(cache_key, self.proxy_model)
+            experiment_name = None
+            if self.final_model is None and store is not None and kwargs['solver'] == 'sgd':
+                experiment_name = store.create(self.proxy_model.name, cache_key, data_key,
+                                               options=_experiment_options(self.params, kwargs))
+            if self.final_model is None and kwargs['solver'] == 'lstsq':
+                ## Solved in closed form by create_model -- no trials to run.
+                with span('proxy.solve'):
+                    self.final_model = self.proxy_model.create_model()
+            if self.final_model is None:
+                self.final_model, self.trials = get_best_model(X, y, proxy_model=self.proxy_model,
+                                                               primal_data=primal_data,
+                                                               epochs=kwargs['epochs'], batch_size=kwargs['batch_size'],
+                                                               verbose=kwargs['verbose'], return_trials=True,
+                                                               search_space=kwargs['search_space'],
+                                                               search=kwargs['search'], max_trials=kwargs['max_trials'],
+                                                               time_budget_s=kwargs['time_budget_s'],
+                                                               scheduler=kwargs['scheduler'],
+                                                               report_every=kwargs['report_every'],
+                                                               cpus_per_trial=kwargs['cpus_per_trial'],
+                                                               checkpoint_dir=kwargs['checkpoint_dir'],
+                                                               fidelity=kwargs['fidelity'],
+                                                               fidelity_metric=kwargs['fidelity_metric'],
+                                                               halving=kwargs['halving'],
+                                                               halving_factor=kwargs['halving_factor'],
+                                                               metric=self.metric, metric_mode=self.metric_mode,
+                                                               store=store,
+                                                               experiment_name=experiment_name)
+                if cache is not None and self.final_model is not None:
+                    with span('cache.save'):
+                        cache.save(cache_key, self.proxy_model, self.final_model)
+        finally:
+            release(self.proxy_model)
+        return self.final_model  # Not necessary.
+
+    def _prepare_fit(self, X, y=None, **kwargs):
+        """
+        Fits the primal model and prepares the proxy model for training.
+        Returns X, y, the primal model's results and the fit options with
+        their defaults filled in.
+        """
         kwargs.setdefault('verbose', 0)
+        kwargs.setdefault('space', False)
+        kwargs.setdefault('search', 'random')
+        kwargs.setdefault('max_trials', None)
+        kwargs.setdefault('time_budget_s', None)
+        kwargs.setdefault('scheduler', None)
+        kwargs.setdefault('report_every', 1)
+        kwargs.setdefault('cpus_per_trial', 1)
+        kwargs.setdefault('checkpoint_dir', None)
+        kwargs.setdefault('warm_start', False)
+        kwargs.setdefault('solver', 'sgd')
+        kwargs.setdefault('fidelity', None)
+        kwargs.setdefault('fidelity_metric', 'ccc')
+        kwargs.setdefault('halving', False)
+        kwargs.setdefault('halving_factor', 3)
+        kwargs.setdefault('chunk_size', 10000)
+        kwargs.setdefault('spool_dir', None)
         kwargs.setdefault('epochs', 250)
         kwargs.setdefault('batch_size', 30)
         kwargs.setdefault('params', self.params)
         self.params = kwargs['params']
+        self.proxy_model.warm_start = kwargs['warm_start']
+        self.proxy_model.solver = _check_solver(self.proxy_model, kwargs['solver'])
 
         if self.params != None:  # Validate implementation with different types of tune input
             if not isinstance(self.params, dict):
                 raise TypeError("Params should be of type 'dict'")
             self.params = _parse_params(self.params, return_as='flat')
             self.proxy_model.update_params(self.params)
+        kwargs['search_space'] = get_search_space(self.proxy_model, kwargs['space'], params=self.params)
+        if kwargs['solver'] != 'sgd' and kwargs['search_space']:
+            raise ValueError("solver='%s' runs no trials; its params cannot be searched." % kwargs['solver'])
         primal_model = self.primal_model
-        primal_model.fit(X, y)
-        y_pred = primal_model.predict(X)
+        ## Only streamed fits use the user's fitted primal; do not hold on to it past the first fit.
+        fitted_primal, self.fitted_primal = self.fitted_primal, None
+        if is_stream(X):
+            ## Out of core -- X becomes the spooled inputs and targets.
+            if kwargs['halving']:
+                raise ValueError('halving is not supported for streamed data.')
+            if fitted_primal is not None:
+                ## Predict with the primal the user fitted rather than refit it on the first rows.
+                primal_model = self.primal_model = _clone_primal(fitted_primal, refit=False)
+            with span('stream.spool'):
+                X = spool(X, y, primal_model, self.proxy_model.transform_data,
+                          chunk_size=kwargs['chunk_size'], directory=kwargs['spool_dir'])
+            X_sample, y, y_pred = X.sample
+        else:
+            X = as_array(X)
+            y = as_array(y)
+            with span('primal.fit'):
+                primal_model.fit(X, y)
+            with span('primal.predict'):
+                y_pred = primal_model.predict(X)
+            X, y, y_pred = as_floatx(X), as_floatx(y), as_floatx(y_pred)
+            X_sample = X
+        self.proxy_model.X = X_sample
+        self.proxy_model.y = y
+        self.proxy_model.spooled = X if isinstance(X, SpooledDataset) else None
+        ## Targets of the closed-form solve; trials never need them.
+        self.proxy_model.y_pred = y_pred if kwargs['solver'] == 'lstsq' and not isinstance(X, SpooledDataset) \
+            else None
+        self.proxy_model.primal = self.primal_model
         primal_data = {
             'y_pred': y_pred,
             'model_name': primal_model.__class__.__name__
         }
-
-        self.final_model = get_best_model(X, y, proxy_model=self.proxy_model, primal_data=primal_data,
-                                          epochs=kwargs['epochs'], batch_size=kwargs['batch_size'],
-                                          verbose=kwargs['verbose'])
-        return self.final_model  # Not necessary.
+        return X, y, primal_data, kwargs
 
     def score(self, X, y, **kwargs):
-        score = self.final_model.evaluate(X, y, **kwargs)
+        score = self.final_model.evaluate(as_floatx(X), as_floatx(y), **kwargs)
         return score
 
     def predict(self, X):
@@ -525,19 +826,23 @@ class SklearnKerasRegressor():
         1) Write a 'filter_sk_params' function(check keras_regressor wrapper) if necessary.
         2) Data checks and data conversions
         '''
-        pred = self.final_model.predict(X)
+        pred = self.final_model.predict(as_floatx(X))
         return pred
 
     def save(self, filename=None):
         if filename == None:
             raise ValueError(
                 'Name Error: to save the model you need to specify the filename')
-        pickle.dump(self.final_model, open(filename + '.pkl', 'wb'))
+        import onnxmltools
+        with span('save.pickle'):
+            pickle.dump(self.final_model, open(filename + '.pkl', 'wb'))
 
-        self.final_model.save(filename + '.h5')
+        with span('save.h5'):
+            self.final_model.save(filename + '.h5')
 
-        onnx_model = onnxmltools.convert_keras(self.final_model)
-        onnxmltools.utils.save_model(onnx_model, filename + '.onnx')
+        with span('save.onnx'):
+            onnx_model = onnxmltools.convert_keras(self.final_model)
+            onnxmltools.utils.save_model(onnx_model, filename + '.onnx')
 
     def explain(self, **kwargs):
         # @param: SHAP or interpret
@@ -1,18 +1,8 @@
 import numpy as np
-import keras
-from keras import backend as K
 from ..base import registry, BaseModel
 from ..adapters.sklearn import IrtKerasRegressor
-from keras.layers import Dense, Input
-from keras.regularizers import l1_l2
-from keras.models import Model
+from ..optmizers.search import choice
 from ..utils.functions import _parse_params
-from keras.layers import Lambda
-from keras import regularizers
-from keras import initializers
-from keras.layers import Activation
-from keras import metrics
-from dict_deep import *
 #import copy
 
 class GeneralisedIrtModel(BaseModel):
@@ -45,18 +35,35 @@ class GeneralisedIrtModel(BaseModel):
     get_initializers(params):
         Method to update/add kernel initiliazer object passed via model parameters.
 
+    Attributes
+    ----------
+    search_space : dict
+        Params searched when fitting with `space=True`, as paths to domains.
+
+    n_users, n_items : int
+        Number of users and items. The model takes their integer IDs, in
+        [0, n_users) and [0, n_items). Set by the adapter.
 
     """
+    n_users = None
+    n_items = None
+    search_space = {'hyper_params.optimizer': choice(['sgd', 'adam', 'nadam']),
+                    'ability_params.regularizers.l2': choice([0, 1e-4, 1e-3, 1e-2]),
+                    'diff_params.regularizers.l2': choice([0, 1e-4, 1e-3, 1e-2])}
 
     def create_model(self, **kwargs):
+        import keras
+        from keras.layers import Dense, Input, Lambda, Activation
+        from keras.regularizers import l1_l2
+        from keras.models import Model
+        from ..layers.keras import DenseLookup
+
         model_params = _parse_params(self._model_params, return_as='nested')
-        model_params.update(
-            {'input_dims_users': self.x_train_user.shape[1], 'input_dims_items': self.x_train_questions.shape[1]})
+        model_params.update({'input_dims_users': self.n_users, 'input_dims_items': self.n_items})
 
-        user_input_layer = Input(
-            shape=(model_params['input_dims_users'],), name='user_id')
-        quest_input_layer = Input(shape=(
-            model_params['input_dims_items'],), name='questions/items')
+        ## Users and items come in as integer IDs; each parameter is a row lookup.
+        user_input_layer = Input(shape=(1,), dtype='int32', name='user_id')
+        quest_input_layer = Input(shape=(1,), dtype='int32', name='questions/items')
 
         if not self.l_traits == None:
             pass 
@@ -65,31 +72,34 @@ class GeneralisedIrtModel(BaseModel):
             #    kernel_initializer= initializers.RandomNormal(mean=0, stddev=1.0, seed=None),
             #    kernel_regularizer=regularizers.l2(0.01), name='latent_trait')(user_input_layer)
         else:
-            latent_trait = Dense(model_params['ability_params']['units'], use_bias=model_params['ability_params']['use_bias'],
-                                 bias_initializer= model_params['ability_params']['bias'],
-                                 kernel_initializer=model_params['ability_params']['kernel'],
-                                 kernel_regularizer=l1_l2(
-                                        l1=model_params['ability_params']['regularizers']['l1'],
-                                        l2=model_params['ability_params']['regularizers']['l2']),
-                                 name='latent_trait/ability')(user_input_layer)
-
-        difficulty_level = Dense(model_params['diff_params']['units'], use_bias=model_params['diff_params']['use_bias'],
-                                 bias_initializer= model_params['diff_params']['bias'],
-                                 kernel_initializer=model_params['diff_params']['kernel'],
-                                 kernel_regularizer=l1_l2(
-                                        l1=model_params['diff_params']['regularizers']['l1'],
-                                        l2=model_params['diff_params']['regularizers']['l2']),
-                                 name='difficulty_level')(quest_input_layer)
-
-        discrimination_param = Dense(model_params['disc_params']['units'], use_bias=model_params['disc_params']['use_bias'],
-                                     kernel_initializer=model_params['disc_params']['kernel'],
-                                     bias_initializer=model_params['disc_params']['bias'],
-                                     kernel_regularizer=l1_l2(
-                                        l1=model_params['disc_params']['regularizers']['l1'],
-                                        l2=model_params['disc_params']['regularizers']['l2']),
-                                     trainable=model_params['disc_params']['train'],
-                                     activation=model_params['disc_params']['act'],
-                                     name='disc_param')(quest_input_layer)
+            latent_trait = DenseLookup(model_params['input_dims_users'], model_params['ability_params']['units'],
+                                       use_bias=model_params['ability_params']['use_bias'],
+                                       bias_initializer= model_params['ability_params']['bias'],
+                                       kernel_initializer=model_params['ability_params']['kernel'],
+                                       kernel_regularizer=l1_l2(
+                                            l1=model_params['ability_params']['regularizers']['l1'],
+                                            l2=model_params['ability_params']['regularizers']['l2']),
+                                       name='latent_trait/ability')(user_input_layer)
+
+        difficulty_level = DenseLookup(model_params['input_dims_items'], model_params['diff_params']['units'],
+                                       use_bias=model_params['diff_params']['use_bias'],
+                                       bias_initializer= model_params['diff_params']['bias'],
+                                       kernel_initializer=model_params['diff_params']['kernel'],
+                                       kernel_regularizer=l1_l2(
+                                            l1=model_params['diff_params']['regularizers']['l1'],
+                                            l2=model_params['diff_params']['regularizers']['l2']),
+                                       name='difficulty_level')(quest_input_layer)
+
+        discrimination_param = DenseLookup(model_params['input_dims_items'], model_params['disc_params']['units'],
+                                           use_bias=model_params['disc_params']['use_bias'],
+                                           kernel_initializer=model_params['disc_params']['kernel'],
+                                           bias_initializer=model_params['disc_params']['bias'],
+                                           kernel_regularizer=l1_l2(
+                                                l1=model_params['disc_params']['regularizers']['l1'],
+                                                l2=model_params['disc_params']['regularizers']['l2']),
+                                           trainable=model_params['disc_params']['train'],
+                                           activation=model_params['disc_params']['act'],
+                                           name='disc_param')(quest_input_layer)
 
         disc_latent_interaction = keras.layers.Multiply(
             name='lambda_latent_inter.')([discrimination_param, latent_trait])
@@ -103,7 +113,8 @@ class GeneralisedIrtModel(BaseModel):
         sigmoid_layer = Activation(
             'sigmoid', name='Sigmoid_func')(alpha_lambda_add)
 
-        guess_param = Dense(model_params['guess_params']['units'], use_bias=model_params['guess_params']['use_bias'],
+        guess_param = DenseLookup(model_params['input_dims_items'], model_params['guess_params']['units'],
+                            use_bias=model_params['guess_params']['use_bias'],
                             kernel_initializer=model_params['guess_params']['kernel'],
                             bias_initializer=model_params['guess_params']['bias'],
                             kernel_regularizer=l1_l2(
@@ -112,7 +123,8 @@ class GeneralisedIrtModel(BaseModel):
                             trainable=model_params['guess_params']['train'],
                             activation=model_params['guess_params']['act'], name='guessing_param')(quest_input_layer)
 
-        slip_param= Dense(model_params['slip_params']['units'], use_bias=model_params['slip_params']['use_bias'],
+        slip_param= DenseLookup(model_params['input_dims_items'], model_params['slip_params']['units'],
+                            use_bias=model_params['slip_params']['use_bias'],
                             kernel_initializer=model_params['slip_params']['kernel'],
                             bias_initializer=model_params['slip_params']['bias'],
                             kernel_regularizer=l1_l2(
@@ -160,6 +172,7 @@ class GeneralisedIrtModel(BaseModel):
         return self._model_params
 
     def tap_update(self, params):
+        from dict_deep import deep_get, deep_set, deep_del
         params_to_tap = self._model_params
         for k, v in params.items():
             if 'kernel' in v and 'kernel_params' not in v:
@@ -182,6 +195,9 @@ class GeneralisedIrtModel(BaseModel):
         return self._adapter
 
     def get_initializers(self, params):
+        import keras
+        from keras import initializers
+        from dict_deep import deep_get, deep_set
         #params_cp= params.copy()
         default_params = {'bias_param':0,  'reg': {'l1': 0, 'l2': 0}}
         backends_li = ['keras', 'pytorch']
@@ -301,12 +317,12 @@ class GeneralisedIrtModel(BaseModel):
 
 @registry.register
 class KerasIrt1PLModel(GeneralisedIrtModel):
-    def __init__(self):
-        self.adapter = IrtKerasRegressor
-        self.module_name = 'mlsquare'
-        self.name = 'rasch'
-        self.version = 'default'
+    adapter = IrtKerasRegressor
+    module_name = 'mlsquare'
+    name = 'rasch'
+    version = 'default'
 
+    def __init__(self):
         model_params = {'ability_params': {'units': 1, 'kernel_params': {}, 'use_bias':False},
                         'diff_params': {'units': 1, 'kernel_params': {}, 'use_bias':False},
                         'disc_params': {'units': 1, 'kernel_params': {'stddev': 0}, 'train':False, 'act':'exponential', 'use_bias':False},
@@ -320,12 +336,12 @@ class KerasIrt1PLModel(GeneralisedIrtModel):
 
 @registry.register
 class KerasIrt2PLModel(GeneralisedIrtModel):
-    def __init__(self):
-        self.adapter = IrtKerasRegressor
-        self.module_name = 'mlsquare'
-        self.name = 'twoPl'
-        self.version = 'default'
+    adapter = IrtKerasRegressor
+    module_name = 'mlsquare'
+    name = 'twoPl'
+    version = 'default'
 
+    def __init__(self):
         model_params = {'ability_params': {'units': 1, 'kernel_params': {}, 'use_bias':False},
                         'diff_params': {'units': 1, 'kernel_params': {}, 'use_bias':False},
                         'disc_params': {'units': 1, 'kernel_params': {}, 'train': True, 'act':'exponential', 'use_bias':False},
@@ -339,11 +355,12 @@ class KerasIrt2PLModel(GeneralisedIrtModel):
 
 @registry.register
 class KerasIrt3PLModel(GeneralisedIrtModel):
+    adapter = IrtKerasRegressor
+    module_name = 'mlsquare'
+    name = 'tpm'
+    version = 'default'
+
     def __init__(self):
-        self.adapter = IrtKerasRegressor
-        self.module_name = 'mlsquare'
-        self.name = 'tpm'
-        self.version = 'default'
         model_params = {'ability_params': {'units': 1, 'kernel_params': {}, 'use_bias':False},
                         'diff_params': {'units': 1, 'kernel_params': {},'use_bias':False},
                         'disc_params': {'units': 1, 'kernel_params': {}, 'train': True, 'act':'exponential', 'use_bias':False},
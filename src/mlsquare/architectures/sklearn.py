@@ -1,17 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from keras.models import Sequential
-from keras.layers import Dense, Input
-from keras.regularizers import l1_l2
+import numbers
+
 import numpy as np
-from keras.models import Model
-from sklearn.preprocessing import OneHotEncoder
 from ..base import registry, BaseModel, BaseTransformer
 from ..adapters.sklearn import SklearnKerasClassifier, SklearnKerasRegressor, SklearnTfTransformer, SklearnPytorchClassifier
-from ..layers.keras import DecisionTree
+from ..optmizers.search import choice, loguniform
 from ..utils.functions import _parse_params
-import tensorflow as tf
-import pandas
+from ..utils.arrays import as_array, as_floatx, floatx, is_sparse
 from abc import abstractmethod
 # from ..losses import lda_loss
 
@@ -39,14 +35,46 @@ class GeneralizedLinearModel(BaseModel):
 	update_params(params)
         Method to update params.
 
+    Attributes
+    ----------
+    search_space : dict
+        Params searched when fitting with `space=True`, as paths to domains.
+
+    warm_start : bool
+        If True, `create_model` initializes the proxy from the fitted primal
+        model (`coef_` and `intercept_` for glms). Set by the adapter.
+
+    solvers : tuple of str
+        Solvers the proxy supports. 'sgd' trains the model in Tune trials;
+        'lstsq' computes its weights in closed form in `create_model`.
+
+    solver : str
+        The solver of the current fit. Set by the adapter.
+
+    spooled : SpooledDataset
+        The on-disk training set of a streamed fit, or None; X and y are
+        then its in-memory sample. Set by the adapter.
+
     """
+    search_space = {'optimizer': choice(['adam', 'nadam', 'rmsprop'])}
+    warm_start = False
+    solvers = ('sgd',)
+    solver = 'sgd'
+    spooled = None
+    y_pred = None
 
     def create_model(self, **kwargs):
+        from keras.models import Sequential
+        from keras.layers import Dense, InputLayer
+        from keras.regularizers import l1_l2
 
         model_params = _parse_params(self._model_params, return_as='nested')
         # Why make it private? Alternate name?
         # Move parsing to base model
         model = Sequential()
+        if is_sparse(self.X):
+            ## Sparse matmul in the first layer rather than densifying each batch.
+            model.add(InputLayer(input_shape=(self.X.shape[1],), sparse=True))
 
         if len(self.y.shape) == 1 or self.y.shape[1] == 1:
         ## Use OHE for all classification algorithms
@@ -64,9 +92,53 @@ class GeneralizedLinearModel(BaseModel):
         model.compile(optimizer=model_params['optimizer'],
                       loss=model_params['loss'],
                       metrics=['accuracy'])
+        if self.warm_start:
+            self._warm_start(model)
+        if self.solver == 'lstsq':
+            self._solve(model)
 
         return model
 
+    def _solve(self, model):
+        """
+        Sets the first layer to the minimizer of the proxy's loss -- the mean
+        squared error to the primal model's predictions plus the layer's l2
+        penalty -- instead of training it.
+        """
+        layer_params = _parse_params(self._model_params, return_as='nested')['layer_1']
+        if layer_params.get('l1'):
+            raise ValueError("solver='lstsq' does not support an l1 penalty; use solver='sgd'.")
+        if self.spooled is not None:
+            X, y = self.spooled.X, self.spooled.y_pred
+        else:
+            X = self.X
+            ## The adapter's predictions, else the primal is asked again.
+            y = self.y_pred if self.y_pred is not None else self.primal.predict(X)
+            y = np.asarray(y).reshape(X.shape[0], -1)
+        coef, intercept = _least_squares(X, y, l2=layer_params.get('l2', 0) * X.shape[0])
+        layer = model.layers[0]
+        kernel, bias = layer.get_weights()
+        layer.set_weights([coef.astype(kernel.dtype), intercept.astype(bias.dtype)])
+
+    def _warm_start(self, model, **kwargs):
+        """
+        Sets the kernel and bias of the first layer from the primal model's
+        `coef_` and `intercept_`, when their shapes fit.
+        """
+        coef = getattr(self.primal, 'coef_', None)
+        if coef is None:
+            return
+        layer = model.layers[0]
+        kernel, bias = layer.get_weights()
+        coef = np.atleast_2d(np.asarray(coef, dtype=kernel.dtype)).T
+        intercept = np.broadcast_to(np.asarray(getattr(self.primal, 'intercept_', 0.0), dtype=bias.dtype),
+                                    (coef.shape[1],))
+        if coef.shape[1] == 1 and kernel.shape[1] == 2:
+            ## Binary classifier with one-hot targets -- one score per class.
+            coef, intercept = np.hstack([-coef, coef]), np.hstack([-intercept, intercept])
+        if coef.shape == kernel.shape:
+            layer.set_weights([coef, intercept])
+
     def set_params(self, **kwargs):
         kwargs.setdefault('params', None)
         kwargs.setdefault('set_by', None)
@@ -124,11 +196,12 @@ class MatrixDecomposition(BaseTransformer):
 
 @registry.register
 class SVD(MatrixDecomposition):
+    adapter = SklearnTfTransformer
+    module_name = 'sklearn'
+    name = 'TruncatedSVD'
+    version = 'default'
+
     def __init__(self):
-        self.adapter = SklearnTfTransformer
-        self.module_name = 'sklearn'
-        self.name = 'TruncatedSVD'
-        self.version = 'default'
         model_params = {'full_matrices': False, 'compute_uv': True, 'name':None}
         self.set_params(params=model_params)
 
@@ -137,13 +210,10 @@ class SVD(MatrixDecomposition):
         return self
 
     def fit_transform(self, X, y=None,**kwargs):
+        import tensorflow as tf
         model_params= _parse_params(self._model_params, return_as='flat')
 
-        #changing to recommended dtype, accomodating dataframe & numpy array
-        X = np.array(X, dtype= np.float32 if str(X.values.dtype)==
-        'float32' else np.float64) if isinstance(X,
-        pandas.core.frame.DataFrame) else np.array(X, dtype= np.float32
-        if str(X.dtype)=='float32' else np.float64)
+        X = as_floatx(X)
 
         n_components= self.primal.n_components#using primal attributes passed from adapter
         n_features = X.shape[1]
@@ -172,22 +242,29 @@ class SVD(MatrixDecomposition):
         return X_transformed
 
     def transform(self, X):
+        import tensorflow as tf
+        X = as_array(X, dtype=self.components_.dtype)
         sess= tf.Session()
         res = sess.run(tf.tensordot(X, self.components_.T, axes=1))
         return res
 
     def inverse_transform(self, X):
+        import tensorflow as tf
+        X = as_array(X, dtype=self.components_.dtype)
         sess= tf.Session()
         res = sess.run(tf.tensordot(X, self.components_, axes=1))
         return res 
 
 @registry.register
 class LogisticRegression(GeneralizedLinearModel):
+    adapter = SklearnKerasClassifier
+    module_name = 'sklearn'  # Rename the variable
+    name = 'LogisticRegression'
+    version = 'default'
+    search_space = {'optimizer': choice(['adam', 'nadam', 'rmsprop']),
+                    'layer_1.l2': choice([0, 1e-4, 1e-3, 1e-2])}
+
     def __init__(self):
-        self.adapter = SklearnKerasClassifier
-        self.module_name = 'sklearn'  # Rename the variable
-        self.name = 'LogisticRegression'
-        self.version = 'default'
         model_params = {'layer_1': {'units': 1, ## Make key name private - '_layer'
                         'l1': 0,
                         'l2': 0,
@@ -242,11 +319,13 @@ class LogisticRegression(GeneralizedLinearModel):
 
 @registry.register
 class LinearRegression(GeneralizedLinearModel):
+    adapter = SklearnKerasRegressor
+    module_name = 'sklearn'
+    name = 'LinearRegression'
+    version = 'default'
+    solvers = ('sgd', 'lstsq')
+
     def __init__(self):
-        self.adapter = SklearnKerasRegressor
-        self.module_name = 'sklearn'
-        self.name = 'LinearRegression'
-        self.version = 'default'
         model_params = {'layer_1': {'units': 1,
                                     'l1': 0,
                                     'l2': 0,
@@ -260,11 +339,15 @@ class LinearRegression(GeneralizedLinearModel):
 
 @registry.register
 class Ridge(GeneralizedLinearModel):
+    adapter = SklearnKerasRegressor
+    module_name = 'sklearn'
+    name = 'Ridge'
+    version = 'default'
+    search_space = {'optimizer': choice(['adam', 'nadam', 'rmsprop']),
+                    'layer_1.l2': loguniform(1e-3, 1)}
+    solvers = ('sgd', 'lstsq')
+
     def __init__(self):
-        self.adapter = SklearnKerasRegressor
-        self.module_name = 'sklearn'
-        self.name = 'Ridge'
-        self.version = 'default'
         model_params = {'layer_1': {'units': 1,
                                     'l1': 0,
                                     'l2': 0.1,  # Should be configurable at tune level. Dependant on input
@@ -278,11 +361,14 @@ class Ridge(GeneralizedLinearModel):
 
 @registry.register
 class Lasso(GeneralizedLinearModel):
+    adapter = SklearnKerasRegressor
+    module_name = 'sklearn'
+    name = 'Lasso'
+    version = 'default'
+    search_space = {'optimizer': choice(['adam', 'nadam', 'rmsprop']),
+                    'layer_1.l1': loguniform(1e-3, 1)}
+
     def __init__(self):
-        self.adapter = SklearnKerasRegressor
-        self.module_name = 'sklearn'
-        self.name = 'Lasso'
-        self.version = 'default'
         model_params = {'layer_1': {'units': 1,
                                     'l1': 0.1,
                                     'l2': 0,
@@ -296,11 +382,15 @@ class Lasso(GeneralizedLinearModel):
 
 @registry.register
 class ElasticNet(GeneralizedLinearModel):
+    adapter = SklearnKerasRegressor
+    module_name = 'sklearn'
+    name = 'ElasticNet'
+    version = 'default'
+    search_space = {'optimizer': choice(['adam', 'nadam', 'rmsprop']),
+                    'layer_1.l1': loguniform(1e-3, 1),
+                    'layer_1.l2': loguniform(1e-3, 1)}
+
     def __init__(self):
-        self.adapter = SklearnKerasRegressor
-        self.module_name = 'sklearn'
-        self.name = 'ElasticNet'
-        self.version = 'default'
         model_params = {'layer_1': {'units': 1,
                                     'l1': 0.1,
                                     'l2': 0.1,
@@ -314,11 +404,14 @@ class ElasticNet(GeneralizedLinearModel):
 
 @registry.register
 class LinearSVC(GeneralizedLinearModel):
+    adapter = SklearnKerasClassifier
+    module_name = 'sklearn'
+    name = 'LinearSVC'
+    version = 'default'
+    search_space = {'optimizer': choice(['adam', 'nadam', 'rmsprop']),
+                    'layer_1.l2': choice([0, 1e-4, 1e-3, 1e-2])}
+
     def __init__(self):
-        self.adapter = SklearnKerasClassifier
-        self.module_name = 'sklearn'
-        self.name = 'LinearSVC'
-        self.version = 'default'
         model_params = {'layer_1': {
                         'l1': 0,
                         'l2': 0,
@@ -329,12 +422,14 @@ class LinearSVC(GeneralizedLinearModel):
 
         self.set_params(params=model_params, set_by='model_init')
 
-    def transform_data(self, X, y, y_pred):
+    def transform_data(self, X, y, y_pred, fit=True):
         ## Should error handling be done at this level?
         if len(y.shape) == 1:  # Test with multiple target shapes
             y = y.reshape(-1, 1)
-        self.enc = OneHotEncoder(handle_unknown='ignore')
-        self.enc.fit(y)
+        if fit or getattr(self, 'enc', None) is None:
+            from sklearn.preprocessing import OneHotEncoder
+            self.enc = OneHotEncoder(handle_unknown='ignore', dtype=floatx())
+            self.enc.fit(y)
         if len(y_pred.shape) == 1:
             y_pred = y_pred.reshape([-1, 1])
         y = self.enc.transform(y)
@@ -346,6 +441,9 @@ class LinearSVC(GeneralizedLinearModel):
 
 class KernelGeneralizedLinearModel(GeneralizedLinearModel):
     def create_model(self, **kwargs):
+        from keras.models import Sequential
+        from keras.layers import Dense, InputLayer
+
         model_params = _parse_params(self._model_params, return_as='nested')
         if len(self.y.shape) == 1 or self.y.shape[1] == 1:
             units = 1
@@ -355,6 +453,8 @@ class KernelGeneralizedLinearModel(GeneralizedLinearModel):
             {'input_dim': self.X.shape[1], 'units': units})
 
         model = Sequential()
+        if is_sparse(self.X):
+            model.add(InputLayer(input_shape=(self.X.shape[1],), sparse=True))
 
         model.add(Dense(units=model_params['layer_1']['kernel_dim'],
                         trainable=False, kernel_initializer='random_normal',  # Connect with sklearn_config
@@ -370,11 +470,14 @@ class KernelGeneralizedLinearModel(GeneralizedLinearModel):
 
 @registry.register
 class SVC(KernelGeneralizedLinearModel):
+    adapter = SklearnKerasClassifier
+    module_name = 'sklearn'
+    name = 'SVC'
+    version = 'default'
+    search_space = {'optimizer': choice(['adam', 'nadam', 'rmsprop']),
+                    'layer_1.kernel_dim': choice([10, 50, 100, 200])}
+
     def __init__(self):
-        self.adapter = SklearnKerasClassifier
-        self.module_name = 'sklearn'
-        self.name = 'SVC'
-        self.version = 'default'
         model_params = {'layer_1': {'kernel_dim': 10,  # Make it 'units' -- Why?
                                     'activation': 'linear'
                                     },
@@ -386,11 +489,13 @@ class SVC(KernelGeneralizedLinearModel):
 
         self.set_params(params=model_params, set_by='model_init')
 
-    def transform_data(self, X, y, y_pred):
+    def transform_data(self, X, y, y_pred, fit=True):
         if len(y.shape) == 1:  # Test with multiple target shapes
             y = y.reshape(-1, 1)
-        self.enc = OneHotEncoder(handle_unknown='ignore')
-        self.enc.fit(y)
+        if fit or getattr(self, 'enc', None) is None:
+            from sklearn.preprocessing import OneHotEncoder
+            self.enc = OneHotEncoder(handle_unknown='ignore', dtype=floatx())
+            self.enc.fit(y)
         if len(y_pred.shape) == 1:
             y_pred = y_pred.reshape([-1, 1])
         y = self.enc.transform(y)
@@ -403,8 +508,13 @@ class SVC(KernelGeneralizedLinearModel):
 class CART(GeneralizedLinearModel):
 
     def create_model(self, **kwargs):
+        from keras.models import Model
+        from keras.layers import Dense, Input
+        from ..layers.keras import DecisionTree
+
         model_params = _parse_params(self._model_params, return_as='nested')
-        cuts_per_feature = self.cuts_per_feature
+        ## Searched cuts, if any, else the ones given to fit.
+        cuts_per_feature = model_params.get('cuts_per_feature') or self.cuts_per_feature
         if cuts_per_feature is None:
             feature_index, count = np.unique(
                 self.primal.tree_.feature, return_counts=True)
@@ -417,15 +527,14 @@ class CART(GeneralizedLinearModel):
 
             cuts_per_feature = list(cuts_per_feature)
 
-        else:
-            cuts_per_feature = self.cuts_per_feature
-
         # if type(cuts_per_feature) not in (list, int):
-        if not isinstance(cuts_per_feature, (list, int)):
+        if not isinstance(cuts_per_feature, (list, numbers.Integral)) or isinstance(cuts_per_feature, bool):
             raise TypeError(
                 'cuts_per_feature should be of type `list` or `int`')
         # elif type(cuts_per_feature) is int:
-        elif isinstance(cuts_per_feature, int):
+        elif isinstance(cuts_per_feature, numbers.Integral):
+            if cuts_per_feature < 1:
+                raise ValueError('`cuts_per_feature` should be a positive integer, got %r' % cuts_per_feature)
             if cuts_per_feature > np.ceil(self.X.shape[0]):
                 cuts_per_feature = [np.ceil(self.X.shape[0]) for i in range(
                     self.X.shape[1])]
@@ -448,18 +557,111 @@ class CART(GeneralizedLinearModel):
         model.compile(optimizer=model_params['optimizer'],
                       loss=model_params['loss'],
                       metrics=['accuracy'])
+        if self.warm_start:
+            self._warm_start(model)
 
         return model
 
+    def _warm_start(self, model, max_bins=2**20):
+        """
+        Starts the cut points of the DecisionTree layer at the primal tree's
+        thresholds, and maps each bin to the class the tree predicts for it.
+        """
+        tree = getattr(self.primal, 'tree_', None)
+        if tree is None:
+            return
+        tree_layer, output_layer = model.layers[1], model.layers[2]
+        X = self.X.tocsc() if is_sparse(self.X) else np.asarray(self.X)
+        cut_points, centers = [], []
+        for feature, weights in enumerate(tree_layer.get_weights()):
+            thresholds = np.sort(tree.threshold[tree.feature == feature])
+            values = X[:, feature].toarray().ravel() if is_sparse(X) else X[:, feature]
+            cuts = _initial_cut_points(thresholds, len(weights), values).astype(weights.dtype)
+            cut_points.append(cuts)
+            ## One point inside each of the len(cuts) + 1 bins.
+            width = max(np.ptp(cuts), 1.0)
+            centers.append(np.concatenate([[cuts[0] - width], (cuts[1:] + cuts[:-1]) / 2, [cuts[-1] + width]]))
+        tree_layer.set_weights(cut_points)
+
+        n_bins = int(np.prod([len(c) for c in centers]))
+        kernel, bias = output_layer.get_weights()
+        if n_bins > max_bins or kernel.shape[0] != n_bins:
+            return
+        ## Bins are ordered as the layer's Kronecker product -- first feature outermost.
+        grid = np.stack([axis.ravel() for axis in np.meshgrid(*centers, indexing='ij')], axis=1)
+        predictions = np.asarray(self.primal.predict(grid), dtype=kernel.dtype).reshape(n_bins, -1)
+        if predictions.shape[1] == kernel.shape[1]:
+            output_layer.set_weights([4.0 * (2.0 * predictions - 1.0), np.zeros_like(bias)])
+
+
+def _least_squares(X, y, l2=0.0, chunk_size=65536):
+    """
+    Solves min ||X w + b - y||^2 + l2 ||w||^2 for (w, b), the intercept
+    unpenalized. The normal equations are accumulated over chunks of
+    `chunk_size` rows, so X is never copied or centered as a whole. A
+    sparse X is not shifted, so that its chunks stay sparse.
+
+    Returns
+    -------
+    (coef, intercept) : tuple
+        Arrays of shape (n_features, n_targets) and (n_targets,).
+    """
+    y = np.asarray(y)
+    if y.ndim == 1:
+        y = y.reshape(-1, 1)
+    n_samples, n_features = X.shape
+    sparse = is_sparse(X)
+    ## Shift by the first chunk's means so centering loses no precision.
+    x_shift = 0.0 if sparse else np.asarray(X[:chunk_size], dtype=np.float64).mean(axis=0)
+    y_shift = np.asarray(y[:chunk_size], dtype=np.float64).mean(axis=0)
+    gram = np.zeros((n_features, n_features))
+    xty = np.zeros((n_features, y.shape[1]))
+    x_sum = np.zeros(n_features)
+    y_sum = np.zeros(y.shape[1])
+    for start in range(0, n_samples, chunk_size):
+        y_chunk = np.asarray(y[start:start + chunk_size], dtype=np.float64) - y_shift
+        if sparse:
+            X_chunk = X[start:start + chunk_size].astype(np.float64)
+            gram += (X_chunk.T * X_chunk).toarray()
+            xty += X_chunk.T * y_chunk
+            x_sum += np.asarray(X_chunk.sum(axis=0)).ravel()
+        else:
+            X_chunk = np.asarray(X[start:start + chunk_size], dtype=np.float64) - x_shift
+            gram += np.dot(X_chunk.T, X_chunk)
+            xty += np.dot(X_chunk.T, y_chunk)
+            x_sum += X_chunk.sum(axis=0)
+        y_sum += y_chunk.sum(axis=0)
+    x_mean, y_mean = x_sum / n_samples, y_sum / n_samples
+    gram -= n_samples * np.outer(x_mean, x_mean)
+    xty -= n_samples * np.outer(x_mean, y_mean)
+    gram[np.diag_indices_from(gram)] += l2
+    coef = np.linalg.lstsq(gram, xty, rcond=None)[0]
+    intercept = y_mean + y_shift - np.dot(x_mean + x_shift, coef)
+    return coef, intercept
+
+
+def _initial_cut_points(thresholds, n_cuts, values):
+    """
+    `n_cuts` sorted cut points: evenly spread among the tree's thresholds,
+    topped up with quantiles of the feature's values.
+    """
+    if len(thresholds) >= n_cuts:
+        return thresholds[np.linspace(0, len(thresholds) - 1, n_cuts).round().astype(int)]
+    quantiles = np.quantile(values, np.linspace(0, 1, n_cuts - len(thresholds) + 2)[1:-1])
+    return np.sort(np.concatenate([thresholds, quantiles]))
+
 
 @registry.register
 class DecisionTreeClassifier(CART):
+    adapter = SklearnKerasClassifier
+    module_name = 'sklearn'
+    name = 'DecisionTreeClassifier'
+    version = 'default'
+    search_space = {'optimizer': choice(['adam', 'nadam', 'rmsprop']),
+                    'cuts_per_feature': choice([None, 1, 2, 4, 8])}
+
     def __init__(self):
         self.cuts_per_feature = None
-        self.adapter = SklearnKerasClassifier
-        self.module_name = 'sklearn'
-        self.name = 'DecisionTreeClassifier'
-        self.version = 'default'
         model_params = {
             'layer_3': {'activation': 'sigmoid'},
             'optimizer': 'adam',
@@ -1,7 +1,67 @@
+import threading
 from abc import ABC, abstractmethod
 
 
 
+class ModelDescriptor(object):
+    """
+    A lightweight registry entry describing a proxy model.
+
+    The proxy model itself is built from `factory` only when it is
+    requested, so registering a model costs nothing until it is used.
+    Every request builds a new proxy model; no instance is kept on the
+    descriptor, so sessions never share proxy state or training data.
+
+    Parameters
+    ----------
+    factory : callable
+        Returns a new proxy model instance. Usually the proxy model class.
+
+    module_name : str
+        Name of the primal model's module. Ex - 'sklearn'.
+
+    model_name : str
+        Name of the primal model. Ex - 'LogisticRegression'.
+
+    version : str
+        Version of the proxy model.
+
+    adapter : Adapter class
+        Adapter used to connect the primal and proxy model.
+
+
+    Methods
+    -------
+    build()
+        Returns a new proxy model instance.
+
+    """
+
+    def __init__(self, factory, module_name, model_name, version, adapter):
+        self.factory = factory
+        self.module_name = module_name
+        self.model_name = model_name
+        self.version = version
+        self.adapter = adapter
+
+    def build(self):
+        return self.factory()
+
+    ## Keeps `proxy_model, adapter = registry[key][version]` working.
+    def __iter__(self):
+        return iter((self.build(), self.adapter))
+
+    def __getitem__(self, index):
+        ## The adapter alone does not build a proxy model.
+        if index in (1, -1):
+            return self.adapter
+        return (self.build(), self.adapter)[index]
+
+    def __repr__(self):
+        return "ModelDescriptor(module_name=%r, model_name=%r, version=%r)" % (
+            self.module_name, self.model_name, self.version)
+
+
 class Registry(object):
     """
 	This class is used to maintain a registry.
@@ -9,13 +69,21 @@ class Registry(object):
     Parameters
     ----------
     data : dict
-        This variable holds the registry details.
+        This variable holds the registry details. Maps (module_name, model_name)
+        to a dict of {version: ModelDescriptor}.
 
 
     Methods
     -------
 	register(model)
-        Use this method to register a model in registry
+        Use this method to register a model in registry. The model is
+        not instantiated until it is looked up.
+
+    Notes
+    -----
+    The registry is safe to use from multiple threads. It only holds
+    descriptors, and each lookup builds a fresh proxy model, so every
+    `dope()` session owns its proxy and the training data attached to it.
 
     """
 
@@ -23,17 +91,21 @@ class Registry(object):
     def __init__(self):
         # Variable name options -- model_data or model_info
         self.data = {}
+        self._lock = threading.Lock()
 
     def register(self, model):
-        model = model()
-        adapter = model.adapter
-        module_name = model.module_name
-        model_name = model.name
-        version = model.version
-        try: ## Improve this flow.
-            self.data[(module_name, model_name)].update({version:[model, adapter]})
-        except KeyError:
-            self.data[(module_name, model_name)] = {version:[model, adapter]}
+        identity = [getattr(model, attr, None) for attr in ('module_name', 'name', 'version', 'adapter')]
+        if all(isinstance(value, str) for value in identity[:3]) and isinstance(identity[3], type):
+            descriptor = ModelDescriptor(model, *identity)
+        else:
+            ## Models that only set their identity in __init__ have to be built to be read.
+            instance = model()
+            descriptor = ModelDescriptor(model, instance.module_name, instance.name,
+                                         instance.version, instance.adapter)
+        with self._lock:
+            self.data.setdefault((descriptor.module_name, descriptor.model_name),
+                                 {}).update({descriptor.version: descriptor})
+        return model
 
 
     def __getitem__(self, key):
@@ -100,7 +172,7 @@ class BaseModel(ABC):
 	def adapter(self, obj):
 		self._adapter = obj
 
-	def transform_data(self, X, y, y_pred):
+	def transform_data(self, X, y, y_pred, fit=True):
 		return X, y, y_pred
 
 class BaseTransformer(ABC):
@@ -1,10 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import copy
 import sys
-from .utils.functions import _get_model_name, _get_module_name
+from .utils.functions import _get_model_name, _get_module_name, _clone_primal
 from .base import registry
+from .utils.profiling import span
+from .utils.streaming import _is_fitted
 
 def dope(primal_model, proxy_model=None, adapter=None, **kwargs): ## Rename model to primal_model?
     """Transpiles a given model to it's DNN equivalent.
@@ -25,6 +26,13 @@ def dope(primal_model, proxy_model=None, adapter=None, **kwargs): ## Rename mode
     version : str, optional
         Choice of version of proxy model. Default is 'default'.
 
+    Notes
+    -----
+    `dope` is thread-safe. Each call builds its own proxy model from the
+    registry, so adapters returned by concurrent or repeated calls never
+    share proxy state. A `proxy_model` passed in explicitly is used as is
+    and should not be handed to more than one call at a time.
+
     Raises
     ------
     TypeError
@@ -50,20 +58,28 @@ def dope(primal_model, proxy_model=None, adapter=None, **kwargs): ## Rename mode
         module_name = _get_module_name(primal_model)
         model_name = _get_model_name(primal_model)
 
-        primal = copy.deepcopy(primal_model) # Needed as a copy?
         if proxy_model == None and adapter == None:
             try:
-                proxy_model, adapter = registry[(module_name, model_name)][model_version]
+                descriptor = registry[(module_name, model_name)][model_version]
             except KeyError:
                 # raise TypeError('Model type `%s` is not supported by mlsquare yet.' % (type(primal_model)))
                 raise TypeError('Unsupported model or version. Please check your model type and version' % (type(primal_model)))
+            with span('dope.build_proxy'):
+                proxy_model, adapter = descriptor.build(), descriptor.adapter
         elif proxy_model != None and adapter == None:
             raise ValueError('Please pass a valid adapter for your primal model')
         elif proxy_model == None and adapter != None:
             raise ValueError('Please pass a valid primal model with your adapter')
 
+        ## Adapters that refit the primal only need its hyper-parameters.
+        with span('dope.clone_primal'):
+            primal = _clone_primal(primal_model, refit=getattr(adapter, 'refits_primal', None))
+        adapter_kwargs = {}
+        if getattr(adapter, 'refits_primal', None) and _is_fitted(primal_model):
+            ## Streamed fits predict with the primal as the user fitted it.
+            adapter_kwargs['fitted_primal'] = primal_model
         print("Transpiling your model to it's Deep Neural Network equivalent...", file=sys.stderr)
-        model = adapter(proxy_model=proxy_model, primal_model=primal)
+        model = adapter(proxy_model=proxy_model, primal_model=primal, **adapter_kwargs)
 
         return model
     else:
@@ -71,5 +87,111 @@ def dope(primal_model, proxy_model=None, adapter=None, **kwargs): ## Rename mode
             kwargs['using']), file=sys.stderr)
         return primal_model
 
+def dope_many(jobs, **kwargs):
+    """Transpiles and fits several models, sharing one Ray cluster.
+
+    The trials of every job are scheduled together on one trial runner,
+    so total wall time follows the cluster's capacity rather than the sum
+    of the individual fits.
+
+    Parameters
+    ----------
+    jobs : iterable
+        (primal_model, X, y, params) tuples. `params` may be None.
+
+    version : str, optional
+        Choice of version of proxy models. Default is 'default'.
+
+    epochs, batch_size, verbose, warm_start, solver, fidelity, fidelity_metric : optional
+        Fit options applied to every job. Jobs solved in closed form
+        (solver='lstsq') run no trials and are yielded first.
+
+    space, search, max_trials, time_budget_s, scheduler, report_every, cpus_per_trial, checkpoint_dir : optional
+        Hyper-parameter search options applied to every job, as for fit.
+        `max_trials` applies to each job and `time_budget_s` to the whole
+        batch. search='tpe', halving, cache and resume are not supported
+        here; to profile a batch, run it inside `with profile():`. Each
+        job's trials are ranked on its adapter's metric -- accuracy for
+        classifiers, loss for regressors -- and a scheduler, shared by the
+        batch, needs all jobs to rank alike.
+
+    Raises
+    ------
+    TypeError
+        If a primal model's adapter does not support batch fitting.
+
+    ValueError
+        If search='tpe', halving, cache, resume or profile is asked for,
+        or a scheduler for jobs ranked on different metrics.
+
+    Yields
+    ------
+    (index, model) : tuple
+        Position of the job in `jobs` and its fitted, transpiled model,
+        in the order the jobs finish.
+    """
+    from .optmizers.tune import _make_experiment, _make_scheduler, _run_experiments, _restore_best_model, \
+        _reward_attr
+    from .utils.streaming import release
+
+    for option in ('cache', 'resume', 'profile'):
+        if kwargs.get(option) not in (None, False):
+            raise ValueError("%s is not supported by dope_many; use fit() instead." % option)
+    version = kwargs.pop('version', 'default')
+    sessions = {}
+    experiments = []
+    rewards = set()
+    for index, (primal_model, X, y, params) in enumerate(jobs):
+        model = dope(primal_model, version=version)
+        if not hasattr(model, '_prepare_fit'):
+            raise TypeError('Batch fitting is not supported for `%s` models.' % (
+                _get_model_name(primal_model)))
+        X, y, primal_data, fit_kwargs = model._prepare_fit(X, y, params=params, **kwargs)
+        if fit_kwargs['halving']:
+            raise ValueError("halving runs one model at a time; use fit() instead.")
+        if fit_kwargs['solver'] != 'sgd':
+            model.trials = []
+            model.final_model = model.proxy_model.create_model()
+            release(model.proxy_model)
+            yield index, model
+            continue
+        experiment, search_alg = _make_experiment(X, y, proxy_model=model.proxy_model, primal_data=primal_data,
+                                                  epochs=fit_kwargs['epochs'], batch_size=fit_kwargs['batch_size'],
+                                                  verbose=fit_kwargs['verbose'],
+                                                  search_space=fit_kwargs['search_space'],
+                                                  search=fit_kwargs['search'], max_trials=fit_kwargs['max_trials'],
+                                                  report_every=fit_kwargs['report_every'],
+                                                  cpus_per_trial=fit_kwargs['cpus_per_trial'],
+                                                  checkpoint_dir=fit_kwargs['checkpoint_dir'],
+                                                  fidelity=fit_kwargs['fidelity'],
+                                                  fidelity_metric=fit_kwargs['fidelity_metric'],
+                                                  metric=model.metric, metric_mode=model.metric_mode)
+        if search_alg is not None:
+            raise ValueError("search='%s' runs one model at a time; use fit() instead." % fit_kwargs['search'])
+        rewards.add(_reward_attr(model.metric, model.metric_mode))
+        if kwargs.get('scheduler') is not None and len(rewards) > 1:
+            raise ValueError("A scheduler cannot compare trials ranked on %s; fit them in separate batches."
+                             % ' and '.join(sorted(rewards)))
+        sessions[experiment.spec['run']] = (index, model)
+        experiments.append(experiment)
+
+    if not experiments:
+        return
+    scheduler = kwargs.get('scheduler')
+    if scheduler is not None:
+        ## All jobs rank alike, as checked above. Options of the whole batch, not of
+        ## its last job; 250 epochs is the adapters' default.
+        reward, = rewards
+        scheduler = _make_scheduler(scheduler, kwargs.get('epochs', 250), kwargs.get('report_every', 1),
+                                    metric=reward)
+    for name, trials in _run_experiments(experiments, scheduler=scheduler, max_trials=kwargs.get('max_trials'),
+                                         time_budget_s=kwargs.get('time_budget_s')):
+        index, model = sessions.pop(name)
+        model.trials = trials
+        model.final_model = _restore_best_model(trials, model.proxy_model, metric=model.metric,
+                                                mode=model.metric_mode)
+        release(model.proxy_model)
+        yield index, model
+
 # TODO
 # Update proxy and primal in adapters and optim
\ No newline at end of file
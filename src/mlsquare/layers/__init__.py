@@ -1 +1 @@
-from .keras import DecisionTree, Bin, KronProd
+from .keras import DecisionTree, Bin, KronProd, DenseLookup
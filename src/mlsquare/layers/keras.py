@@ -185,6 +185,89 @@ class DecisionTree(Layer):
     def compute_output_shape(self, input_shape):
         return (input_shape[0], self.output_dim[1])
 
+
+class DenseLookup(Layer):
+
+    """
+    A Dense layer for one-hot inputs given as integer IDs.
+
+    For the ID of a row, the layer looks up that row of its kernel, adds
+    the bias and applies the activation -- what Dense computes on the
+    one-hot row, without ever building it. Memory follows the number of
+    rows times `units` rather than rows times `input_dim`, and only the
+    looked-up rows of the kernel get gradients.
+
+    The weights (kernel of shape (input_dim, units), then bias) and the
+    config keys are those of Dense, so parameters read the same either way.
+
+    Parameters
+    ----------
+        input_dim: int
+        Number of distinct IDs; IDs lie in [0, input_dim).
+
+        units: int
+        Dimensionality of the output.
+
+        activation, use_bias, kernel_initializer, bias_initializer, kernel_regularizer:
+        As for Dense.
+
+    Input
+    -----
+        2D integer tensor with shape: `(batch_size, 1)`.
+
+    Output
+    ------
+        2D tensor with shape: `(batch_size, units)`.
+    """
+
+    def __init__(self, input_dim, units, activation=None, use_bias=True, kernel_initializer='glorot_uniform',
+                 bias_initializer='zeros', kernel_regularizer=None, **kwargs):
+        from keras import activations, initializers, regularizers
+        self.input_dim = int(input_dim)
+        self.units = int(units)
+        self.activation = activations.get(activation)
+        self.use_bias = use_bias
+        self.kernel_initializer = initializers.get(kernel_initializer)
+        self.bias_initializer = initializers.get(bias_initializer)
+        self.kernel_regularizer = regularizers.get(kernel_regularizer)
+        super(DenseLookup, self).__init__(**kwargs)
+
+    def build(self, input_shape):
+        self.kernel = self.add_weight(name='kernel',
+                                      shape=(self.input_dim, self.units),
+                                      initializer=self.kernel_initializer,
+                                      regularizer=self.kernel_regularizer)
+        self.bias = None
+        if self.use_bias:
+            self.bias = self.add_weight(name='bias',
+                                        shape=(self.units,),
+                                        initializer=self.bias_initializer)
+        super(DenseLookup, self).build(input_shape)
+
+    def call(self, x):
+        from keras import backend as K
+        output = K.gather(self.kernel, K.flatten(K.cast(x, 'int32')))
+        if self.use_bias:
+            output = K.bias_add(output, self.bias)
+        if self.activation is not None:
+            output = self.activation(output)
+        return output
+
+    def compute_output_shape(self, input_shape):
+        return (input_shape[0], self.units)
+
+    def get_config(self):
+        from keras import activations, initializers, regularizers
+        config = {'input_dim': self.input_dim,
+                  'units': self.units,
+                  'activation': activations.serialize(self.activation),
+                  'use_bias': self.use_bias,
+                  'kernel_initializer': initializers.serialize(self.kernel_initializer),
+                  'bias_initializer': initializers.serialize(self.bias_initializer),
+                  'kernel_regularizer': regularizers.serialize(self.kernel_regularizer)}
+        base_config = super(DenseLookup, self).get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
 ## TODO
 # Default cutpoints - ceiling operation
 # Error handling in layers
@@ -1 +1,5 @@
-from .tune import get_best_model
\ No newline at end of file
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from .tune import get_best_model
+from .session import RaySession, get_session, set_session
+from .experiments import ExperimentStore, lookup
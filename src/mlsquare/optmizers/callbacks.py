@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Keras callbacks used inside Tune trials.
+"""
+import time
+
+from keras.callbacks import Callback
+
+## Tune result name -> names Keras may log it under.
+RESULT_NAMES = {'mean_accuracy': ('acc', 'accuracy'),
+                'mean_error': ('mean_absolute_error', 'mae'),
+                'mean_loss': ('loss',)}
+## Results where smaller is better, also reported negated for Tune's schedulers.
+NEGATED_RESULTS = ('mean_error', 'mean_loss')
+
+
+def tune_results(logs):
+    """
+    Tune results from Keras logs or named evaluation scores: the entries
+    of RESULT_NAMES found, and the negation of those in NEGATED_RESULTS.
+    """
+    result = {}
+    for name, keras_names in RESULT_NAMES.items():
+        for keras_name in keras_names:
+            if keras_name in logs:
+                result[name] = float(logs[keras_name])
+                break
+    for name in NEGATED_RESULTS:
+        if name in result:
+            result['neg_' + name] = -result[name]
+    return result
+
+
+class TuneReporter(Callback):
+    """
+    Reports training progress to Tune every `freq` epochs, so trial
+    schedulers can stop unpromising trials early.
+
+    Each report checkpoints the weights through `checkpoint`, so a trial
+    stopped early can still be restored; the checkpoint keeps the weights
+    with the best `metric` reported so far. The last epoch is not
+    reported; the trial reports its final evaluation itself.
+
+    Parameters
+    ----------
+    reporter : callable
+        Tune's reporter of the trial.
+
+    freq : int, optional
+        Number of epochs between reports. Default is 1.
+
+    checkpoint : callable, optional
+        Saves the model at each report and returns the result entries
+        referring to the checkpoint.
+
+    extra : callable, optional
+        Returns further values to report, e.g. memory use.
+
+    metric : str, optional
+        Reported result the checkpoint is scored on, larger being better.
+        Without it every report is checkpointed.
+    """
+
+    def __init__(self, reporter, freq=1, checkpoint=None, extra=None, metric=None):
+        super(TuneReporter, self).__init__()
+        self.reporter = reporter
+        self.freq = max(int(freq), 1)
+        self.checkpoint = checkpoint
+        self.extra = extra
+        self.metric = metric
+
+    def on_train_begin(self, logs=None):
+        self.train_start = time.time()
+        self.checkpoint_time = 0.0
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        if (epoch + 1) % self.freq or epoch + 1 >= self.params.get('epochs', 0):
+            return
+        result = {'epochs_done': epoch + 1}
+        result.update(tune_results(logs))
+        if self.checkpoint is not None:
+            checkpoint_start = time.time()
+            result.update(self.checkpoint(self.model, result.get(self.metric)))
+            self.checkpoint_time += time.time() - checkpoint_start
+        result['fit_time_s'] = time.time() - self.train_start - self.checkpoint_time
+        result['checkpoint_time_s'] = self.checkpoint_time
+        if self.extra is not None:
+            result.update(self.extra())
+        self.reporter(**result)
+
+
+class FidelityStopping(Callback):
+    """
+    Stops training once the proxy agrees with its primal model closely
+    enough, rather than after a fixed number of epochs.
+
+    Parameters
+    ----------
+    target : float
+        Fidelity at which training stops, as measured by
+        `mlsquare.utils.correlations.fidelity`.
+
+    X, primal_pred : array-like
+        Inputs and the primal model's predictions to measure against. At
+        most `max_rows` evenly spaced rows are used.
+
+    metric : str, optional
+        'accuracy', 'relative_mse' or 'ccc'. Default is 'accuracy'.
+
+    freq : int, optional
+        Number of epochs between checks. Default is 1.
+
+    max_rows : int, optional
+        Default is 10000.
+
+    Attributes
+    ----------
+    epochs_done : int
+        Epochs trained so far.
+
+    fidelity : float
+        Fidelity at the last check, or None.
+    """
+
+    def __init__(self, target, X, primal_pred, metric='accuracy', freq=1, max_rows=10000):
+        super(FidelityStopping, self).__init__()
+        step = max(X.shape[0] // max_rows, 1)
+        self.X = X[::step]
+        self.primal_pred = primal_pred[::step]
+        self.target = target
+        self.metric = metric
+        self.freq = max(int(freq), 1)
+        self.epochs_done = 0
+        self.fidelity = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        from ..utils.correlations import fidelity
+        self.epochs_done = epoch + 1
+        if (epoch + 1) % self.freq:
+            return
+        self.fidelity = fidelity(self.primal_pred, self.model.predict(self.X), metric=self.metric)
+        if self.fidelity >= self.target:
+            self.model.stop_training = True
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    On-disk records of tuning experiments, so that interrupted fits resume
+    where they left off and past results can be looked up by dataset.
+"""
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+from ..utils.fingerprint import fingerprint, ChunkedFingerprint
+from ..utils.streaming import is_stream, iter_chunks
+
+
+class ExperimentStore(object):
+    """
+    Finished trials of tuning experiments.
+
+    An experiment is named after the proxy model and a fingerprint of
+    everything that determines the fit -- the primal model, the data, the
+    params and the fit options -- so a fit run again after a crash or a
+    pre-emption finds its own experiment, and two different fits never
+    share one. Each trial that finishes is recorded with its config, its
+    last result and its weights; a resumed fit does not run them again.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Where experiments are stored. Defaults to $MLSQUARE_EXPERIMENTS_DIR
+        or ~/.mlsquare/experiments.
+
+
+    Methods
+    -------
+    create(proxy_name, key, data_key, options=None)
+        Returns the name of the experiment for `key`, recording it if new.
+
+    record(name, config, result, weights)
+        Records a finished trial of the experiment.
+
+    trials(name)
+        Returns the recorded trials of the experiment, as dicts with
+        'config', 'result' and 'weights'.
+
+    lookup(X, y=None)
+        Returns the experiments fitted on the data X, y.
+
+    remove(name)
+        Removes an experiment and its trials.
+
+    """
+
+    info_file = 'experiment.pkl'
+    suffix = '.trial'
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = os.environ.get('MLSQUARE_EXPERIMENTS_DIR',
+                                       os.path.join(os.path.expanduser('~'), '.mlsquare', 'experiments'))
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, name, *parts):
+        return os.path.join(self.directory, name, *parts)
+
+    def _write(self, path, obj):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def create(self, proxy_name, key, data_key, options=None):
+        name = '{}_{}'.format(proxy_name, key[:20])
+        path = self._path(name, self.info_file)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._write(path, {'name': name, 'proxy': proxy_name, 'key': key, 'data_key': data_key,
+                               'options': options or {}, 'created': time.time()})
+        return name
+
+    def record(self, name, config, result, weights):
+        trial_id = result.get('trial_id') or fingerprint(config, time.time())[:12]
+        self._write(self._path(name, str(trial_id) + self.suffix),
+                    {'config': config, 'result': result, 'weights': weights})
+
+    def trials(self, name):
+        directory = self._path(name)
+        if not os.path.isdir(directory):
+            return []
+        records = [self._read(os.path.join(directory, file_name))
+                   for file_name in sorted(os.listdir(directory)) if file_name.endswith(self.suffix)]
+        return [record for record in records if record is not None]
+
+    def lookup(self, X, y=None):
+        """
+        Returns the experiments fitted on X, y -- the data as passed to
+        fit, or the same chunked source, which is read again -- most
+        recent first. Each is a dict with the experiment's
+        'name', 'proxy', 'options', 'created' time and its 'trials'
+        (config and result of each, without weights).
+        """
+        data_key = data_fingerprint(X, y)
+        experiments = []
+        for name in os.listdir(self.directory):
+            info = self._read(self._path(name, self.info_file))
+            if info is None or info.get('data_key') != data_key:
+                continue
+            info['trials'] = [{'config': record['config'], 'result': record['result']}
+                              for record in self.trials(name)]
+            experiments.append(info)
+        return sorted(experiments, key=lambda info: info['created'], reverse=True)
+
+    def remove(self, name):
+        shutil.rmtree(self._path(name), ignore_errors=True)
+
+
+def data_fingerprint(X, y=None):
+    """
+    Identifies the data of a fit: in-memory X, y by their contents, a
+    chunked source by the rows it yields, as the spooled fit records it.
+    """
+    if not is_stream(X):
+        return fingerprint(X, y)
+    digest = ChunkedFingerprint()
+    for X_chunk, y_chunk in iter_chunks(X, target=y):
+        digest.update(X_chunk, y_chunk)
+    return digest.hexdigest()
+
+
+def get_experiment_store(resume):
+    """
+    Resolves the `resume` option accepted by the adapters' fit methods --
+    None/False (experiments are not kept), True (default store), a
+    directory path or an ExperimentStore instance.
+    """
+    if resume is None or resume is False:
+        return None
+    if resume is True:
+        return ExperimentStore()
+    if isinstance(resume, str):
+        return ExperimentStore(directory=resume)
+    if isinstance(resume, ExperimentStore):
+        return resume
+    raise TypeError("resume should be a bool, a directory path or an `ExperimentStore`")
+
+
+def lookup(X, y=None, directory=None):
+    """Returns past experiments fitted on X, y; see `ExperimentStore.lookup`."""
+    return ExperimentStore(directory=directory).lookup(X, y)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Hyper-parameter search spaces for proxy models.
+
+    A search space maps parameter paths to domains. Paths are the keys of
+    the proxy's flat params ('layer_1.l2', 'optimizer'), or dotted paths
+    into nested params ('hyper_params.optimizer'). Proxies declare their
+    default space as a `search_space` class attribute.
+"""
+import copy
+import itertools
+import math
+
+import numpy as np
+
+SEARCH_ALGORITHMS = ('random', 'grid', 'tpe')
+DEFAULT_MAX_TRIALS = 10
+
+
+class _Domain(object):
+    def sample(self, rng=np.random):
+        raise NotImplementedError
+
+    def grid(self):
+        raise NotImplementedError
+
+    def to_hyperopt(self, label):
+        raise NotImplementedError
+
+
+class choice(_Domain):
+    """One of `values`."""
+
+    def __init__(self, values):
+        self.values = list(values)
+
+    def sample(self, rng=np.random):
+        return self.values[rng.randint(len(self.values))]
+
+    def grid(self):
+        return list(self.values)
+
+    def to_hyperopt(self, label):
+        from hyperopt import hp
+        return hp.choice(label, self.values)
+
+    def __repr__(self):
+        return 'choice({!r})'.format(self.values)
+
+
+class uniform(_Domain):
+    """A float in [low, high]; `grid_points` evenly spaced values for grid search."""
+
+    def __init__(self, low, high, grid_points=3):
+        self.low, self.high, self.grid_points = low, high, grid_points
+
+    def sample(self, rng=np.random):
+        return float(rng.uniform(self.low, self.high))
+
+    def grid(self):
+        return [float(v) for v in np.linspace(self.low, self.high, self.grid_points)]
+
+    def to_hyperopt(self, label):
+        from hyperopt import hp
+        return hp.uniform(label, self.low, self.high)
+
+    def __repr__(self):
+        return 'uniform({!r}, {!r})'.format(self.low, self.high)
+
+
+class loguniform(uniform):
+    """A float in [low, high], uniform in log space. Both bounds must be positive."""
+
+    def sample(self, rng=np.random):
+        return float(math.exp(rng.uniform(math.log(self.low), math.log(self.high))))
+
+    def grid(self):
+        return [float(v) for v in np.geomspace(self.low, self.high, self.grid_points)]
+
+    def to_hyperopt(self, label):
+        from hyperopt import hp
+        return hp.loguniform(label, math.log(self.low), math.log(self.high))
+
+    def __repr__(self):
+        return 'loguniform({!r}, {!r})'.format(self.low, self.high)
+
+
+class randint(_Domain):
+    """An integer in [low, high)."""
+
+    def __init__(self, low, high, grid_points=3):
+        self.low, self.high, self.grid_points = low, high, grid_points
+
+    def sample(self, rng=np.random):
+        return int(rng.randint(self.low, self.high))
+
+    def grid(self):
+        return sorted(set(int(v) for v in np.linspace(self.low, self.high - 1, self.grid_points)))
+
+    def to_hyperopt(self, label):
+        from hyperopt import hp
+        return self.low + hp.randint(label, self.high - self.low)
+
+    def __repr__(self):
+        return 'randint({!r}, {!r})'.format(self.low, self.high)
+
+
+def _param_paths(params, prefix=''):
+    paths = []
+    for key, value in params.items():
+        path = prefix + str(key)
+        if isinstance(value, dict) and value:
+            paths.extend(_param_paths(value, path + '.'))
+        else:
+            paths.append(path)
+    return paths
+
+
+def get_search_space(proxy_model, space=True, params=None, exclude=()):
+    """
+    Returns the search space of a fit.
+
+    Parameters
+    ----------
+    proxy_model : proxy model instance
+
+    space : bool or dict, optional
+        True for the proxy's declared `search_space`, False for none, or a
+        dict of paths to domains. Plain lists are searched as choices.
+
+    params : dict, optional
+        Params set by the user; the paths they fix are not searched.
+
+    exclude : iterable of str, optional
+        Further paths not to search.
+
+    Returns
+    -------
+    space : dict
+    """
+    if space is True:
+        space = getattr(proxy_model, 'search_space', None) or {}
+    elif not space:
+        space = {}
+    elif not isinstance(space, dict):
+        raise TypeError("space should be a bool or of type 'dict'")
+    fixed = _param_paths(params or {}) + list(exclude)
+    search_space = {}
+    for path, domain in space.items():
+        if any(path == f or path.startswith(f + '.') or f.startswith(path + '.') for f in fixed):
+            continue
+        if isinstance(domain, (list, tuple)):
+            domain = choice(domain)
+        if not isinstance(domain, _Domain):
+            raise TypeError('The search domain of `%s` should be a list or a domain, got %r' % (path, domain))
+        search_space[path] = domain
+    return search_space
+
+
+def make_search(config, search_space, search='random', max_trials=None, max_concurrent=None,
+                metric='mean_accuracy'):
+    """
+    Sets up a Tune search over `search_space` on top of `config`.
+
+    Random search samples `max_trials` configurations, grid search runs
+    the grid of every domain (capped to `max_trials` when run through
+    `_run_experiments`) and 'tpe' runs hyperopt's Tree-structured Parzen
+    Estimator for `max_trials` trials, maximizing `metric`.
+
+    Returns
+    -------
+    (config, num_samples, search_alg) : tuple
+        The Tune config, the Experiment's num_samples and a Tune search
+        algorithm, which is None unless search is 'tpe'.
+    """
+    from ray import tune
+
+    if search not in SEARCH_ALGORITHMS:
+        raise ValueError('search should be one of %s, got %r' % (SEARCH_ALGORITHMS, search))
+    if not search_space:
+        return config, 1, None
+    config = dict(config)
+    max_trials = max_trials or DEFAULT_MAX_TRIALS
+    if search == 'grid':
+        for path, domain in search_space.items():
+            config[path] = tune.grid_search(domain.grid())
+        return config, 1, None
+    if search == 'random':
+        for path, domain in search_space.items():
+            config[path] = tune.sample_from(lambda spec, domain=domain: domain.sample())
+        return config, max_trials, None
+
+    from ray.tune.suggest import HyperOptSearch
+    space = {path: domain.to_hyperopt(path) for path, domain in search_space.items()}
+    search_alg = HyperOptSearch(space, max_concurrent=max_concurrent or 4, reward_attr=metric)
+    return config, max_trials, search_alg
+
+
+def grid_configs(search_space):
+    """Returns the points of the grid search over `search_space`, as dicts of path to value."""
+    paths = sorted(search_space)
+    return [dict(zip(paths, values))
+            for values in itertools.product(*[search_space[path].grid() for path in paths])]
+
+
+def resolve_config(config):
+    """
+    Returns a copy of a trial's config with dotted keys into nested params
+    ('hyper_params.optimizer') set at their place. Keys of flat params
+    ('layer_1.l2') are kept as they are.
+    """
+    resolved = dict(config)
+    for key in [key for key in config if isinstance(key, str) and '.' in key]:
+        path = key.split('.')
+        if not isinstance(resolved.get(path[0]), dict):
+            continue
+        value = resolved.pop(key)
+        node = resolved
+        for part in path[:-1]:
+            node[part] = copy.copy(node.get(part)) if isinstance(node.get(part), dict) else {}
+            node = node[part]
+        node[path[-1]] = value
+    return resolved
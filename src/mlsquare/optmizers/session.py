@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Management of the Ray cluster used to run tuning trials.
+"""
+import atexit
+import os
+import threading
+
+from ..utils.profiling import span
+
+_lock = threading.RLock()
+_sessions = []
+_default_session = None
+
+
+def _available_cpus():
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    ## Containers usually cap CPU through a cgroup quota rather than affinity.
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            cpus = min(cpus, max(int(int(quota) / int(period)), 1))
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                quota = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+            if quota > 0:
+                cpus = min(cpus, max(quota // period, 1))
+        except (OSError, ValueError):
+            pass
+    return cpus
+
+
+def _available_memory():
+    memory = None
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    memory = int(line.split()[1]) * 1024
+                    break
+    except (OSError, ValueError):
+        pass
+    if memory is None:
+        try:
+            memory = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        except (AttributeError, ValueError, OSError):
+            memory = 4 * 1024**3
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                limit = f.read().strip()
+            if limit != 'max':
+                memory = min(memory, int(limit))
+            break
+        except (OSError, ValueError):
+            continue
+    return memory
+
+
+class RaySession(object):
+    """
+    A Ray cluster connection for tuning trials.
+
+    Resources not given explicitly are sized from the machine (CPU
+    affinity, cgroup quotas and available memory) or from the
+    MLSQUARE_RAY_* environment variables. Ray is started on the first
+    `start()` -- in practice the first fit -- and is shut down by
+    `shutdown()`, on leaving a `with` block or at interpreter exit.
+
+    Parameters
+    ----------
+    num_cpus : int, optional
+        CPUs available to trials. Default is $MLSQUARE_RAY_NUM_CPUS or
+        every CPU this process may use.
+
+    object_store_memory : int, optional
+        Bytes for the object store. Default is
+        $MLSQUARE_RAY_OBJECT_STORE_MEMORY or 30% of available memory.
+
+    redis_max_memory : int, optional
+        Bytes for redis. Default is 10% of available memory, at most 1GB.
+
+    address : str, optional
+        Redis address ('host:port') of a running cluster to attach to
+        instead of starting one. Default is $MLSQUARE_RAY_ADDRESS.
+
+    local_mode : bool or 'auto', optional
+        Run trials serially in this process, avoiding worker start-up and
+        serialization; meant for tiny datasets and debugging. With 'auto',
+        local mode is used when the data passed to `start()` is smaller
+        than `local_mode_max_bytes`. Default is False.
+
+    local_mode_max_bytes : int, optional
+        Data size threshold for local_mode='auto'. Default is 10MB.
+
+    ray_kwargs :
+        Any other keyword arguments are passed to `ray.init`.
+
+
+    Methods
+    -------
+    start(data_bytes=None, **ray_kwargs)
+        Starts or attaches to Ray, if not done yet. Returns the ray module.
+
+    shutdown()
+        Disconnects from Ray, stopping the processes this session started.
+
+    """
+
+    def __init__(self, num_cpus=None, object_store_memory=None, redis_max_memory=None,
+                 address=None, local_mode=False, local_mode_max_bytes=10*1024**2, **ray_kwargs):
+        env = os.environ
+        self.address = address or env.get('MLSQUARE_RAY_ADDRESS') or None
+        self.num_cpus = num_cpus or (int(env['MLSQUARE_RAY_NUM_CPUS'])
+                                     if 'MLSQUARE_RAY_NUM_CPUS' in env else None)
+        self.object_store_memory = object_store_memory or (
+            int(env['MLSQUARE_RAY_OBJECT_STORE_MEMORY']) if 'MLSQUARE_RAY_OBJECT_STORE_MEMORY' in env else None)
+        self.redis_max_memory = redis_max_memory
+        self.local_mode = local_mode
+        self.local_mode_max_bytes = local_mode_max_bytes
+        self.ray_kwargs = ray_kwargs
+        self.started = False
+        self.is_local = False
+        self._owns_ray = False
+        self._lock = threading.Lock()
+
+    def init_kwargs(self, data_bytes=None):
+        """The arguments `start()` passes to `ray.init`."""
+        kwargs = {'ignore_reinit_error': True}
+        if self.address is not None:
+            kwargs['redis_address'] = self.address
+        else:
+            memory = _available_memory()
+            kwargs['num_cpus'] = self.num_cpus or _available_cpus()
+            kwargs['object_store_memory'] = self.object_store_memory or max(int(0.3 * memory), 100 * 1024**2)
+            kwargs['redis_max_memory'] = self.redis_max_memory or min(max(int(0.1 * memory), 50 * 1024**2),
+                                                                      1024**3)
+            local_mode = self.local_mode
+            if local_mode == 'auto':
+                local_mode = data_bytes is not None and data_bytes <= self.local_mode_max_bytes
+            if local_mode:
+                kwargs['local_mode'] = True
+        kwargs.update(self.ray_kwargs)
+        return kwargs
+
+    @property
+    def num_trial_cpus(self):
+        """CPUs of the cluster, or the sized estimate before it starts."""
+        if self.started and not self.is_local:
+            import ray
+            cluster_resources = getattr(ray, 'cluster_resources', None) or ray.global_state.cluster_resources
+            return int(cluster_resources().get('CPU', 1))
+        return self.num_cpus or _available_cpus()
+
+    def start(self, data_bytes=None, **ray_kwargs):
+        import ray
+        with self._lock:
+            if self.started and ray.is_initialized():
+                return ray
+            kwargs = self.init_kwargs(data_bytes=data_bytes)
+            kwargs.update(ray_kwargs)
+            if ray.is_initialized():
+                ## Someone else started ray in this process; use it as is.
+                self._owns_ray = False
+            else:
+                with span('ray.init'):
+                    ray.init(**kwargs)
+                self._owns_ray = True
+            self.is_local = bool(kwargs.get('local_mode', False))
+            self.started = True
+        return ray
+
+    def shutdown(self):
+        with self._lock:
+            if self.started and self._owns_ray:
+                import ray
+                ray.shutdown()
+            self.started = False
+            self._owns_ray = False
+
+    def __enter__(self):
+        with _lock:
+            _sessions.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        with _lock:
+            _sessions.remove(self)
+        self.shutdown()
+        return False
+
+
+def get_session():
+    """
+    Returns the session trials should run on -- the innermost active
+    `with RaySession(...)` block, else the default session.
+    """
+    global _default_session
+    with _lock:
+        if _sessions:
+            return _sessions[-1]
+        if _default_session is None:
+            _default_session = RaySession()
+            atexit.register(_default_session.shutdown)
+        return _default_session
+
+
+def set_session(session):
+    """Replaces the default session, shutting the previous one down."""
+    global _default_session
+    with _lock:
+        previous, _default_session = _default_session, session
+        if session is not None:
+            atexit.register(session.shutdown)
+    if previous is not None and previous is not session:
+        previous.shutdown()
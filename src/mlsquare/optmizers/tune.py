@@ -1,19 +1,389 @@
-from ray import tune
-import ray
 # from ray.tune.suggest import HyperOptSearch
+import binascii
+import copy
+import math
 import os
+import sys
+import time
+import uuid
 import numpy as np
+from ..utils.profiling import span, active_profiler
+from ..utils.arrays import nbytes
+from ..utils.streaming import SpooledDataset
+from .search import make_search, resolve_config, grid_configs, DEFAULT_MAX_TRIALS
+from .session import get_session
 
-# Initialize ray
-ray.init(ignore_reinit_error=True, redis_max_memory=20*1000*1000*1000, object_store_memory=1000000000,
-         num_cpus=4)
+CHECKPOINT_DIR = os.environ.get('MLSQUARE_CHECKPOINT_DIR', os.path.join('~', '.mlsquare', 'checkpoints'))
+## Smallest row subsample successive halving trains candidates on.
+HALVING_MIN_ROWS = 1000
+## Config key indexing the candidate a halving trial continues; not a proxy param.
+CANDIDATE_KEY = 'candidate'
+
+
+def _init_ray(data_bytes=None, **kwargs):
+    """
+    Starts ray on first use rather than at import time, so that importing
+    mlsquare (or only loading a saved proxy) does not spin up a cluster.
+    Resources come from the current RaySession; see `session.get_session`.
+    """
+    return get_session().start(data_bytes=data_bytes, **kwargs)
+
+
+class _TrialData(object):
+    """
+    Training data shared with Tune trials through the Ray object store.
+
+    A trainable closing over arrays is pickled together with them, and
+    every trial worker unpickles a private copy. Instead, the arrays are
+    put in the object store once and each trial maps them read-only with
+    `get()`. Array attributes of the proxy model (its X and y) are shared
+    the same way and set again on a per-trial copy of the proxy.
+    """
+
+    def __init__(self, proxy_model, arrays, attributes=()):
+        import ray
+        self.attributes = tuple(attributes)
+        self.n_arrays = len(arrays)
+        values = list(arrays) + [getattr(proxy_model, name, None) for name in self.attributes]
+        stored = {}
+        self.refs = []
+        for value in values:
+            if value is not None and id(value) not in stored:
+                stored[id(value)] = ray.put(value)
+            self.refs.append(None if value is None else stored[id(value)])
+        self.proxy_model = copy.copy(proxy_model)
+        for name in self.attributes:
+            setattr(self.proxy_model, name, None)
+
+    def get(self):
+        """Returns (proxy_model, arrays) for one trial."""
+        import ray
+        fetched = iter(ray.get([ref for ref in self.refs if ref is not None]))
+        values = [None if ref is None else next(fetched) for ref in self.refs]
+        proxy_model = copy.copy(self.proxy_model)
+        for name, value in zip(self.attributes, values[self.n_arrays:]):
+            setattr(proxy_model, name, value)
+        return proxy_model, values[:self.n_arrays]
+
+
+def _peak_rss_bytes():
+    """Peak resident memory of this process, reported by every trial."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _memory_reporter():
+    """
+    Call on the driver. Returns a function giving a trial's memory use to
+    report, or None unless a profiler is active: only profiled fits make
+    their trials measure it.
+    """
+    if active_profiler() is None:
+        return None
+    return lambda: {'peak_rss_bytes': _peak_rss_bytes()}
+
+
+def _trial_resources(cpus_per_trial=1):
+    """
+    Per-trial resources, never more than the session has to give. Below
+    one CPU, Ray packs several trials onto each core.
+    """
+    cpus = min(float(cpus_per_trial), get_session().num_trial_cpus)
+    if cpus <= 0:
+        raise ValueError('cpus_per_trial should be positive, got %r' % cpus_per_trial)
+    return {"cpu": int(cpus) if cpus == int(cpus) else cpus}
+
+
+def _max_concurrent(resources):
+    return max(int(get_session().num_trial_cpus / resources['cpu']), 1)
+
+
+def _limit_tf_threads(cpus):
+    """
+    Sizes TensorFlow's thread pools to the CPUs of a trial, so concurrent
+    trials do not each spawn a pool as large as the machine.
+    """
+    import tensorflow as tf
+    from keras import backend as K
+    threads = max(int(np.ceil(cpus)), 1)
+    config = tf.ConfigProto(intra_op_parallelism_threads=threads, inter_op_parallelism_threads=1)
+    K.set_session(tf.Session(config=config))
 
 ## Push this as a class with the package name. Ex - class tune(): pass
 def get_best_model(X, y, proxy_model, primal_data, **kwargs):
-    y_pred = np.array(primal_data['y_pred'])
+    """
+    Trains the proxy model on the primal model's predictions with Tune
+    and returns the best model found.
+
+    With a `search_space` (see `search.get_search_space`), runs a 'random',
+    'grid' or 'tpe' `search` of at most `max_trials` trials. No new trials
+    are started after `time_budget_s` seconds. Trials report every
+    `report_every` epochs, and a `scheduler` ('asha', 'median' or a Tune
+    TrialScheduler) may stop them early. Each trial gets `cpus_per_trial`
+    CPUs, fractions included, and as many TensorFlow threads. Trials
+    return their weights through the object store; pass `checkpoint_dir`
+    to also keep them on disk. With a `fidelity` target, a trial stops
+    training once its agreement with the primal (`fidelity_metric`)
+    reaches it; trials report the epochs they trained as `epochs_done`.
+    Trials are ranked on `metric`, the largest first if `metric_mode` is
+    'max' and the smallest first if it is 'min'. The default is
+    'mean_accuracy', 'max'. Regressor proxies rank on 'mean_loss', 'min'.
+
+    With `halving`, candidates are first compared on row subsamples; see
+    `_successive_halving`. With a `store` (an ExperimentStore) and the
+    `experiment_name` it gave the fit, finished trials are recorded as
+    they finish, and those recorded by an interrupted run of the same fit
+    are not run again; see `_resume_experiment`.
+    """
+    kwargs.setdefault('verbose', 0)
+    kwargs.setdefault('epochs', 250)
+    kwargs.setdefault('report_every', 1)
+    kwargs.setdefault('metric', 'mean_accuracy')
+    kwargs.setdefault('metric_mode', 'max')
+    return_trials = kwargs.pop('return_trials', False)
+    time_budget_s = kwargs.pop('time_budget_s', None)
+    halving = kwargs.pop('halving', False)
+    halving_factor = kwargs.pop('halving_factor', 3)
+    scheduler = kwargs.pop('scheduler', None)
+    store = kwargs.pop('store', None)
+    if store is not None:
+        if halving:
+            raise ValueError('Experiments with halving cannot be resumed.')
+        best_model, trials = _resume_experiment(X, y, proxy_model, primal_data, store, scheduler=scheduler,
+                                                time_budget_s=time_budget_s, **kwargs)
+    elif halving:
+        best_model, trials = _successive_halving(X, y, proxy_model, primal_data, factor=halving_factor,
+                                                 scheduler=scheduler, time_budget_s=time_budget_s, **kwargs)
+    else:
+        scheduler = _make_scheduler(scheduler, kwargs['epochs'], kwargs['report_every'],
+                                    metric=_reward_attr(kwargs['metric'], kwargs['metric_mode']))
+        with span('tune.make_experiment'):
+            experiment, search_alg = _make_experiment(X, y, proxy_model, primal_data, **kwargs)
+        for _, trials in _run_experiments([experiment], verbose=2, search_alg=search_alg, scheduler=scheduler,
+                                          max_trials=kwargs.get('max_trials'), time_budget_s=time_budget_s):
+            pass
+        best_model = _restore_best_model(trials, proxy_model, metric=kwargs['metric'], mode=kwargs['metric_mode'])
+
+    if return_trials:
+        return best_model, trials
+    return best_model
+
+
+def _resume_experiment(X, y, proxy_model, primal_data, store, scheduler=None, time_budget_s=None, **kwargs):
+    """
+    Runs the trials of the experiment `kwargs['experiment_name']` that
+    `store` has no record of -- the rest of the grid, or the remaining
+    random or TPE trials -- recording each as it finishes. Trials cut
+    short by `max_trials` are not recorded, so a resumed run trains them
+    again. The best model
+    is restored from the records of both runs. Returns it and the trials
+    run now.
+    """
+    name = kwargs['experiment_name']
+    records = store.trials(name)
+    search_space = kwargs.get('search_space') or {}
+    trials = []
+    if not search_space:
+        to_run = 0 if records else 1
+    elif kwargs.get('search') == 'grid':
+        done = [record['config'] for record in records]
+        kwargs['candidates'] = [(config, None) for config in grid_configs(search_space)
+                                if not any(all(record.get(path) == value for path, value in config.items())
+                                           for record in done)]
+        to_run = len(kwargs['candidates'])
+    else:
+        to_run = (kwargs.get('max_trials') or DEFAULT_MAX_TRIALS) - len(records)
+        kwargs['max_trials'] = to_run
+
+    def record(trial):
+        result = dict(trial.last_result, trial_id=trial.trial_id)
+        weights = _fetch_weights(result)
+        result.pop('checkpoint', None)
+        if weights is not None:
+            store.record(name, trial.config, result, weights)
+
+    if to_run > 0:
+        with span('tune.make_experiment'):
+            experiment, search_alg = _make_experiment(X, y, proxy_model, primal_data, **kwargs)
+        scheduler = _make_scheduler(scheduler, kwargs['epochs'], kwargs['report_every'],
+                                    metric=_reward_attr(kwargs['metric'], kwargs['metric_mode']))
+        for _, trials in _run_experiments([experiment], verbose=2, search_alg=search_alg, scheduler=scheduler,
+                                          max_trials=kwargs.get('max_trials'), time_budget_s=time_budget_s,
+                                          on_trial_done=record):
+            pass
+        _collect_checkpoints(trials)
+
+    with span('tune.restore_best_model'):
+        best_model = None
+        reverse = kwargs['metric_mode'] == 'max'
+        missing = -np.inf if reverse else np.inf
+        for best in sorted(store.trials(name), key=lambda record: record['result'].get(kwargs['metric'], missing),
+                           reverse=reverse):
+            proxy_model.set_params(params=_trial_params(best['config']), set_by='optimizer')
+            best_model = proxy_model.create_model()
+            best_model.set_weights(best['weights'])
+            break
+    return best_model, trials
+
+
+def _take_rows(data, rows):
+    if data is None or rows is None:
+        return data
+    return data.iloc[rows] if hasattr(data, 'iloc') else data[rows]
+
+
+def _halving_rungs(n_rows, n_candidates, factor, min_rows=HALVING_MIN_ROWS):
+    """
+    Number of subsample rungs before the full data: each keeps 1/factor
+    of the candidates, and the first must still have `min_rows` rows.
+    """
+    n_rungs = 0
+    while factor ** (n_rungs + 1) <= n_candidates and n_rows // factor ** (n_rungs + 1) >= min_rows:
+        n_rungs += 1
+    return n_rungs
+
+
+def _successive_halving(X, y, proxy_model, primal_data, factor=3, scheduler=None, time_budget_s=None,
+                        **kwargs):
+    """
+    Successive halving over row subsamples. Every candidate config trains
+    on a subsample of the rows; the best 1/factor go on to a subsample
+    `factor` times larger, starting from the weights they reached, and so
+    on until the survivors train on all rows. Each rung costs about as
+    much as the first, so tuning grows with the number of rungs rather
+    than with the number of rows times candidates.
+
+    `max_trials` and `time_budget_s` apply to the subsample rungs; the
+    survivors always train on the full data. Returns the best model and
+    the trials of every rung.
+    """
+    search_space = kwargs.get('search_space') or {}
+    if not search_space:
+        n_candidates = 1
+    elif kwargs.get('search') == 'grid':
+        n_candidates = int(np.prod([len(domain.grid()) for domain in search_space.values()]))
+    else:
+        n_candidates = kwargs.get('max_trials') or DEFAULT_MAX_TRIALS
+    n_rows = X.shape[0]
+    n_rungs = _halving_rungs(n_rows, n_candidates, factor)
+    ## Nested subsamples, in the original row order.
+    order = np.random.RandomState(0).permutation(n_rows)
+    y_pred = np.asarray(primal_data['y_pred'])
+    proxy_X, proxy_y = proxy_model.X, proxy_model.y
+    start = time.time()
+    candidates, all_trials = None, []
+    for rung in range(n_rungs + 1):
+        rows = np.sort(order[:n_rows // factor ** (n_rungs - rung)]) if rung < n_rungs else None
+        ## The proxy's own data goes to the object store with the rung's rows.
+        proxy_model.X, proxy_model.y = _take_rows(proxy_X, rows), _take_rows(proxy_y, rows)
+        try:
+            with span('tune.make_experiment'):
+                experiment, search_alg = _make_experiment(
+                    _take_rows(X, rows), _take_rows(y, rows), proxy_model,
+                    dict(primal_data, y_pred=_take_rows(y_pred, rows)), candidates=candidates, **kwargs)
+        finally:
+            proxy_model.X, proxy_model.y = proxy_X, proxy_y
+        budget = None
+        if time_budget_s is not None and rung < n_rungs:
+            budget = max(time_budget_s - (time.time() - start), 0)
+        rung_scheduler = _make_scheduler(scheduler, kwargs['epochs'], kwargs['report_every'],
+                                         metric=_reward_attr(kwargs['metric'], kwargs['metric_mode']))
+        with span('tune.halving_rung'):
+            for _, trials in _run_experiments([experiment], verbose=2, search_alg=search_alg,
+                                              scheduler=rung_scheduler,
+                                              max_trials=kwargs.get('max_trials') if rung == 0 else None,
+                                              time_budget_s=budget):
+                pass
+        all_trials.extend(trials)
+        if rung == n_rungs:
+            break
+        finished = [trial for trial in get_sorted_trials(trials, kwargs['metric'], kwargs['metric_mode'])
+                    if trial.last_result and 'checkpoint' in trial.last_result]
+        if not finished:
+            break
+        survivors = finished[:max(int(math.ceil(len(finished) / float(factor))), 1)]
+        candidates = [(trial.config, trial.last_result) for trial in survivors]
+
+    best_model = _restore_best_model(trials, proxy_model, metric=kwargs['metric'], mode=kwargs['metric_mode'])
+    _collect_checkpoints([trial for trial in all_trials if trial not in trials])
+    return best_model, all_trials
+
+
+def _candidate_config(config, candidates):
+    """
+    A Tune config running each of `candidates` -- (config, result) pairs --
+    once. Their params are resolved into the trials' configs, so a trial's
+    config is complete as with any other search.
+    """
+    from ray import tune
+    config = dict(config)
+    config[CANDIDATE_KEY] = tune.grid_search(list(range(len(candidates))))
+    keys = set(key for candidate_config, _ in candidates for key in candidate_config) - {CANDIDATE_KEY}
+    for key in keys:
+        config[key] = tune.sample_from(lambda spec, key=key: candidates[spec.config[CANDIDATE_KEY]][0].get(key))
+    return config
+
+
+def _trial_params(config):
+    """The proxy params of a trial's config, resolved, without the candidate index of halving trials."""
+    return resolve_config({key: value for key, value in config.items() if key != CANDIDATE_KEY})
+
+
+def _make_experiment(X, y, proxy_model, primal_data, **kwargs):
+    """
+    Builds the Tune experiment that searches for the best proxy model.
+    The trainable gets a unique name, which also identifies its trials
+    when several experiments share one run. Returns the experiment and
+    its search algorithm, which is None unless a 'tpe' search is asked for.
+    With `candidates`, (config, result) pairs of earlier trials, runs each
+    of them once instead of searching, starting from its weights if it
+    has a result. X may be a `SpooledDataset`, which trials read from disk
+    a batch at a time, or a list of the inputs of a multi-input proxy.
+
+    The proxy's own copies of the data -- its `attributes`, ('X', 'y') by
+    default -- are shared with trials through the object store, as the
+    data is. Trials hold out `validation_split` of the rows, and report
+    the loss curves of their fit as `history`.
+    """
+    streamed = isinstance(X, SpooledDataset)
+    multi_input = isinstance(X, (list, tuple))
+    if streamed:
+        ## Only the paths of the spooled files are shipped to trials.
+        arrays = [X]
+        _init_ray(data_bytes=X.nbytes)
+    else:
+        arrays = (list(X) if multi_input else [X]) + [np.asarray(primal_data['y_pred'])]
+        _init_ray(data_bytes=sum(nbytes(array) for array in arrays))
+    from ray import tune
     kwargs.setdefault('epochs', 250)
     kwargs.setdefault('batch_size', 40)
     kwargs.setdefault('verbose', 0)
+    kwargs.setdefault('search_space', None)
+    kwargs.setdefault('search', 'random')
+    kwargs.setdefault('max_trials', None)
+    kwargs.setdefault('report_every', 1)
+    kwargs.setdefault('metric', 'mean_accuracy')
+    kwargs.setdefault('metric_mode', 'max')
+    ## Accuracy is only meaningful, and a stopping criterion, for classifiers.
+    kwargs.setdefault('stop', {"mean_accuracy": 0.95} if kwargs['metric'] == 'mean_accuracy' else {})
+    kwargs.setdefault('cpus_per_trial', 1)
+    kwargs.setdefault('checkpoint_dir', None)
+    kwargs.setdefault('fidelity', None)
+    kwargs.setdefault('fidelity_metric', 'accuracy')
+    kwargs.setdefault('candidates', None)
+    kwargs.setdefault('experiment_name', None)
+    kwargs.setdefault('attributes', ('X', 'y'))
+    kwargs.setdefault('validation_split', 0.0)
+    resources = _trial_resources(kwargs['cpus_per_trial'])
+    name = _unique_trainable_name()
+
+    trial_data = _TrialData(proxy_model, arrays, attributes=kwargs['attributes'])
+    candidates = kwargs['candidates']
+    memory = _memory_reporter()
 
     def train_model(config, reporter): ## Change config name
         '''
@@ -25,50 +395,312 @@ def get_best_model(X, y, proxy_model, primal_data, **kwargs):
             reporter: A function used by Tune to keep a track of the metric by
             which the iterations should be optimized.
         '''
-        proxy_model.set_params(params=config, set_by='optimizer')
-        model = proxy_model.create_model()
-        model.fit(X, y_pred, epochs=kwargs['epochs'], batch_size=kwargs['batch_size'], verbose=kwargs['verbose'])
-        accuracy = model.evaluate(X, y_pred)[1]
-        last_checkpoint = "weights_tune_{}.h5".format(config)
-        model.save_weights(last_checkpoint)
-        reporter(mean_accuracy=accuracy, checkpoint=last_checkpoint)
+        from .callbacks import TuneReporter, FidelityStopping, tune_results
+        _limit_tf_threads(resources['cpu'])
+        trial_proxy, data = trial_data.get()
+        if streamed:
+            batches = data[0].sequence(kwargs['batch_size'])
+            X_, y_pred_ = data[0].rows()
+        else:
+            X_, y_pred_ = (data[:-1] if multi_input else data[0]), data[-1]
+        trial_proxy.set_params(params=_trial_params(config), set_by='optimizer')
+        model = trial_proxy.create_model()
+        if candidates is not None and candidates[config[CANDIDATE_KEY]][1] is not None:
+            ## Continue from the weights the candidate reached on fewer rows.
+            _load_weights(model, candidates[config[CANDIDATE_KEY]][1])
+        checkpoint = _checkpointer(kwargs['checkpoint_dir'], name)
+        reward = _reward_attr(kwargs['metric'], kwargs['metric_mode'])
+        callbacks = [TuneReporter(reporter, freq=kwargs['report_every'], checkpoint=checkpoint,
+                                  extra=memory, metric=reward)]
+        if kwargs['fidelity'] is not None:
+            stopping = FidelityStopping(kwargs['fidelity'], X_, y_pred_, metric=kwargs['fidelity_metric'])
+            callbacks.insert(0, stopping)
+        fit_start = time.time()
+        if streamed:
+            history = model.fit_generator(batches, epochs=kwargs['epochs'], verbose=kwargs['verbose'],
+                                          callbacks=callbacks)
+            scores = model.evaluate_generator(batches)
+        else:
+            history = model.fit(X_, y_pred_, epochs=kwargs['epochs'], batch_size=kwargs['batch_size'],
+                                verbose=kwargs['verbose'], validation_split=kwargs['validation_split'],
+                                callbacks=callbacks)
+            scores = model.evaluate(X_, y_pred_, verbose=0)
+        checkpoint_start = time.time()
+        result = tune_results(dict(zip(model.metrics_names, np.atleast_1d(scores))))
+        result.update(checkpoint(model, result.get(reward)))
+        if kwargs['fidelity'] is not None:
+            result['fidelity'] = stopping.fidelity
+        if memory is not None:
+            result.update(memory())
+        reporter(epochs_done=len(history.epoch), fit_time_s=checkpoint_start - fit_start,
+                 checkpoint_time_s=time.time() - checkpoint_start,
+                 history={key: [float(v) for v in values] for key, values in history.history.items()},
+                 **result)
+    ## Tune registers trainables by function name; keep concurrent fits apart.
+    train_model.__name__ = name
+
+    if candidates is not None:
+        config, num_samples, search_alg = _candidate_config(proxy_model.get_params(), candidates), 1, None
+    else:
+        config, num_samples, search_alg = make_search(
+            proxy_model.get_params(), kwargs['search_space'], search=kwargs['search'],
+            max_trials=kwargs['max_trials'], max_concurrent=_max_concurrent(resources),
+            metric=_reward_attr(kwargs['metric'], kwargs['metric_mode']))
 
     # Define experiment configuration
-    configuration = tune.Experiment("experiment_name",
+    configuration = tune.Experiment(kwargs.get('experiment_name') or name,
                                     run=train_model,
-                                    resources_per_trial={"cpu": 4},
-                                    stop={"mean_accuracy": 95},
-                                    config=proxy_model.get_params())
+                                    resources_per_trial=resources,
+                                    stop=kwargs['stop'],
+                                    config=config,
+                                    num_samples=num_samples)
                                     # config=kwargs['params'])
+    return configuration, search_alg
+
+
+def _reward_attr(metric, mode='max'):
+    """
+    The result Tune's schedulers and searchers maximize to rank on
+    `metric`: the metric itself, or its negation (reported as 'neg_' +
+    metric) if smaller is better.
+    """
+    if mode not in ('max', 'min'):
+        raise ValueError("mode should be 'max' or 'min', got %r" % mode)
+    return metric if mode == 'max' else 'neg_' + metric
+
+
+def _make_scheduler(scheduler, epochs, report_every=1, metric='mean_accuracy'):
+    """
+    Returns a Tune trial scheduler: 'asha' (asynchronous successive
+    halving), 'median' (median stopping rule), a TrialScheduler as is, or
+    None for Tune's FIFO scheduler. Times are counted in reports. The
+    scheduler maximizes `metric`; see `_reward_attr`.
+    """
+    if scheduler is None or not isinstance(scheduler, str):
+        return scheduler
+    from ray.tune.schedulers import AsyncHyperBandScheduler, MedianStoppingRule
+    max_t = max(epochs // max(report_every, 1), 1)
+    if scheduler == 'asha':
+        return AsyncHyperBandScheduler(time_attr='training_iteration', reward_attr=metric,
+                                       max_t=max_t, grace_period=max(max_t // 27, 1), reduction_factor=3)
+    if scheduler == 'median':
+        return MedianStoppingRule(time_attr='training_iteration', reward_attr=metric,
+                                  grace_period=max(max_t // 10, 1), min_samples_required=3)
+    raise ValueError("scheduler should be 'asha', 'median' or a Tune TrialScheduler, got %r" % scheduler)
+
+
+def _run_experiments(experiments, verbose=2, search_alg=None, scheduler=None, max_trials=None,
+                     time_budget_s=None, on_trial_done=None):
+    """
+    Runs all trials of the given experiments on one trial runner, so they
+    share the cluster and are scheduled concurrently. Mirrors
+    `tune.run_experiments`, but yields (trainable_name, trials) for each
+    experiment as soon as all of its trials have finished.
+
+    Trials of an experiment beyond its first `max_trials` are stopped, and
+    no trials are started once `time_budget_s` seconds have passed;
+    running trials are left to finish. `on_trial_done` is called with each
+    trial that terminates with a checkpointed result, as soon as it does,
+    unless it was one of the trials stopped here: those are only partly
+    trained.
+    """
+    from ray.tune.suggest import BasicVariantGenerator
+    from ray.tune.trial import Trial
+    from ray.tune.trial_runner import TrialRunner
+
+    profiler = active_profiler()
+    run_start = time.time()
+    if search_alg is None:
+        search_alg = BasicVariantGenerator()
+    search_alg.add_configurations(experiments)
+    runner = TrialRunner(search_alg, scheduler=scheduler, verbose=bool(verbose > 1))
+    pending = set(experiment.spec['run'] for experiment in experiments)
+    done_states = (Trial.TERMINATED, Trial.ERROR)
+    out_of_time = False
+    recorded = set()
+    cut = set()
+
+    while pending:
+        finished = runner.is_finished()
+        if not finished:
+            runner.step()
+            if verbose:
+                print(runner.debug_string())
+        trials = runner.get_trials()
+        if time_budget_s is not None and not out_of_time and time.time() - run_start > time_budget_s:
+            out_of_time = True
+            search_alg.set_finished()
+        for name in sorted(pending):
+            own_trials = [trial for trial in trials if trial.trainable_name == name]
+            for index, trial in enumerate(own_trials):
+                if (on_trial_done is not None and trial.status == Trial.TERMINATED and
+                        trial.trial_id not in recorded | cut and 'checkpoint' in (trial.last_result or {})):
+                    recorded.add(trial.trial_id)
+                    on_trial_done(trial)
+                if trial.status in done_states:
+                    continue
+                if (max_trials and index >= max_trials) or (out_of_time and trial.status == Trial.PENDING):
+                    cut.add(trial.trial_id)
+                    runner.stop_trial(trial)
+            if finished or (search_alg.is_finished() and own_trials and
+                            all(trial.status in done_states for trial in own_trials)):
+                pending.discard(name)
+                if profiler is not None:
+                    _add_trial_spans(profiler, own_trials)
+                    if not pending:
+                        profiler.add('tune.run', run_start, time.time())
+                yield name, own_trials
+
+
+def _add_trial_spans(profiler, trials):
+    """Records the stages timed inside each trial, from its last result."""
+    for trial in trials:
+        result = trial.last_result or {}
+        if 'timestamp' not in result or 'time_total_s' not in result:
+            continue
+        end = result['timestamp']
+        start = end - result['time_total_s']
+        profiler.add('trial', start, end, tid=str(trial))
+        if 'fit_time_s' in result:
+            profiler.add('trial.fit', start, start + result['fit_time_s'], tid=str(trial))
+        if 'checkpoint_time_s' in result:
+            profiler.add('trial.checkpoint', end - result['checkpoint_time_s'], end, tid=str(trial))
 
-    trials = tune.run_experiments(configuration, verbose=2)
 
-    metric = "mean_accuracy"
+def _restore_best_model(trials, proxy_model, metric, mode='max'):
+    with span('tune.restore_best_model'):
+        best_model, best_trial = _load_best_model(trials, proxy_model, metric, mode)
+    _collect_checkpoints(trials, keep=best_trial)
+    return best_model
+
 
+def _load_best_model(trials, proxy_model, metric, mode='max'):
     # Restore a model from the best trial.
-    sorted_trials = get_sorted_trials(trials, metric)
+    best_model = None
+    sorted_trials = get_sorted_trials(trials, metric, mode)
     for best_trial in sorted_trials:
         try:
             print("Creating model...")
-            proxy_model.set_params(params=best_trial.config, set_by='optimizer')
+            proxy_model.set_params(params=_trial_params(best_trial.config), set_by='optimizer')
             best_model = proxy_model.create_model()
-            weights = os.path.join(
-                best_trial.logdir, best_trial.last_result["checkpoint"])
-            print("Loading from", weights)
             # TODO Validate this loaded model.
-            best_model.load_weights(weights)
-            break
+            _load_weights(best_model, best_trial.last_result)
+            return best_model, best_trial
         except Exception as e:
             print(e)
             print("Loading failed. Trying next model")
 
-    return best_model
+    return best_model, None
+
+
+def _checkpointer(checkpoint_dir, name):
+    """
+    Returns a function checkpointing a trial's model; call it inside the
+    trial with the model and its score, the result it is ranked on (see
+    `_reward_attr`). Only a model scoring higher than the last checkpoint
+    is checkpointed; otherwise the entries of the last checkpoint are
+    returned again, so every report refers to the trial's best weights
+    so far. The weights are put in the object store and reported by
+    reference. A reference is freed once the one replacing it has been
+    reported, so a trial holds at most two. With a `checkpoint_dir` (True
+    for CHECKPOINT_DIR) they are also saved there, in a file per trial
+    removed once the fit is done, unless it is the best trial's.
+    """
+    path = None
+    if checkpoint_dir:
+        if checkpoint_dir is True:
+            checkpoint_dir = CHECKPOINT_DIR
+        path = os.path.join(os.path.expanduser(checkpoint_dir), name, uuid.uuid4().hex[:12] + '.h5')
+    state = {'score': None, 'result': None, 'refs': []}
+
+    def checkpoint(model, score=None):
+        import ray
+        if state['result'] is not None and None not in (score, state['score']) and not score > state['score']:
+            return dict(state['result'])
+        ref = ray.put(model.get_weights())
+        ## In local mode put() returns the weights themselves.
+        if isinstance(ref, ray.ObjectID):
+            state['refs'].append(ref)
+            if len(state['refs']) > 2:
+                _free(state['refs'].pop(0))
+        result = {'checkpoint': ref.hex() if isinstance(ref, ray.ObjectID) else ref}
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            model.save_weights(path)
+            result['checkpoint_path'] = path
+        state['score'], state['result'] = score, result
+        return dict(result)
+    return checkpoint
+
+
+def _free(ref):
+    """Frees an object store entry; Ray versions without `free` keep it."""
+    try:
+        from ray.internal import free
+    except ImportError:
+        return
+    free([ref])
+
+
+def _fetch_weights(result):
+    """The weights a trial reported, or None if they are gone."""
+    checkpoint = result.get('checkpoint')
+    if not isinstance(checkpoint, str):
+        return checkpoint
+    try:
+        import ray
+        return ray.get(ray.ObjectID(binascii.unhexlify(checkpoint)))
+    except Exception:
+        return None
+
+
+def _load_weights(model, result):
+    """Restores the weights a trial reported, from memory if possible."""
+    try:
+        model.set_weights(_fetch_weights(result))
+    except Exception:
+        if not result.get('checkpoint_path'):
+            raise
+        model.load_weights(result['checkpoint_path'])
+
+
+def _collect_checkpoints(trials, keep=None):
+    """Removes the checkpoint files of `trials`, except the one of `keep`."""
+    keep_path = keep.last_result.get('checkpoint_path') if keep is not None else None
+    for trial in trials:
+        path = (trial.last_result or {}).get('checkpoint_path')
+        if not path or path == keep_path:
+            continue
+        try:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))  # once empty
+        except OSError:
+            pass
+
+
+def _unique_trainable_name(prefix='train_model'):
+    return '{}_{}'.format(prefix, uuid.uuid4().hex[:8])
 
 
 # Utils from Tune tutorials(Not a part of the Tune package) #
 
-def get_sorted_trials(trial_list, metric):
-    return sorted(trial_list, key=lambda trial: trial.last_result.get(metric, 0), reverse=True)
+def get_sorted_trials(trial_list, metric, mode='max'):
+    """Sorts trials best first: by the largest `metric` if mode is 'max', else by the smallest."""
+    if mode not in ('max', 'min'):
+        raise ValueError("mode should be 'max' or 'min', got %r" % mode)
+    missing = -np.inf if mode == 'max' else np.inf
+    return sorted(trial_list, key=lambda trial: (trial.last_result or {}).get(metric, missing),
+                  reverse=mode == 'max')
+
+
+def _best_result(results, metric, mode='max'):
+    """The best of the trial `results`, ranked as by `get_sorted_trials`; None if there are none."""
+    missing = -np.inf if mode == 'max' else np.inf
+    results = [result for result in results if result]
+    if not results:
+        return None
+    select = max if mode == 'max' else min
+    return select(results, key=lambda result: result.get(metric, missing))
 
 # TODO
 # Generalize metric choice.
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Conversion of user inputs to numpy arrays without needless copies.
+
+    numpy arrays -- np.memmap included -- are used as they are, and
+    pandas objects through a view of their data where pandas holds them
+    in one block. scipy sparse matrices stay sparse, in CSR format so
+    that batches of rows are cheap to slice. Data is only copied where a
+    conversion requires it: a change of dtype or sparse format, or a
+    DataFrame mixing dtypes. Each copy is counted
+    under 'bytes_copied' by the active profiler; see `utils.profiling`.
+
+    Proxies are trained on data of one float dtype, `floatx()` -- float32
+    unless set otherwise with `set_floatx` or $MLSQUARE_FLOATX -- so data
+    is converted once when it is taken in instead of on every batch.
+"""
+import os
+
+import numpy as np
+
+from .profiling import count
+
+FLOAT_DTYPES = ('float16', 'float32', 'float64')
+_floatx = os.environ.get('MLSQUARE_FLOATX', 'float32')
+
+
+def floatx():
+    """Returns the dtype proxies are trained on, as a string."""
+    return _floatx
+
+
+def set_floatx(dtype):
+    """
+    Sets the dtype proxies are trained on -- 'float32' (default), 'float64'
+    or 'float16'. Keras proxies compute in `keras.backend.floatx()`; with a
+    different dtype here, Keras casts every batch.
+    """
+    global _floatx
+    dtype = np.dtype(dtype).name
+    if dtype not in FLOAT_DTYPES:
+        raise ValueError('dtype should be one of %s, got %r' % (FLOAT_DTYPES, dtype))
+    _floatx = dtype
+
+
+def as_array(X, dtype=None):
+    """
+    Returns X as a numpy array, copying it only if a conversion requires.
+
+    Parameters
+    ----------
+    X : array-like
+        numpy array or np.memmap, pandas DataFrame or Series, scipy sparse
+        matrix, or anything np.asarray accepts.
+
+    dtype : dtype or tuple of dtypes, optional
+        Accepted dtypes. X is converted to the first of them if its own
+        dtype is not among them. Default is to keep X's dtype.
+
+    Returns
+    -------
+    X : np.ndarray or scipy.sparse.csr_matrix
+    """
+    if X is None:
+        return None
+    if is_sparse(X):
+        array = X
+        if array.format != 'csr':
+            array = array.tocsr()
+            count('bytes_copied', nbytes(array))
+    elif isinstance(X, np.ndarray):
+        array = X
+    else:
+        array = np.asarray(X)
+        if not _shares_memory(array, X):
+            count('bytes_copied', array.nbytes)
+    if dtype is not None:
+        dtypes = [np.dtype(d) for d in (dtype if isinstance(dtype, (tuple, list)) else (dtype,))]
+        if array.dtype not in dtypes:
+            array = array.astype(dtypes[0], copy=False) if is_sparse(array) else array.astype(dtypes[0])
+            count('bytes_copied', array.data.nbytes if is_sparse(array) else array.nbytes)
+    return array
+
+
+def is_sparse(X):
+    """True for scipy sparse matrices."""
+    return hasattr(X, 'tocsr') and hasattr(X, 'nnz')
+
+
+def nbytes(X):
+    """Bytes held by X; for sparse matrices, by their non-zeros and indices."""
+    if is_sparse(X):
+        return sum(getattr(X, name).nbytes for name in ('data', 'indices', 'indptr', 'row', 'col')
+                   if hasattr(X, name))
+    return np.asarray(X).nbytes
+
+
+def _shares_memory(array, X):
+    """Whether `array` views the data of X, judged by one column of it."""
+    if hasattr(X, 'iloc') and hasattr(X, 'columns'):  # pandas DataFrame
+        if X.shape[1] == 0:
+            return True
+        X = X.iloc[:, 0]
+    if hasattr(X, 'values') and isinstance(getattr(X, 'values'), np.ndarray):
+        return np.may_share_memory(array, X.values)
+    return False
+
+
+def as_floatx(X):
+    """Returns X as a numpy array of dtype `floatx()`; see `as_array`."""
+    return as_array(X, dtype=_floatx)
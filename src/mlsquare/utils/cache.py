@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    On-disk cache of trained proxy models.
+"""
+import os
+import pickle
+import tempfile
+import threading
+
+
+class ProxyCache(object):
+    """
+    A content-addressed, size-bounded cache of trained proxy models.
+
+    Entries are keyed by a fingerprint of everything that determines the
+    outcome of a fit -- the primal model's hyper-parameters, the training
+    data, the proxy model and its params -- and hold the best model's
+    params and weights. When the cache outgrows `max_bytes` the least
+    recently used entries are evicted.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Where entries are stored. Defaults to $MLSQUARE_CACHE_DIR or
+        ~/.mlsquare/cache.
+
+    max_bytes : int, optional
+        Size bound of the cache. Default is 2GB.
+
+
+    Methods
+    -------
+    load(key, proxy_model)
+        Returns the cached keras model for `key`, or None.
+
+    save(key, proxy_model, model)
+        Stores the params of `proxy_model` and the weights of `model`.
+
+    clear()
+        Removes all entries.
+
+    """
+
+    suffix = '.proxy'
+
+    def __init__(self, directory=None, max_bytes=2*1024**3):
+        if directory is None:
+            directory = os.environ.get('MLSQUARE_CACHE_DIR',
+                                       os.path.join(os.path.expanduser('~'), '.mlsquare', 'cache'))
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def load(self, key, proxy_model):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        os.utime(path, None)  # Marks the entry as recently used.
+        proxy_model.set_params(params=entry['params'], set_by='optimizer')
+        model = proxy_model.create_model()
+        model.set_weights(entry['weights'])
+        return model
+
+    def save(self, key, proxy_model, model):
+        entry = {'params': proxy_model.get_params(), 'weights': model.get_weights()}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(self.suffix):
+                    stat = os.stat(os.path.join(self.directory, name))
+                    entries.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                total -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                os.remove(os.path.join(self.directory, name))
+
+
+def get_cache(cache):
+    """
+    Resolves the `cache` option accepted by the adapters' fit methods --
+    None/False (no caching), True (default cache), a directory path or a
+    ProxyCache instance.
+    """
+    if cache is None or cache is False:
+        return None
+    if cache is True:
+        return ProxyCache()
+    if isinstance(cache, str):
+        return ProxyCache(directory=cache)
+    if isinstance(cache, ProxyCache):
+        return cache
+    raise TypeError("cache should be a bool, a directory path or a `ProxyCache`")
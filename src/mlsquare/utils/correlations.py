@@ -47,6 +47,44 @@ def concordance_correlation_coefficient(y_true, y_pred,
 
     return numerator/denominator
 
+
+FIDELITY_METRICS = ('accuracy', 'relative_mse', 'ccc')
+
+
+def fidelity(primal_pred, proxy_pred, metric='accuracy'):
+    """Agreement of a proxy's predictions with its primal model's, 1 being perfect.
+
+    Parameters
+    ----------
+    primal_pred, proxy_pred : array-like
+        Predictions of the primal and the proxy model. For 'accuracy',
+        one-hot or probability columns are compared by their argmax and a
+        single column is thresholded at 0.5.
+    metric : str, optional
+        'accuracy', 'relative_mse' (1 minus the mean squared error relative
+        to the variance of the primal's predictions) or 'ccc' (the
+        concordance correlation coefficient). Default is 'accuracy'.
+
+    Returns
+    -------
+    fidelity : float
+    """
+    primal_pred = np.asarray(primal_pred, dtype=np.float64)
+    proxy_pred = np.asarray(proxy_pred, dtype=np.float64)
+    if metric == 'accuracy':
+        if primal_pred.ndim == 2 and primal_pred.shape[1] > 1:
+            return float(np.mean(np.argmax(primal_pred, axis=1) == np.argmax(proxy_pred, axis=1)))
+        return float(np.mean((primal_pred.reshape(-1) > 0.5) == (proxy_pred.reshape(-1) > 0.5)))
+    primal_pred, proxy_pred = primal_pred.reshape(-1), proxy_pred.reshape(-1)
+    if metric == 'relative_mse':
+        variance = np.var(primal_pred)
+        mse = np.mean((primal_pred - proxy_pred)**2)
+        return float(1 - mse / variance) if variance > 0 else float(mse == 0)
+    if metric == 'ccc':
+        value = concordance_correlation_coefficient(primal_pred, proxy_pred)
+        return float(value) if np.isfinite(value) else float(np.allclose(primal_pred, proxy_pred))
+    raise ValueError('metric should be one of %s, got %r' % (FIDELITY_METRICS, metric))
+
 # n_samples=1000
 # y_true = np.arange(n_samples)
 # y_pred = y_true + 500
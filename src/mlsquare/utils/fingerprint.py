@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Stable fingerprints for model inputs and parameters, used to key
+    caches of trained models and to track datasets across experiments.
+"""
+import hashlib
+
+import numpy as np
+
+CHUNK_BYTES = 16 * 1024 * 1024
+SAMPLE_BLOCKS = 256
+SAMPLE_BLOCK_BYTES = 64 * 1024
+
+
+def fingerprint(*objects, sampled=False, chunk_bytes=CHUNK_BYTES):
+    """
+    Returns a hex digest identifying `objects`.
+
+    numpy arrays (including np.memmap), pandas objects and scipy sparse
+    matrices are hashed straight from their data buffers, `chunk_bytes`
+    at a time, so no copy of the data is made and memory-mapped inputs
+    are streamed. Only non-contiguous arrays are copied, a chunk of rows
+    at a time. Dicts are hashed independently of key order and estimators
+    through their `get_params()`. Anything else is hashed through its repr.
+
+    Parameters
+    ----------
+    objects :
+        The objects to identify.
+
+    sampled : bool, optional
+        If True, buffers larger than SAMPLE_BLOCKS * SAMPLE_BLOCK_BYTES are
+        identified by their shape, dtype and SAMPLE_BLOCKS evenly spaced
+        blocks instead of their full contents. Much faster for multi-GB
+        inputs, but changes outside the sampled blocks go unnoticed.
+        Default is False.
+
+    chunk_bytes : int, optional
+        Number of bytes fed to the hash function at a time.
+
+    Returns
+    -------
+    digest : str
+    """
+    hasher = _Fingerprinter(sampled=sampled, chunk_bytes=chunk_bytes)
+    hasher.hasher.update(b'sampled' if sampled else b'full')
+    for obj in objects:
+        hasher.update(obj)
+    return hasher.hexdigest()
+
+
+class _Fingerprinter(object):
+
+    def __init__(self, sampled, chunk_bytes):
+        self.hasher = hashlib.blake2b(digest_size=20)
+        self.sampled = sampled
+        self.chunk_bytes = max(int(chunk_bytes), 1)
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+    def update(self, obj):
+        self.hasher.update(type(obj).__name__.encode())
+        if isinstance(obj, np.ndarray):
+            self.update_array(obj)
+        elif hasattr(obj, 'tocsr') and hasattr(obj, 'nnz'):  # scipy sparse
+            self.update_sparse(obj)
+        elif hasattr(obj, 'columns') and hasattr(obj, 'dtypes'):  # pandas DataFrame
+            self.update(list(obj.columns))
+            self.update_array(np.asarray(obj.index))
+            for _, column in obj.items():
+                self.update_array(column.values)
+        elif hasattr(obj, 'dtype') and hasattr(obj, 'index'):  # pandas Series
+            self.update_array(np.asarray(obj.index))
+            self.update_array(obj.values)
+        elif isinstance(obj, dict):
+            for key in sorted(obj, key=repr):
+                self.update(key)
+                self.update(obj[key])
+        elif isinstance(obj, (list, tuple)):
+            self.hasher.update(str(len(obj)).encode())
+            for value in obj:
+                self.update(value)
+        elif hasattr(obj, 'get_params') and not isinstance(obj, type):
+            self.update(obj.__class__.__module__ + '.' + obj.__class__.__name__)
+            self.update(obj.get_params(deep=False))
+        else:
+            self.hasher.update(repr(obj).encode())
+
+    def update_sparse(self, matrix):
+        if matrix.format not in ('csr', 'csc'):
+            matrix = matrix.tocsr()
+        self.hasher.update('{}{}'.format(matrix.format, matrix.shape).encode())
+        for array in (matrix.data, matrix.indices, matrix.indptr):
+            self.update_array(array)
+
+    def update_array(self, array):
+        array = np.asarray(array)  # Categorical and extension arrays
+        self.hasher.update('{}{}'.format(array.dtype.str, array.shape).encode())
+        if array.dtype == object:
+            import pandas as pd
+            self.update_array(pd.util.hash_array(array.ravel()))
+        elif array.flags['C_CONTIGUOUS']:
+            self.update_buffer(array)
+        elif array.flags['F_CONTIGUOUS']:
+            self.hasher.update(b'F')
+            self.update_buffer(array.T)
+        else:
+            ## Copies only `chunk_bytes` worth of rows at a time.
+            row_bytes = max(array[:1].nbytes, 1)
+            step = max(self.chunk_bytes // row_bytes, 1)
+            for start in range(0, array.shape[0], step):
+                self.update_buffer(np.ascontiguousarray(array[start:start + step]))
+
+    def update_buffer(self, array):
+        buffer = memoryview(array.reshape(-1).view(np.uint8))
+        size = len(buffer)
+        if self.sampled and size > SAMPLE_BLOCKS * SAMPLE_BLOCK_BYTES:
+            stride = (size - SAMPLE_BLOCK_BYTES) // (SAMPLE_BLOCKS - 1)
+            for block in range(SAMPLE_BLOCKS):
+                start = block * stride
+                self.hasher.update(buffer[start:start + SAMPLE_BLOCK_BYTES])
+        else:
+            for start in range(0, size, self.chunk_bytes):
+                self.hasher.update(buffer[start:start + self.chunk_bytes])
+
+
+class ChunkedFingerprint(object):
+    """
+    Identifies data read as (X, y) chunks, such as a chunked data source,
+    one chunk at a time. Rows are hashed as one stream of bytes per array,
+    so the digest does not depend on how the data is split into chunks.
+
+    Methods
+    -------
+    update(X, y=None)
+        Adds a chunk.
+
+    hexdigest()
+        Returns the digest of the chunks added so far.
+    """
+
+    def __init__(self):
+        self.hashers = [hashlib.blake2b(digest_size=20), hashlib.blake2b(digest_size=20)]
+        self.layouts = [None, None]
+        self.n_rows = 0
+
+    def update(self, X, y=None):
+        self.n_rows += len(X)
+        for index, array in enumerate((X, y)):
+            if array is None:
+                continue
+            array = np.asarray(array)
+            if array.dtype == object:
+                import pandas as pd
+                array = pd.util.hash_array(array.ravel()).reshape(array.shape)
+            array = np.ascontiguousarray(array)
+            if self.layouts[index] is None:
+                self.layouts[index] = (array.dtype.str, array.shape[1:])
+            self.hashers[index].update(memoryview(array.reshape(-1).view(np.uint8)))
+
+    def hexdigest(self):
+        return fingerprint(self.n_rows, self.layouts, [hasher.hexdigest() for hasher in self.hashers])
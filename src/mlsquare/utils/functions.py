@@ -4,6 +4,7 @@
 """
     This file holds utility functions used by multiple entities.
 """
+import copy
 
 
 def _get_module_name(model):
@@ -13,6 +14,29 @@ def _get_module_name(model):
 def _get_model_name(model):
     return model.__class__.__name__
 
+def _clone_primal(model, refit=None):
+    """
+    Copies a primal model before handing it to an adapter.
+
+    refit=True  -- the adapter fits the copy again, so only the constructor
+                   params are copied (sklearn `clone` semantics). Param values
+                   are shared rather than deep-copied; nested estimators are
+                   cloned the same way.
+    refit=False -- the adapter only reads the primal, so a shallow copy shares
+                   the fitted state (tree_, coef_, data) read-only.
+    refit=None  -- unknown adapter; falls back to a deep copy.
+    """
+    if refit is None:
+        return copy.deepcopy(model)
+    if refit and hasattr(model, 'get_params') and not isinstance(model, type):
+        params = {}
+        for key, value in model.get_params(deep=False).items():
+            if hasattr(value, 'get_params') and not isinstance(value, type):
+                value = _clone_primal(value, refit=True)
+            params[key] = value
+        return model.__class__(**params)
+    return copy.copy(model)
+
 def _parse_params(params, return_as):
     if return_as == 'nested':
         edited_params = {}
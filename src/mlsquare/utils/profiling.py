@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Lightweight timing spans for the transpile and fit hot paths.
+
+    Spans are only recorded while a Profiler is active in the current
+    thread -- inside `with profile():` or a fit called with `profile=True`.
+    Otherwise `span()` hands back a shared no-op object, so instrumented
+    code pays a thread-local lookup and nothing else. Counters, such as
+    the bytes copied converting inputs, are recorded the same way with
+    `count()`.
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+_local = threading.local()
+_enabled = False
+
+
+def enable(flag=True):
+    """Profiles every adapter fit by default, as if called with profile=True."""
+    global _enabled
+    _enabled = bool(flag)
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start, time.time())
+        return False
+
+
+class Profiler(object):
+    """
+    Collects timing spans and reports them.
+
+    Methods
+    -------
+    add(name, start, end, tid=None)
+        Records a span. Used for stages timed elsewhere, e.g. Tune trials.
+
+    count(name, value=1)
+        Adds `value` to the counter `name`; counters are kept in `counts`.
+
+    report()
+        Returns {name: {'count': int, 'total_s': float}} in order of first
+        occurrence.
+
+    summary()
+        Returns the report as a printable table.
+
+    save_chrome_trace(filename)
+        Writes the spans in Chrome trace format (chrome://tracing).
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, start, end, tid=None):
+        if tid is None:
+            tid = threading.current_thread().name
+        with self._lock:
+            self.spans.append((name, start, end, tid))
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def report(self):
+        report = {}
+        for name, start, end, _ in self.spans:
+            entry = report.setdefault(name, {'count': 0, 'total_s': 0.0})
+            entry['count'] += 1
+            entry['total_s'] += end - start
+        return report
+
+    def summary(self):
+        lines = ['{:<40} {:>6} {:>12}'.format('stage', 'count', 'seconds')]
+        for name, entry in self.report().items():
+            lines.append('{:<40} {:>6} {:>12.3f}'.format(name, entry['count'], entry['total_s']))
+        for name, value in self.counts.items():
+            lines.append('{:<40} {:>19}'.format(name, value))
+        return '\n'.join(lines)
+
+    def save_chrome_trace(self, filename):
+        events = [{'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': (end - start) * 1e6,
+                   'pid': os.getpid(), 'tid': str(tid)}
+                  for name, start, end, tid in self.spans]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def active_profiler():
+    """Returns the Profiler active in this thread, or None."""
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def span(name):
+    """Times the enclosed block as `name` if a Profiler is active."""
+    stack = getattr(_local, 'stack', None)
+    if not stack:
+        return _NULL_SPAN
+    return _Span(stack[-1], name)
+
+
+def count(name, value=1):
+    """Adds `value` to the counter `name` if a Profiler is active."""
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        stack[-1].count(name, value)
+
+
+class profile(object):
+    """
+    Context manager activating a Profiler for the current thread.
+
+    Parameters
+    ----------
+    chrome_trace : str, optional
+        If given, the spans are written there in Chrome trace format on exit.
+    """
+
+    def __init__(self, chrome_trace=None):
+        self.chrome_trace = chrome_trace
+        self.profiler = Profiler()
+
+    def __enter__(self):
+        if getattr(_local, 'stack', None) is None:
+            _local.stack = []
+        _local.stack.append(self.profiler)
+        return self.profiler
+
+    def __exit__(self, *exc):
+        _local.stack.remove(self.profiler)
+        if self.chrome_trace:
+            self.profiler.save_chrome_trace(self.chrome_trace)
+        return False
+
+
+def profiled(fit):
+    """
+    Decorates an adapter's fit. Accepts a `profile` option -- True, or a
+    filename for a Chrome trace -- and stores the per-fit report on the
+    adapter as `timings_` and its counters as `counts_`.
+    """
+    @functools.wraps(fit)
+    def wrapper(self, *args, **kwargs):
+        option = kwargs.pop('profile', None)
+        if option is None:
+            option = _enabled
+        if not option:
+            return fit(self, *args, **kwargs)
+        chrome_trace = option if isinstance(option, str) else None
+        with profile(chrome_trace=chrome_trace) as profiler:
+            try:
+                with span(type(self).__name__ + '.fit'):
+                    return fit(self, *args, **kwargs)
+            finally:
+                self.profiler_ = profiler
+                self.timings_ = profiler.report()
+                self.counts_ = dict(profiler.counts)
+    return wrapper
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Out-of-core fitting: chunked data sources and the on-disk training
+    set a proxy is fitted on when its data does not fit in memory.
+
+    A source is read one chunk at a time; the primal model predicts each
+    chunk and the inputs with their distillation targets are spooled to
+    disk, from where trials read them back a batch at a time. Memory use
+    follows the chunk and batch sizes rather than the size of the data.
+"""
+import itertools
+import os
+import shutil
+import tempfile
+import warnings
+import weakref
+
+import numpy as np
+
+from .arrays import as_array, floatx
+from .fingerprint import ChunkedFingerprint
+
+SAMPLE_ROWS = 100000
+
+
+def is_stream(X):
+    """True if X is a chunked data source rather than an in-memory array."""
+    return isinstance(X, str) or (callable(X) and not hasattr(X, 'shape'))
+
+
+def iter_chunks(source, target=None, chunk_size=10000):
+    """
+    Yields (X, y) chunks of a data source.
+
+    Parameters
+    ----------
+    source : str or callable
+        Path to a .csv or .parquet file, or a function returning an
+        iterable of (X, y) or X chunks -- called again for every pass.
+
+    target : str, optional
+        For files, the column holding y. Without it y is None.
+
+    chunk_size : int, optional
+        Rows per chunk read from files. Default is 10000.
+    """
+    if callable(source):
+        for chunk in source():
+            if isinstance(chunk, tuple):
+                yield np.asarray(chunk[0]), None if chunk[1] is None else np.asarray(chunk[1])
+            else:
+                yield np.asarray(chunk), None
+        return
+    if str(source).endswith('.parquet'):
+        import pyarrow.parquet as pq
+        frames = (batch.to_pandas() for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size))
+    else:
+        import pandas as pd
+        frames = pd.read_csv(source, chunksize=chunk_size)
+    for frame in frames:
+        y = frame.pop(target).values if target is not None else None
+        yield frame.values, y
+
+
+def _is_fitted(model):
+    return any(name.endswith('_') and not name.startswith('__') for name in vars(model))
+
+
+class SpooledDataset(object):
+    """
+    Inputs and distillation targets of a proxy, spooled to raw binary
+    files and memory-mapped read-only. Pickles as its paths, so trials open the
+    files themselves instead of receiving a copy of the data.
+
+    Attributes
+    ----------
+    X, y_pred : np.memmap
+        Inputs and the primal model's (transformed) predictions.
+
+    sample : tuple
+        (X, y, y_pred) of the first rows, in memory.
+
+    data_key : str
+        Fingerprint of the source's X and y as read, see
+        `fingerprint.ChunkedFingerprint`.
+    """
+
+    def __init__(self, directory, n_rows, n_features, n_targets, sample, dtype=np.float32, data_key=None):
+        self.directory = directory
+        self.shape = (n_rows, n_features)
+        self.n_targets = n_targets
+        self.sample = sample
+        self.dtype = np.dtype(dtype)
+        self.data_key = data_key
+        self._arrays = None
+        self._finalizer = weakref.finalize(self, shutil.rmtree, directory, True)
+
+    def __getstate__(self):
+        state = dict(self.__dict__, _arrays=None)
+        del state['_finalizer']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._finalizer = None  # Only the process that spooled the data removes it.
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.shape[0] * (self.shape[1] + self.n_targets) * self.dtype.itemsize
+
+    def _open(self):
+        if self._arrays is None:
+            self._arrays = (
+                np.memmap(os.path.join(self.directory, 'X.bin'), dtype=self.dtype, mode='r', shape=self.shape),
+                np.memmap(os.path.join(self.directory, 'y_pred.bin'), dtype=self.dtype, mode='r',
+                          shape=(self.shape[0], self.n_targets)))
+        return self._arrays
+
+    @property
+    def X(self):
+        return self._open()[0]
+
+    @property
+    def y_pred(self):
+        return self._open()[1]
+
+    def rows(self, max_rows=10000):
+        """(X, y_pred) of at most `max_rows` evenly spaced rows, in memory."""
+        step = max(self.shape[0] // max_rows, 1)
+        return np.array(self.X[::step]), np.array(self.y_pred[::step])
+
+    def sequence(self, batch_size):
+        """A keras Sequence of contiguous (X, y_pred) batches; the batch order is shuffled by fit_generator."""
+        from keras.utils import Sequence
+
+        data = self
+
+        class _Batches(Sequence):
+            def __len__(self):
+                return int(np.ceil(len(data) / float(batch_size)))
+
+            def __getitem__(self, index):
+                X, y_pred = data._open()
+                start = index * batch_size
+                return np.array(X[start:start + batch_size]), np.array(y_pred[start:start + batch_size])
+
+        return _Batches()
+
+    def remove(self):
+        self._arrays = None
+        if self._finalizer is not None:
+            self._finalizer()
+
+
+def spool(source, target, primal_model, transform, chunk_size=10000, directory=None,
+          sample_rows=SAMPLE_ROWS, dtype=None):
+    """
+    Reads `source` chunk by chunk, has the primal model predict each
+    chunk and writes the inputs and the transformed predictions to disk.
+
+    The first `sample_rows` rows are kept in memory as a sample. An
+    unfitted primal model is fitted on that sample, with a warning as it
+    only sees the head of the source. `transform` -- the proxy's
+    `transform_data` -- is fitted on the sample too, then applied to every
+    chunk with fit=False. Data is written as `dtype`, by default
+    `utils.arrays.floatx()`.
+
+    Returns
+    -------
+    data : SpooledDataset
+    """
+    dtype = dtype or floatx()
+    directory = tempfile.mkdtemp(prefix='mlsquare-spool-', dir=directory)
+    try:
+        return _spool(directory, source, target, primal_model, transform, chunk_size, sample_rows, dtype)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+
+def _spool(directory, source, target, primal_model, transform, chunk_size, sample_rows, dtype):
+    chunks = iter_chunks(source, target=target, chunk_size=chunk_size)
+    head, n_head = [], 0
+    for X_chunk, y_chunk in chunks:
+        head.append((X_chunk, y_chunk))
+        n_head += len(X_chunk)
+        if n_head >= sample_rows:
+            break
+    if not head:
+        raise ValueError('The data source is empty.')
+    X_sample = np.concatenate([X_chunk for X_chunk, _ in head])
+    y_sample = None if head[0][1] is None else np.concatenate([y_chunk for _, y_chunk in head])
+    if not _is_fitted(primal_model):
+        if y_sample is None:
+            raise ValueError('An unfitted primal model needs a target column to be fitted on.')
+        warnings.warn('The primal model is not fitted; it is fitted on the first %d rows of the data source '
+                      'only, and predicts the distillation targets of all rows. Pass a fitted primal model '
+                      'to distill it instead.' % len(X_sample))
+        primal_model.fit(X_sample, y_sample)
+    y_pred_sample = primal_model.predict(X_sample)
+    X_sample, y_sample, y_pred_sample = transform(X_sample, y_pred_sample if y_sample is None else y_sample,
+                                                  y_pred_sample, fit=True)
+    sample = (as_array(X_sample, dtype=dtype), y_sample, as_array(y_pred_sample, dtype=dtype))
+
+    n_rows, n_targets = 0, None
+    data_key = ChunkedFingerprint()
+    with open(os.path.join(directory, 'X.bin'), 'wb') as X_file, \
+            open(os.path.join(directory, 'y_pred.bin'), 'wb') as y_file:
+        for X_chunk, y_chunk in itertools.chain(head, chunks):
+            data_key.update(X_chunk, y_chunk)
+            y_pred = primal_model.predict(X_chunk)
+            X_chunk, _, y_pred = transform(X_chunk, y_pred if y_chunk is None else y_chunk, y_pred, fit=False)
+            y_pred = np.asarray(y_pred, dtype=dtype).reshape(len(X_chunk), -1)
+            n_targets = y_pred.shape[1]
+            X_file.write(np.ascontiguousarray(X_chunk, dtype=dtype).tobytes())
+            y_file.write(y_pred.tobytes())
+            n_rows += len(X_chunk)
+    return SpooledDataset(directory, n_rows, X_sample.shape[1], n_targets, sample, dtype=dtype,
+                          data_key=data_key.hexdigest())
+
+
+def release(proxy_model):
+    """Removes the spooled data a proxy model was fitted on, if any."""
+    data = getattr(proxy_model, 'spooled', None)
+    if data is not None:
+        proxy_model.spooled = None
+        data.remove()
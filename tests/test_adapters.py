@@ -92,6 +92,37 @@ def test_sklearn_keras_regressor_with_inappropriate_params():
     with pytest.raises(TypeError) as _:
         _trained_model = model.fit(x_train, y_train, params=params)
 
+def test_irt_ids_from_ids_and_one_hot_rows():
+    from scipy import sparse
+    from mlsquare.adapters.sklearn import _irt_ids
+
+    ids = np.array([0, 2, 1, 2])
+    one_hot = np.eye(3)[ids]
+    for x in (ids, ids.reshape(-1, 1), one_hot, sparse.csr_matrix(one_hot)):
+        x_ids, n = _irt_ids(x, 'users')
+        np.testing.assert_array_equal(x_ids, ids)
+        assert x_ids.dtype == np.int32 and n == 3
+    with pytest.raises(ValueError):
+        _irt_ids(np.array([0, 3]), 'users', n=3)
+    with pytest.raises(ValueError):
+        _irt_ids(one_hot[:, :2], 'users')
+
+def test_fit_key_covers_the_adapter_options():
+    from mlsquare.adapters.sklearn import _fit_key, IrtKerasRegressor, SklearnKerasRegressor
+
+    class _Proxy(object):
+        name, version = 'proxy', '0.1'
+
+    adapter = SklearnKerasRegressor(_Proxy(), LinearRegression())
+    X, y = np.ones((4, 2)), np.zeros(4)
+    options = {name: None for name in SklearnKerasRegressor.key_options}
+    key = _fit_key(adapter, (X, y), dict(options, verbose=1))
+    assert _fit_key(adapter, (X, y), options) == key
+    assert _fit_key(adapter, (X, y), dict(options, epochs=10)) != key
+    irt = IrtKerasRegressor(_Proxy(), None)
+    irt_options = {name: None for name in IrtKerasRegressor.key_options}
+    assert _fit_key(irt, (X, y), irt_options) != _fit_key(irt, (X, y), dict(irt_options, latent_traits=2))
+
 # @pytest.mark.xfail()
 # def test_sklearn_keras_regressor_test_save():
 #     # Rewrite this test. This should not be non-deterministic.
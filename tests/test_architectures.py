@@ -331,6 +331,101 @@ def test_cart_create_model_method():
     assert mock_proxy_model.optimizer.__class__.__name__ == 'Adam'
     assert mock_proxy_model.loss == 'categorical_crossentropy'
 
+def test_cart_create_model_with_searched_cuts_per_feature():
+    model_params = {
+        'layer_3': {'activation': 'sigmoid'},
+        'optimizer': 'adam',
+        'loss': 'categorical_crossentropy',
+        'cuts_per_feature': 2
+    }
+
+    mock_proxy_model = _prepare_mock_model(CART, SklearnKerasClassifier,
+                                           'sklearn', 'LogisticRegression',
+                                           'default', model_params, primal_model=DecisionTreeClassifier())
+
+    assert [len(cuts) for cuts in mock_proxy_model.layers[1].get_weights()] == [2, 2]
+    # 3 bins per feature, 2 features.
+    assert mock_proxy_model.layers[1].output_shape[1] == 9
+
+    model_params['cuts_per_feature'] = [1, 2, 3]
+    with pytest.raises(ValueError):
+        _prepare_mock_model(CART, SklearnKerasClassifier, 'sklearn', 'LogisticRegression',
+                            'default', model_params, primal_model=DecisionTreeClassifier())
+
 def test_linear_svc_transform_data():
     # Pending
     pass
+
+def test_glm_warm_start_from_primal_coefficients():
+    x_train, _, y_train, _ = _load_classification_data()
+    proxy_model = _mock_dope(LogisticRegression())
+    proxy_model._prepare_fit(x_train, y_train, warm_start=True)
+    model = proxy_model.proxy_model.create_model()
+
+    kernel, bias = model.layers[0].get_weights()
+    np.testing.assert_allclose(kernel, proxy_model.primal_model.coef_.T, rtol=1e-6)
+    np.testing.assert_allclose(bias, proxy_model.primal_model.intercept_, rtol=1e-6)
+    np.testing.assert_array_equal((model.predict(np.array(x_train)) > 0.5).ravel(),
+                                  proxy_model.primal_model.predict(x_train) == 1)
+
+def test_cart_warm_start_from_tree_thresholds():
+    x_train, _, y_train, _ = _load_classification_data()
+    proxy_model = _mock_dope(DecisionTreeClassifier())
+    proxy_model._prepare_fit(x_train, to_categorical(y_train), warm_start=True)
+    model = proxy_model.proxy_model.create_model()
+
+    tree = proxy_model.primal_model.tree_
+    for feature, cut_points in enumerate(model.layers[1].get_weights()):
+        assert np.all(np.diff(cut_points) >= 0)
+        thresholds = tree.threshold[tree.feature == feature]
+        assert np.isin(thresholds.astype(cut_points.dtype), cut_points).all() or len(thresholds) > len(cut_points)
+
+def test_least_squares_matches_sklearn():
+    from mlsquare.architectures.sklearn import _least_squares
+    x_train, _, y_train, _ = _load_regression_data()
+    X, y = np.array(x_train), np.array(y_train)
+    primal_model = Ridge(alpha=2.0).fit(X, y)
+    coef, intercept = _least_squares(X, y, l2=2.0, chunk_size=50)
+    np.testing.assert_allclose(coef.ravel(), primal_model.coef_, rtol=1e-6)
+    np.testing.assert_allclose(intercept, primal_model.intercept_, rtol=1e-6)
+
+def test_linear_regression_lstsq_solver():
+    x_train, x_test, y_train, _ = _load_regression_data()
+    primal_model = LinearRegression()
+    proxy_model = _mock_dope(primal_model)
+    proxy_model.fit(x_train, y_train, solver='lstsq')
+
+    assert proxy_model.trials == []
+    np.testing.assert_allclose(proxy_model.predict(x_test).ravel(), primal_model.predict(x_test), rtol=1e-3)
+
+def test_lstsq_solver_reuses_the_primal_predictions():
+    x_train, _, y_train, _ = _load_regression_data()
+    proxy_model = _mock_dope(LinearRegression())
+    _, _, primal_data, _ = proxy_model._prepare_fit(x_train, y_train, solver='lstsq')
+    assert proxy_model.proxy_model.y_pred is primal_data['y_pred']
+
+    def predict(X):
+        raise AssertionError('The primal model predicted again.')
+    proxy_model.primal_model.predict = predict
+    model = proxy_model.proxy_model.create_model()
+    np.testing.assert_allclose(model.predict(np.array(x_train)).ravel(), primal_data['y_pred'], rtol=1e-3)
+
+def test_sparse_inputs_lstsq_solver():
+    from scipy import sparse
+    from mlsquare.architectures.sklearn import _least_squares
+    X = sparse.random(300, 20, density=0.1, format='csc', random_state=0)
+    y = np.random.RandomState(0).rand(300)
+    coef, intercept = _least_squares(X.tocsr(), y, l2=2.0, chunk_size=50)
+    primal_model = Ridge(alpha=2.0).fit(X.toarray(), y)
+    np.testing.assert_allclose(coef.ravel(), primal_model.coef_, rtol=1e-6)
+
+    proxy_model = _mock_dope(Ridge(alpha=2.0))
+    proxy_model.fit(X, y, solver='lstsq')
+    assert proxy_model.proxy_model.X.format == 'csr'
+    np.testing.assert_allclose(proxy_model.predict(X).ravel(), proxy_model.primal_model.predict(X), rtol=1e-3)
+
+def test_lasso_does_not_support_lstsq_solver():
+    x_train, _, y_train, _ = _load_regression_data()
+    proxy_model = _mock_dope(Lasso())
+    with pytest.raises(ValueError):
+        proxy_model.fit(x_train, y_train, solver='lstsq')
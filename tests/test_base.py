@@ -5,4 +5,33 @@ def test_base_model_initialization():
     with pytest.raises(TypeError) as _:
         class TestBase(BaseModel):
             pass
-        _test_base = TestBase()
\ No newline at end of file
+        _test_base = TestBase()
+
+def test_registry_defers_model_construction():
+    from mlsquare.base import Registry
+    built = []
+
+    class Adapter(object):
+        pass
+
+    class MockModel(object):
+        adapter = Adapter
+        module_name = 'mock'
+        name = 'MockModel'
+        version = 'default'
+
+        def __init__(self):
+            built.append(self)
+
+    test_registry = Registry()
+    assert test_registry.register(MockModel) is MockModel
+    assert built == []
+    proxy_model, adapter = test_registry[('mock', 'MockModel')]['default']
+    assert isinstance(proxy_model, MockModel)
+    assert adapter is Adapter
+    assert len(built) == 1
+    descriptor = test_registry[('mock', 'MockModel')]['default']
+    assert descriptor[1] is Adapter and descriptor[-1] is Adapter
+    assert len(built) == 1
+    assert isinstance(descriptor[0], MockModel)
+    assert len(built) == 2
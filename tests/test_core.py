@@ -45,4 +45,118 @@ def test_dope_using_transpilation_type_as_None():
     assert isinstance(m, type(model))
 
 def test_dope_with_version():
-    pass
\ No newline at end of file
+    pass
+
+def test_import_does_not_load_heavy_backends():
+    import subprocess
+    import sys
+    code = ("import sys, mlsquare;"
+            "print(sorted(m for m in ('ray', 'onnxmltools', 'matplotlib') if m in sys.modules))")
+    out = subprocess.check_output([sys.executable, '-c', code])
+    assert out.decode().strip() == '[]'
+
+def test_dope_sessions_do_not_share_proxy_models():
+    first = dope(LogisticRegression())
+    second = dope(LogisticRegression())
+    assert first.proxy_model is not second.proxy_model
+    first.proxy_model.update_params({'optimizer': 'nadam'})
+    assert second.proxy_model.get_params()['optimizer'] == 'adam'
+
+def test_dope_selection_metric_by_task():
+    from sklearn.linear_model import LinearRegression
+    assert (dope(LogisticRegression()).metric, dope(LogisticRegression()).metric_mode) == ('mean_accuracy', 'max')
+    assert (dope(LinearRegression()).metric, dope(LinearRegression()).metric_mode) == ('mean_loss', 'min')
+
+def test_dope_many_with_unsupported_adapter():
+    from sklearn.decomposition import TruncatedSVD
+    from mlsquare import dope_many
+    with pytest.raises(TypeError) as _:
+        next(dope_many([(TruncatedSVD(n_components=2), None, None, None)]))
+
+def test_dope_many_rejects_per_fit_options():
+    from mlsquare import dope_many
+    for option in ('cache', 'resume', 'profile'):
+        with pytest.raises(ValueError):
+            next(dope_many([(LogisticRegression(), None, None, None)], **{option: True}))
+
+def test_dope_many_with_a_classifier_and_a_regressor():
+    pytest.importorskip('keras')
+    pytest.importorskip('ray')
+    import numpy as np
+    from sklearn.linear_model import LinearRegression
+    from mlsquare import dope_many
+    from mlsquare.optmizers.session import RaySession
+
+    X = np.random.random((200, 3))
+    jobs = [(LogisticRegression(), X, (X[:, 0] > 0.5).astype(int), None),
+            (LinearRegression(), X, np.dot(X, [1., 2., 3.]), None)]
+    with RaySession(num_cpus=2):
+        models = dict(dope_many(jobs, epochs=2, batch_size=50))
+        assert sorted(models) == [0, 1]
+        assert len(models[0].predict(X)) == 200
+        assert models[1].predict(X).shape == (200, 1)
+        assert all('neg_mean_loss' in trial.last_result for trial in models[1].trials)
+        with pytest.raises(ValueError):
+            list(dope_many(jobs, epochs=2, scheduler='asha'))
+
+def test_prepare_fit_converts_to_floatx():
+    import numpy as np
+    from mlsquare.utils import arrays
+
+    X = np.random.random((40, 3))
+    y = (X[:, 0] > 0.5).astype(int)
+    model = dope(LogisticRegression())
+    X_, y_, primal_data, _ = model._prepare_fit(X, y)
+    assert X_.dtype == y_.dtype == primal_data['y_pred'].dtype == np.float32
+    arrays.set_floatx('float64')
+    try:
+        X_, _, _, _ = model._prepare_fit(X, y)
+        assert X_ is X
+    finally:
+        arrays.set_floatx('float32')
+    with pytest.raises(ValueError):
+        arrays.set_floatx('int32')
+
+def test_streamed_fit_keeps_the_fitted_primal(tmpdir):
+    import warnings
+    import numpy as np
+    from sklearn.linear_model import LinearRegression
+    from mlsquare.utils.streaming import release
+
+    X = np.random.random((300, 3))
+    y = np.dot(X, [1., 2., 3.]) + np.random.random(300)
+    source = lambda: ((X[i:i + 100], y[i:i + 100]) for i in range(0, 300, 100))
+    primal = LinearRegression().fit(X, y)
+    coef = primal.coef_.copy()
+    model = dope(primal)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        X_, _, _, _ = model._prepare_fit(source, spool_dir=str(tmpdir))
+    try:
+        np.testing.assert_array_equal(model.primal_model.coef_, coef)
+        assert model.fitted_primal is None
+        np.testing.assert_allclose(X_.y_pred[:, 0], primal.predict(X), rtol=1e-4)
+    finally:
+        release(model.proxy_model)
+    np.testing.assert_array_equal(primal.coef_, coef)
+
+    model = dope(primal)
+    model._prepare_fit(X, y)
+    assert model.fitted_primal is None and model.primal_model is not primal
+
+    model = dope(LinearRegression())
+    with pytest.warns(UserWarning):
+        model._prepare_fit(source, spool_dir=str(tmpdir))
+    release(model.proxy_model)
+
+def test_prepare_fit_keeps_lstsq_targets_only():
+    import numpy as np
+    from sklearn.linear_model import LinearRegression
+
+    X = np.random.random((40, 3))
+    y = np.dot(X, [1., 2., 3.])
+    model = dope(LinearRegression())
+    _, _, primal_data, _ = model._prepare_fit(X, y, solver='lstsq')
+    assert model.proxy_model.y_pred is primal_data['y_pred']
+    model._prepare_fit(X, y)
+    assert model.proxy_model.y_pred is None
@@ -12,3 +12,21 @@ def test_bin_layer():
     model.fit(x=np.random.random((5,4)), y=np.random.random((5,3)))
     pred = model.predict(np.random.random((5,4)))
     assert pred.shape == (5,3)
+
+def test_dense_lookup_matches_dense_on_one_hot():
+    from keras.layers import Dense
+    from mlsquare.layers import DenseLookup
+
+    ids = np.array([0, 3, 1, 3])
+    one_hot = np.eye(4)[ids]
+    lookup = DenseLookup(4, 2, activation='sigmoid', bias_initializer='ones', name='lookup')
+    id_input = Input(shape=(1,), dtype='int32')
+    lookup_model = Model(inputs=id_input, outputs=lookup(id_input))
+    dense_input = Input(shape=(4,))
+    dense = Dense(2, activation='sigmoid')
+    dense_model = Model(inputs=dense_input, outputs=dense(dense_input))
+    dense.set_weights(lookup.get_weights())
+
+    assert [w.shape for w in lookup.get_weights()] == [(4, 2), (2,)]
+    np.testing.assert_allclose(lookup_model.predict(ids), dense_model.predict(one_hot), rtol=1e-6)
+    assert lookup.get_config()['bias_initializer']['class_name'] == 'Ones'
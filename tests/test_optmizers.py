@@ -0,0 +1,407 @@
+import pytest
+
+from mlsquare.optmizers.session import RaySession, get_session, set_session
+
+
+def test_ray_session_sizing(monkeypatch):
+    monkeypatch.delenv('MLSQUARE_RAY_ADDRESS', raising=False)
+    monkeypatch.setenv('MLSQUARE_RAY_NUM_CPUS', '3')
+    kwargs = RaySession(redis_max_memory=10**8).init_kwargs()
+    assert kwargs['num_cpus'] == 3
+    assert kwargs['redis_max_memory'] == 10**8
+    assert kwargs['object_store_memory'] > 0
+    assert 'local_mode' not in kwargs
+
+    session = RaySession(local_mode='auto', local_mode_max_bytes=1000)
+    assert session.init_kwargs(data_bytes=10)['local_mode']
+    assert 'local_mode' not in session.init_kwargs(data_bytes=10**6)
+
+    attached = RaySession(address='127.0.0.1:6379').init_kwargs()
+    assert attached['redis_address'] == '127.0.0.1:6379'
+    assert 'num_cpus' not in attached
+
+
+def test_ray_session_scoping():
+    default = RaySession(num_cpus=2)
+    set_session(default)
+    assert get_session() is default
+    with RaySession(num_cpus=8) as session:
+        assert get_session() is session
+        assert session.num_trial_cpus == 8
+    assert get_session() is default
+    set_session(None)
+
+
+def test_trial_data_roundtrip():
+    pytest.importorskip('ray')
+    import numpy as np
+    from mlsquare.optmizers.tune import _TrialData
+
+    class Proxy(object):
+        pass
+
+    proxy = Proxy()
+    proxy.X = np.arange(12.).reshape(4, 3)
+    proxy.y = None
+    y_pred = np.ones(4)
+    with RaySession(num_cpus=1, local_mode=True) as session:
+        session.start()
+        trial_data = _TrialData(proxy, [proxy.X, y_pred], attributes=('X', 'y'))
+        assert trial_data.proxy_model.X is None
+        trial_proxy, (X, y) = trial_data.get()
+    np.testing.assert_array_equal(trial_proxy.X, proxy.X)
+    np.testing.assert_array_equal(X, proxy.X)
+    np.testing.assert_array_equal(y, y_pred)
+    assert trial_proxy.y is None
+
+
+def test_search_space():
+    import numpy as np
+    from mlsquare.architectures.sklearn import Ridge
+    from mlsquare.architectures.irt import KerasIrt2PLModel
+    from mlsquare.optmizers.search import get_search_space, resolve_config, choice, loguniform, randint
+
+    proxy = Ridge()
+    assert get_search_space(proxy, space=False) == {}
+    space = get_search_space(proxy, space=True, params={'layer_1.l2': 0.5})
+    assert set(space) == {'optimizer'}
+    space = get_search_space(proxy, space={'layer_1.l1': [0, 0.1]})
+    assert space['layer_1.l1'].grid() == [0, 0.1]
+    with pytest.raises(TypeError):
+        get_search_space(proxy, space={'layer_1.l1': 0.1})
+
+    assert set(get_search_space(KerasIrt2PLModel, params={'hyper_params': {'optimizer': 'adam'}})) == {
+        'ability_params.regularizers.l2', 'diff_params.regularizers.l2'}
+
+    rng = np.random.RandomState(0)
+    assert 1e-3 <= loguniform(1e-3, 1).sample(rng) <= 1
+    assert loguniform(1e-2, 1).grid() == pytest.approx([1e-2, 1e-1, 1])
+    assert randint(1, 4).grid() == [1, 2, 3]
+    assert choice(['a']).sample(rng) == 'a'
+
+    shared = {'l1': 0, 'l2': 0}
+    config = {'layer_1.l2': 0.1, 'ability_params': {'units': 1, 'regularizers': shared},
+              'ability_params.regularizers.l2': 0.01, 'hyper_params.optimizer': 'adam',
+              'hyper_params': {'optimizer': 'sgd'}}
+    resolved = resolve_config(config)
+    assert resolved['layer_1.l2'] == 0.1
+    assert resolved['ability_params'] == {'units': 1, 'regularizers': {'l1': 0, 'l2': 0.01}}
+    assert resolved['hyper_params'] == {'optimizer': 'adam'}
+    assert shared == {'l1': 0, 'l2': 0}
+
+
+def test_tune_reporter():
+    pytest.importorskip('keras')
+    from mlsquare.optmizers.callbacks import TuneReporter
+
+    reports = []
+    callback = TuneReporter(lambda **result: reports.append(result), freq=2,
+                            checkpoint=lambda model: {'checkpoint': model})
+    callback.set_model('model')
+    callback.set_params({'epochs': 6})
+    callback.on_train_begin()
+    for epoch in range(6):
+        callback.on_epoch_end(epoch, {'loss': 1.0 / (epoch + 1), 'acc': 0.1 * epoch})
+    assert [report['epochs_done'] for report in reports] == [2, 4]
+    assert reports[-1]['mean_accuracy'] == pytest.approx(0.3)
+    assert reports[-1]['checkpoint'] == 'model'
+    assert reports[-1]['neg_mean_loss'] == pytest.approx(-0.25)
+
+
+def test_tune_results_of_an_irt_evaluation():
+    pytest.importorskip('keras')
+    from mlsquare.optmizers.callbacks import tune_results
+
+    scores = dict(zip(['loss', 'mean_absolute_error', 'acc'], [0.5, 0.25, 0.75]))
+    assert tune_results(scores) == {'mean_loss': 0.5, 'neg_mean_loss': -0.5, 'mean_error': 0.25,
+                                    'neg_mean_error': -0.25, 'mean_accuracy': 0.75}
+
+
+def test_checkpoint_of_trial_stopped_early():
+    pytest.importorskip('keras')
+    pytest.importorskip('ray')
+    from mlsquare.optmizers.callbacks import TuneReporter
+    from mlsquare.optmizers.tune import _checkpointer, _load_weights
+
+    class Model(object):
+        def get_weights(self):
+            return [self.epoch]
+
+        def set_weights(self, weights):
+            self.weights = weights
+
+    reports = []
+    callback = TuneReporter(lambda **result: reports.append(result),
+                            checkpoint=_checkpointer(None, 'train_model_x'), metric='neg_mean_loss')
+    model = Model()
+    callback.set_model(model)
+    callback.set_params({'epochs': 10})
+    with RaySession(num_cpus=1) as session:
+        session.start()
+        callback.on_train_begin()
+        ## Stopped by a scheduler after the fifth epoch.
+        for epoch, loss in enumerate([0.5, 0.3, 0.4, 0.2, 0.6]):
+            model.epoch = epoch
+            callback.on_epoch_end(epoch, {'loss': loss})
+        restored = Model()
+        _load_weights(restored, reports[-1])
+    assert restored.weights == [3]
+    assert reports[2]['checkpoint'] == reports[1]['checkpoint']
+    assert len(set(report['checkpoint'] for report in reports)) == 3
+
+
+def test_trials_cut_short_by_the_budget_are_not_recorded(monkeypatch):
+    pytest.importorskip('ray')
+    from ray.tune import trial_runner
+    from ray.tune.trial import Trial
+    from mlsquare.optmizers.tune import _run_experiments
+
+    class _Trial(object):
+        def __init__(self, trial_id):
+            self.trial_id, self.trainable_name = trial_id, 'train_model_x'
+            self.status, self.last_result, self.epochs = Trial.RUNNING, None, 0
+
+    class _Runner(object):
+        ## Both trials checkpoint every epoch and finish after three.
+        def __init__(self, search_alg, scheduler=None, verbose=False):
+            self.trials = [_Trial('a'), _Trial('b')]
+
+        def step(self):
+            for trial in self.trials:
+                if trial.status == Trial.RUNNING:
+                    trial.epochs += 1
+                    trial.last_result = {'epochs_done': trial.epochs, 'checkpoint': trial.epochs}
+                    if trial.epochs == 3:
+                        trial.status = Trial.TERMINATED
+
+        def get_trials(self):
+            return self.trials
+
+        def stop_trial(self, trial):
+            trial.status = Trial.TERMINATED
+
+        def is_finished(self):
+            return all(trial.status == Trial.TERMINATED for trial in self.trials)
+
+    class _Search(object):
+        def add_configurations(self, experiments):
+            pass
+
+        def set_finished(self):
+            pass
+
+        def is_finished(self):
+            return True
+
+    class _Experiment(object):
+        spec = {'run': 'train_model_x'}
+
+    monkeypatch.setattr(trial_runner, 'TrialRunner', _Runner)
+    recorded = []
+    for _, trials in _run_experiments([_Experiment()], verbose=0, search_alg=_Search(), max_trials=1,
+                                      on_trial_done=lambda trial: recorded.append(trial.trial_id)):
+        pass
+    ## 'b' was stopped by max_trials after its first epoch.
+    assert [trial.last_result['epochs_done'] for trial in trials] == [3, 1]
+    assert recorded == ['a']
+
+
+def test_fidelity_stopping():
+    pytest.importorskip('keras')
+    import numpy as np
+    from mlsquare.optmizers.callbacks import FidelityStopping
+
+    class _Model(object):
+        stop_training = False
+
+        def __init__(self):
+            self.outputs = iter([np.zeros(4), np.array([0., 1., 1., 1.]), np.array([0., 1., 1., 0.])])
+
+        def predict(self, X):
+            return next(self.outputs)
+
+    callback = FidelityStopping(0.9, np.zeros((4, 1)), np.array([0., 1., 1., 0.]))
+    callback.set_model(_Model())
+    for epoch in range(3):
+        callback.on_epoch_end(epoch)
+        if callback.model.stop_training:
+            break
+    assert callback.epochs_done == 3
+    assert callback.fidelity == 1.0
+
+
+def test_trial_resources():
+    from mlsquare.optmizers.tune import _trial_resources, _max_concurrent
+
+    with RaySession(num_cpus=4):
+        assert _trial_resources(8) == {'cpu': 4}
+        assert _trial_resources(1) == {'cpu': 1}
+        assert _trial_resources(0.25) == {'cpu': 0.25}
+        assert _max_concurrent(_trial_resources(0.25)) == 16
+        with pytest.raises(ValueError):
+            _trial_resources(0)
+
+
+def test_trial_memory_only_when_profiled():
+    from mlsquare.optmizers.tune import _memory_reporter
+    from mlsquare.utils import profiling
+
+    assert _memory_reporter() is None
+    with profiling.profile():
+        memory = _memory_reporter()
+    assert list(memory()) == ['peak_rss_bytes']
+
+
+def test_halving_rungs():
+    import numpy as np
+    from mlsquare.optmizers.tune import _halving_rungs, _take_rows
+
+    assert _halving_rungs(32000, 27, 3) == 3
+    assert _halving_rungs(32000, 10, 3) == 2
+    assert _halving_rungs(2000, 27, 3) == 0
+    assert _halving_rungs(32000, 1, 3) == 0
+    X = np.arange(10).reshape(5, 2)
+    np.testing.assert_array_equal(_take_rows(X, [1, 3]), X[[1, 3]])
+    assert _take_rows(X, None) is X
+
+
+def test_sorted_trials():
+    from mlsquare.optmizers.tune import get_sorted_trials
+
+    class Trial(object):
+        def __init__(self, **result):
+            self.last_result = result
+
+    trials = [Trial(mean_error=0.3), Trial(mean_error=0.1), Trial(), Trial(mean_error=0.2)]
+    assert [t.last_result.get('mean_error') for t in get_sorted_trials(trials, 'mean_error', mode='min')] == \
+        [0.1, 0.2, 0.3, None]
+    trials = [Trial(mean_accuracy=0.5), Trial(), Trial(mean_accuracy=0.9)]
+    assert [t.last_result.get('mean_accuracy') for t in get_sorted_trials(trials, 'mean_accuracy')] == \
+        [0.9, 0.5, None]
+    with pytest.raises(ValueError):
+        get_sorted_trials(trials, 'mean_accuracy', mode='best')
+
+
+def test_best_result():
+    from mlsquare.optmizers.tune import _best_result
+
+    results = [{'mean_error': 0.3}, None, {'mean_error': 0.1}, {}]
+    assert _best_result(results, 'mean_error', mode='min') == {'mean_error': 0.1}
+    assert _best_result(results, 'mean_error', mode='max') == {'mean_error': 0.3}
+    assert _best_result([None], 'mean_error') is None
+
+
+def test_reward_attr():
+    from mlsquare.optmizers.tune import _reward_attr
+
+    assert _reward_attr('mean_accuracy', 'max') == 'mean_accuracy'
+    assert _reward_attr('mean_loss', 'min') == 'neg_mean_loss'
+    with pytest.raises(ValueError):
+        _reward_attr('mean_loss', 'lowest')
+
+
+def test_restore_best_model_by_metric_mode():
+    from mlsquare.optmizers.tune import _restore_best_model
+
+    class Trial(object):
+        def __init__(self, loss):
+            self.config = {'optimizer': 'adam'}
+            self.last_result = {'mean_loss': loss, 'mean_accuracy': 1 - loss, 'checkpoint': [loss]}
+
+    class Model(object):
+        def set_weights(self, weights):
+            self.weights = weights
+
+    class Proxy(object):
+        def set_params(self, params, set_by):
+            self.params = params
+
+        def create_model(self):
+            return Model()
+
+    trials = [Trial(0.5), Trial(0.1), Trial(0.9)]
+    assert _restore_best_model(trials, Proxy(), metric='mean_loss', mode='min').weights == [0.1]
+    assert _restore_best_model(trials, Proxy(), metric='mean_accuracy').weights == [0.1]
+    assert _restore_best_model(trials, Proxy(), metric='mean_loss', mode='max').weights == [0.9]
+
+
+def test_halving_does_not_leak_candidate_param():
+    import numpy as np
+    from mlsquare.optmizers.tune import _trial_params
+
+    assert _trial_params({'candidate': 2, 'optimizer': 'adam', 'layer_1.l2': 0.1}) == \
+        {'optimizer': 'adam', 'layer_1.l2': 0.1}
+
+    pytest.importorskip('keras')
+    pytest.importorskip('ray')
+    from sklearn.linear_model import LogisticRegression
+    from mlsquare import dope
+
+    X = np.random.random((3000, 4))
+    y = (X[:, 0] + X[:, 1] > 1).astype(int)
+    model = dope(LogisticRegression())
+    with RaySession(num_cpus=2):
+        model.fit(X, y, epochs=2, space=True, max_trials=3, halving=True)
+    assert any('candidate' in trial.config for trial in model.trials)
+    assert 'candidate' not in model.proxy_model.get_params()
+
+
+def test_checkpoint_collection(tmpdir):
+    from mlsquare.optmizers.tune import _collect_checkpoints, _load_weights
+
+    class Trial(object):
+        def __init__(self, path):
+            self.last_result = {'checkpoint': [1, 2], 'checkpoint_path': str(path)}
+
+    directory = tmpdir.mkdir('train_model_x')
+    trials = [Trial(directory.join('%d.h5' % i)) for i in range(3)]
+    for trial in trials:
+        open(trial.last_result['checkpoint_path'], 'w').close()
+    _collect_checkpoints(trials, keep=trials[1])
+    assert [f.basename for f in directory.listdir()] == ['1.h5']
+    _collect_checkpoints(trials)
+    assert not directory.exists()
+
+    class Model(object):
+        def set_weights(self, weights):
+            self.weights = weights
+
+    model = Model()
+    _load_weights(model, trials[0].last_result)
+    assert model.weights == [1, 2]
+
+
+def test_experiment_store(tmpdir):
+    import numpy as np
+    from mlsquare.optmizers.experiments import ExperimentStore, get_experiment_store
+    from mlsquare.utils.fingerprint import fingerprint
+
+    store = get_experiment_store(str(tmpdir))
+    X, y = np.random.random((20, 3)), np.random.randint(2, size=20)
+    name = store.create('LogisticRegression', 'a' * 40, fingerprint(X, y), options={'epochs': 5})
+    assert store.create('LogisticRegression', 'a' * 40, fingerprint(X, y)) == name
+    assert store.trials(name) == []
+
+    store.record(name, {'optimizer': 'adam'}, {'trial_id': 't1', 'mean_accuracy': 0.9}, [np.ones(3)])
+    store.record(name, {'optimizer': 'nadam'}, {'trial_id': 't2', 'mean_accuracy': 0.8}, [np.zeros(3)])
+    assert sorted(record['config']['optimizer'] for record in store.trials(name)) == ['adam', 'nadam']
+
+    experiments = ExperimentStore(str(tmpdir)).lookup(X, y)
+    assert [experiment['name'] for experiment in experiments] == [name]
+    assert experiments[0]['options'] == {'epochs': 5}
+    assert len(experiments[0]['trials']) == 2
+    assert store.lookup(X[1:], y[1:]) == []
+
+    store.remove(name)
+    assert store.trials(name) == []
+    assert get_experiment_store(False) is None
+    with pytest.raises(TypeError):
+        get_experiment_store(1)
+
+
+def test_grid_configs():
+    from mlsquare.optmizers.search import grid_configs, choice
+
+    configs = grid_configs({'optimizer': choice(['adam', 'nadam']), 'layer_1.l2': choice([0, 1e-3, 1e-2])})
+    assert len(configs) == 6
+    assert {'layer_1.l2': 0, 'optimizer': 'nadam'} in configs
@@ -1,3 +1,4 @@
+import pytest
 from mlsquare.utils.correlations import concordance_correlation_coefficient
 import numpy as np
 
@@ -7,4 +8,206 @@ def test_ccc():
     y_true = np.arange(n_samples)
     y_pred = y_true
     c = concordance_correlation_coefficient(y_true,y_pred)
-    np.testing.assert_allclose(c, 1)
\ No newline at end of file
+    np.testing.assert_allclose(c, 1)
+
+def test_fidelity():
+    from mlsquare.utils.correlations import fidelity
+
+    assert fidelity([0, 1, 1, 0], [0.2, 0.9, 0.4, 0.1]) == 0.75
+    assert fidelity([[1, 0], [0, 1]], [[0.6, 0.4], [0.3, 0.7]]) == 1.0
+    y = np.arange(10.)
+    assert fidelity(y, y, metric='relative_mse') == 1.0
+    np.testing.assert_allclose(fidelity(y, y + 1, metric='relative_mse'), 1 - 1 / np.var(y))
+    assert fidelity(y, y, metric='ccc') == pytest.approx(1.0)
+    with pytest.raises(ValueError):
+        fidelity(y, y, metric='r2')
+
+def test_clone_primal():
+    from sklearn.tree import DecisionTreeClassifier
+    from mlsquare.utils.functions import _clone_primal
+
+    X = np.random.random((20, 3))
+    y = np.random.randint(2, size=20)
+    primal = DecisionTreeClassifier(max_depth=3).fit(X, y)
+
+    refit_copy = _clone_primal(primal, refit=True)
+    assert refit_copy is not primal
+    assert refit_copy.get_params() == primal.get_params()
+    assert not hasattr(refit_copy, 'tree_')
+
+    read_only_copy = _clone_primal(primal, refit=False)
+    assert read_only_copy is not primal
+    assert read_only_copy.tree_ is primal.tree_
+
+
+class _MockKerasModel(object):
+    def __init__(self):
+        self.weights = [np.zeros((3, 1)), np.zeros(1)]
+
+    def get_weights(self):
+        return self.weights
+
+    def set_weights(self, weights):
+        self.weights = weights
+
+
+class _MockProxyModel(object):
+    def __init__(self):
+        self._model_params = {'optimizer': 'adam'}
+
+    def set_params(self, params, set_by=None):
+        self._model_params = params
+
+    def get_params(self):
+        return self._model_params
+
+    def create_model(self):
+        return _MockKerasModel()
+
+
+def test_proxy_cache_roundtrip_and_eviction(tmpdir):
+    from mlsquare.utils.cache import ProxyCache
+    from mlsquare.utils.fingerprint import fingerprint
+
+    cache = ProxyCache(directory=str(tmpdir))
+    X = np.random.random((10, 3))
+    key = fingerprint({'alpha': 1.0}, X)
+    assert fingerprint({'alpha': 1.0}, X.copy()) == key
+    assert fingerprint({'alpha': 2.0}, X) != key
+    assert cache.load(key, _MockProxyModel()) is None
+
+    model = _MockKerasModel()
+    model.weights = [np.ones((3, 1)), np.ones(1)]
+    proxy_model = _MockProxyModel()
+    proxy_model.set_params({'optimizer': 'nadam'})
+    cache.save(key, proxy_model, model)
+
+    restored_proxy = _MockProxyModel()
+    restored = cache.load(key, restored_proxy)
+    np.testing.assert_array_equal(restored.get_weights()[0], np.ones((3, 1)))
+    assert restored_proxy.get_params() == {'optimizer': 'nadam'}
+
+    cache.max_bytes = 0
+    cache.evict()
+    assert cache.load(key, _MockProxyModel()) is None
+
+
+def test_fingerprint_inputs():
+    import pandas as pd
+    from scipy import sparse
+    from mlsquare.utils.fingerprint import fingerprint
+
+    X = np.random.random((50, 4))
+    assert fingerprint(X) == fingerprint(X.copy())
+    assert fingerprint(X[:, ::2]) == fingerprint(np.ascontiguousarray(X[:, ::2]))
+    assert fingerprint(X) != fingerprint(X.astype(np.float32))
+    assert fingerprint(X, chunk_bytes=64) == fingerprint(X)
+
+    frame = pd.DataFrame({'a': [1, 2, 3], 'b': ['x', 'y', 'z']})
+    assert fingerprint(frame) == fingerprint(frame.copy())
+    assert fingerprint(frame) != fingerprint(frame.assign(b=['x', 'y', 'w']))
+
+    matrix = sparse.random(20, 20, density=0.2, format='csr')
+    assert fingerprint(matrix) == fingerprint(matrix.copy())
+    assert fingerprint(matrix) != fingerprint(matrix * 2)
+
+
+def test_fingerprint_sampled_mode():
+    from mlsquare.utils import fingerprint as fp
+
+    X = np.zeros(2 * fp.SAMPLE_BLOCKS * fp.SAMPLE_BLOCK_BYTES, dtype=np.uint8)
+    digest = fp.fingerprint(X, sampled=True)
+    assert digest != fp.fingerprint(X)
+    X[1] = 1  # Inside the first sampled block.
+    assert fp.fingerprint(X, sampled=True) != digest
+
+
+def test_profiling_spans(tmpdir):
+    import json
+    from mlsquare.utils import profiling
+
+    assert profiling.span('noop') is profiling.span('other')  # Shared no-op when disabled.
+
+    class MockAdapter(object):
+        @profiling.profiled
+        def fit(self, X):
+            with profiling.span('primal.fit'):
+                pass
+            return X
+
+    adapter = MockAdapter()
+    assert adapter.fit(1) == 1
+    assert not hasattr(adapter, 'timings_')
+
+    trace = str(tmpdir.join('trace.json'))
+    assert adapter.fit(2, profile=trace) == 2
+    assert adapter.timings_['primal.fit']['count'] == 1
+    assert 'MockAdapter.fit' in adapter.timings_
+    with open(trace) as f:
+        names = [event['name'] for event in json.load(f)['traceEvents']]
+    assert sorted(names) == ['MockAdapter.fit', 'primal.fit']
+
+def test_spool(tmpdir):
+    import pandas as pd
+    from sklearn.linear_model import LinearRegression
+    from mlsquare.utils.streaming import iter_chunks, is_stream, spool
+
+    X = np.random.random((250, 3))
+    y = np.dot(X, [1., 2., 3.])
+    path = str(tmpdir.join('data.csv'))
+    pd.DataFrame(np.column_stack([X, y]), columns=['a', 'b', 'c', 'y']).to_csv(path, index=False)
+    assert is_stream(path) and not is_stream(X)
+    assert [len(X_chunk) for X_chunk, _ in iter_chunks(path, target='y', chunk_size=100)] == [100, 100, 50]
+
+    transform = lambda X, y, y_pred, fit=True: (X, y, y_pred)
+    primal = LinearRegression()
+    with pytest.warns(UserWarning):
+        data = spool(path, 'y', primal, transform, chunk_size=100, directory=str(tmpdir), sample_rows=150)
+    assert len(data) == 250 and len(data.sample[0]) == 200
+    np.testing.assert_allclose(data.X, X, rtol=1e-6)
+    np.testing.assert_allclose(data.y_pred[:, 0], primal.predict(X), rtol=1e-4)
+    data.remove()
+
+    from mlsquare.optmizers.experiments import data_fingerprint
+    from mlsquare.utils.fingerprint import ChunkedFingerprint
+    assert data.data_key == data_fingerprint(path, 'y')
+    frame = pd.read_csv(path)
+    y_read = frame.pop('y').values
+    digest = ChunkedFingerprint()
+    digest.update(frame.values, y_read)
+    assert digest.hexdigest() == data.data_key
+    pd.DataFrame(np.column_stack([X, y + 1]), columns=['a', 'b', 'c', 'y']).to_csv(path, index=False)
+    assert data_fingerprint(path, 'y') != data.data_key
+    assert not tmpdir.listdir(lambda p: p.basename.startswith('mlsquare-spool-'))
+
+    with pytest.raises(ValueError):
+        spool(lambda: iter([X]), None, LinearRegression(), transform, directory=str(tmpdir))
+    assert not tmpdir.listdir(lambda p: p.basename.startswith('mlsquare-spool-'))
+
+def test_as_array_copies(tmpdir):
+    import pandas as pd
+    from mlsquare.utils.arrays import as_array
+    from mlsquare.utils.profiling import profile
+
+    X = np.memmap(str(tmpdir.join('X.bin')), dtype=np.float32, mode='w+', shape=(100, 3))
+    frame = pd.DataFrame(np.random.random((100, 3)))
+    with profile() as profiler:
+        assert as_array(X) is X
+        assert as_array(X, dtype=(np.float64, np.float32)) is X
+        assert np.may_share_memory(as_array(frame), frame.iloc[:, 0].values)
+    assert profiler.counts == {}
+
+    with profile() as profiler:
+        assert as_array(X, dtype=np.float64).dtype == np.float64
+        assert as_array(pd.DataFrame({'a': np.arange(100), 'b': np.ones(100)})).shape == (100, 2)
+    assert profiler.counts['bytes_copied'] == 100 * 3 * 8 + 100 * 2 * 8
+
+def test_as_array_sparse():
+    from scipy import sparse
+    from mlsquare.utils.arrays import as_array, nbytes
+
+    X = sparse.random(100, 1000, density=0.01, format='csr', dtype=np.float32)
+    assert as_array(X, dtype=np.float32) is X
+    assert as_array(X.tocsc()).format == 'csr'
+    assert as_array(X, dtype=np.float64).dtype == np.float64
+    assert nbytes(X) == X.data.nbytes + X.indices.nbytes + X.indptr.nbytes